@@ -0,0 +1,133 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from borrowing.reports import get_borrowings_page
+from borrowing.signals import get_user_upcoming_borrowings
+from library.catalog_index import catalog_index
+from notification.models import ChatConversation
+from user.chat_links import get_user_by_chat_id, link_chat
+from user.models import User
+
+# A registration left unfinished for longer than this starts over.
+CONVERSATION_TIMEOUT = timedelta(hours=1)
+
+# Django 4.0 has no async queryset API, so bot queries run on this pool
+# instead of sync_to_async's single thread-sensitive executor. Each thread
+# keeps its own database connection, so the pool doubles as a connection
+# pool of the same size.
+executor = ThreadPoolExecutor(
+    max_workers=settings.BOT_DB_POOL_SIZE, thread_name_prefix="bot-db"
+)
+
+
+def _call(func, *args, **kwargs):
+    try:
+        return func(*args, **kwargs)
+    except DatabaseError:
+        # Drop a broken connection so the next query on this thread
+        # reconnects.
+        connection.close_if_unusable_or_obsolete()
+        raise
+
+
+async def run_query(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor, partial(_call, func, *args, **kwargs)
+    )
+
+
+async def aget_user_by_chat_id(chat_id):
+    return await run_query(get_user_by_chat_id, chat_id)
+
+
+async def afind_user(email, first_name, last_name):
+    return await run_query(
+        lambda: User.objects.filter(
+            email=email, first_name=first_name, last_name=last_name
+        ).first()
+    )
+
+
+async def alink_chat(user, chat_id):
+    await run_query(link_chat, user, chat_id)
+
+
+async def aget_borrowings_page(*args, **kwargs):
+    return await run_query(get_borrowings_page, *args, **kwargs)
+
+
+async def aget_upcoming_message(user):
+    return await run_query(get_user_upcoming_borrowings, user)
+
+
+async def asearch_catalog(query, limit=10):
+    # Only the refresh may touch the database; the search itself is a few
+    # dictionary lookups and runs on the event loop.
+    await run_query(catalog_index.refresh)
+    return catalog_index.search(query, limit)
+
+
+def start_conversation(chat_id, state):
+    ChatConversation.objects.update_or_create(
+        chat_id=chat_id, defaults={"state": state, "data": {}}
+    )
+
+
+def get_conversation(chat_id):
+    return ChatConversation.objects.filter(
+        chat_id=chat_id,
+        updated_at__gte=timezone.now() - CONVERSATION_TIMEOUT,
+    ).first()
+
+
+def advance_conversation(chat_id, state, **values):
+    with transaction.atomic():
+        conversation = (
+            ChatConversation.objects.select_for_update()
+            .filter(chat_id=chat_id)
+            .first()
+        )
+        if conversation is None:
+            return None
+        conversation.state = state
+        conversation.data = {**conversation.data, **values}
+        conversation.save()
+    return conversation
+
+
+def finish_conversation(chat_id, **values):
+    """Deletes the conversation and returns its collected data, or None
+    if the chat has no conversation in progress."""
+    with transaction.atomic():
+        conversation = (
+            ChatConversation.objects.select_for_update()
+            .filter(chat_id=chat_id)
+            .first()
+        )
+        if conversation is None:
+            return None
+        conversation.delete()
+    return {**conversation.data, **values}
+
+
+async def astart_conversation(chat_id, state):
+    await run_query(start_conversation, str(chat_id), state)
+
+
+async def aget_conversation(chat_id):
+    return await run_query(get_conversation, str(chat_id))
+
+
+async def aadvance_conversation(chat_id, state, **values):
+    return await run_query(advance_conversation, str(chat_id), state, **values)
+
+
+async def afinish_conversation(chat_id, **values):
+    return await run_query(finish_conversation, str(chat_id), **values)
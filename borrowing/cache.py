@@ -0,0 +1,118 @@
+import hashlib
+import math
+import random
+import time
+import uuid
+from functools import wraps
+
+from django.core.cache import cache
+from rest_framework.response import Response
+
+LIST_CACHE_TIMEOUT = 60 * 60
+# Expired entries are kept this much longer, so they can be served while
+# one worker rebuilds them.
+STALE_TIMEOUT = 5 * 60
+REBUILD_LOCK_TIMEOUT = 30
+REBUILD_WAIT = 5
+REBUILD_POLL_INTERVAL = 0.05
+# Higher values start early refreshes sooner (XFetch beta).
+EARLY_REFRESH_BETA = 1.0
+STAFF_SCOPE = "staff"
+
+
+def _generation_key(scope):
+    return f"list_cache:generation:{scope}"
+
+
+def get_scope(user):
+    # Staff lists span every user, so they share one scope that is
+    # invalidated by any change.
+    return STAFF_SCOPE if user.is_staff else f"user:{user.pk}"
+
+
+def get_generation(scope):
+    key = _generation_key(scope)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        generation = cache.get(key)
+    return generation
+
+
+def invalidate_lists(user_id):
+    cache.delete_many(
+        [_generation_key(STAFF_SCOPE), _generation_key(f"user:{user_id}")]
+    )
+
+
+def list_cache_key(prefix, request):
+    scope = get_scope(request.user)
+    params = sorted(request.query_params.lists())
+    digest = hashlib.md5(f"{request.path}:{params}".encode()).hexdigest()
+    return f"list_cache:{prefix}:{scope}:{get_generation(scope)}:{digest}"
+
+
+def should_refresh(entry, now):
+    # Probabilistic early expiration: the closer an entry is to expiring
+    # and the longer it took to build, the likelier a request refreshes it
+    # ahead of time, so expiries are spread out instead of synchronized.
+    jitter = -math.log(1.0 - random.random())
+    return now + entry["build_time"] * EARLY_REFRESH_BETA * jitter >= (
+        entry["expires_at"]
+    )
+
+
+def wait_for_rebuild(key):
+    deadline = time.monotonic() + REBUILD_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(REBUILD_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def cache_per_user(prefix, timeout=LIST_CACHE_TIMEOUT):
+    """Caches list responses per user and query string. Entries are dropped
+    by invalidate_lists() when a borrowing or payment of the user changes.
+
+    Only one worker rebuilds a missing or expiring entry. The others serve
+    the stale copy meanwhile, or wait briefly for the rebuilt one."""
+
+    def decorator(view_method):
+        def rebuild(self, request, key, *args, **kwargs):
+            started = time.time()
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                finished = time.time()
+                entry = {
+                    "data": response.data,
+                    "expires_at": finished + timeout,
+                    "build_time": finished - started,
+                }
+                cache.set(key, entry, timeout + STALE_TIMEOUT)
+            return response
+
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            key = list_cache_key(prefix, request)
+            entry = cache.get(key)
+            if entry is not None and not should_refresh(entry, time.time()):
+                return Response(entry["data"])
+
+            lock_key = f"{key}:rebuild"
+            if cache.add(lock_key, True, REBUILD_LOCK_TIMEOUT):
+                try:
+                    return rebuild(self, request, key, *args, **kwargs)
+                finally:
+                    cache.delete(lock_key)
+
+            if entry is None:
+                entry = wait_for_rebuild(key)
+            if entry is None:
+                return view_method(self, request, *args, **kwargs)
+            return Response(entry["data"])
+
+        return wrapper
+
+    return decorator
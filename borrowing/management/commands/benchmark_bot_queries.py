@@ -0,0 +1,83 @@
+import asyncio
+import random
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.management import BaseCommand, CommandError
+
+from borrowing.bot_queries import aget_upcoming_message, aget_user_by_chat_id
+from borrowing.signals import get_user_upcoming_borrowings
+from user.models import User
+
+
+def get_user_by_chat_id(chat_id):
+    return User.objects.filter(telegram_chat_id=chat_id).first()
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Drive concurrent simulated /upcoming_borrow updates through the "
+        "bot's data layer and compare it with sync_to_async."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--updates", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=100)
+        parser.add_argument(
+            "--baseline",
+            action="store_true",
+            help="Also run the same updates through thread-sensitive "
+            "sync_to_async for comparison.",
+        )
+
+    def handle(self, *args, **options):
+        chat_ids = list(
+            User.objects.exclude(telegram_chat_id__isnull=True)
+            .values_list("telegram_chat_id", flat=True)[:1000]
+        )
+        if not chat_ids:
+            raise CommandError("No users with a Telegram chat id to use.")
+        updates = [
+            random.choice(chat_ids) for _ in range(options["updates"])
+        ]
+
+        pooled = asyncio.run(
+            self.run(updates, options["concurrency"], self.pooled_update)
+        )
+        self.report("bot executor pool", pooled, len(updates))
+        if options["baseline"]:
+            baseline = asyncio.run(
+                self.run(
+                    updates, options["concurrency"], self.baseline_update
+                )
+            )
+            self.report("sync_to_async", baseline, len(updates))
+            self.stdout.write(f"Speedup: {baseline / pooled:.2f}x")
+
+    def report(self, label, elapsed, count):
+        self.stdout.write(
+            f"[{label}] {count} updates in {elapsed:.2f}s "
+            f"({count / elapsed:.0f}/s)"
+        )
+
+    @staticmethod
+    async def pooled_update(chat_id):
+        user = await aget_user_by_chat_id(chat_id)
+        return await aget_upcoming_message(user)
+
+    @staticmethod
+    async def baseline_update(chat_id):
+        user = await sync_to_async(get_user_by_chat_id)(chat_id)
+        return await sync_to_async(get_user_upcoming_borrowings)(user)
+
+    @staticmethod
+    async def run(updates, concurrency, handle_update):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def simulate(chat_id):
+            async with semaphore:
+                await handle_update(chat_id)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(simulate(chat_id) for chat_id in updates))
+        return time.perf_counter() - started
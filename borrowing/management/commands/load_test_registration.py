@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+from django.core.management import BaseCommand
+
+from user.models import User
+
+LOAD_TEST_DOMAIN = "registration-load-test.invalid"
+# Far above real chat ids, so the test cannot relink real chats.
+FIRST_CHAT_ID = 10**15
+
+
+class FakeMessage:
+    def __init__(self, chat_id, text):
+        self.chat_id = chat_id
+        self.text = text
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+class FakeUpdate:
+    def __init__(self, chat_id, text):
+        self.message = FakeMessage(chat_id, text)
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Run many concurrent simulated /start registrations through the "
+        "bot handlers and check that no chat gets another chat's data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chats", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=200)
+
+    def handle(self, *args, **options):
+        chats = options["chats"]
+        users = User.objects.bulk_create(
+            [
+                User(
+                    email=f"user{index}@{LOAD_TEST_DOMAIN}",
+                    first_name=f"First{index}",
+                    last_name=f"Last{index}",
+                )
+                for index in range(chats)
+            ]
+        )
+        try:
+            elapsed = asyncio.run(self.run(users, options["concurrency"]))
+            linked = dict(
+                User.objects.filter(
+                    email__endswith=f"@{LOAD_TEST_DOMAIN}"
+                ).values_list("email", "telegram_chat_id")
+            )
+        finally:
+            User.objects.filter(
+                email__endswith=f"@{LOAD_TEST_DOMAIN}"
+            ).delete()
+
+        wrong = sum(
+            linked[user.email] != FIRST_CHAT_ID + index
+            for index, user in enumerate(users)
+        )
+        self.stdout.write(
+            f"{chats} registrations in {elapsed:.2f}s "
+            f"({chats * 4 / elapsed:.0f} updates/s)"
+        )
+        if wrong:
+            self.stdout.write(self.style.ERROR(f"Wrongly linked: {wrong}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Every chat was linked"))
+
+    @staticmethod
+    async def run(users, concurrency):
+        from telegram_bot import handle_registration_message, start
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def register(chat_id, user):
+            async with semaphore:
+                await start(FakeUpdate(chat_id, "/start"), None)
+            # Release the slot between messages, like a user typing, so
+            # registrations interleave.
+            for text in (user.email, user.first_name, user.last_name):
+                async with semaphore:
+                    await handle_registration_message(
+                        FakeUpdate(chat_id, text), None
+                    )
+
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(
+                register(FIRST_CHAT_ID + index, user)
+                for index, user in enumerate(users)
+            )
+        )
+        return time.perf_counter() - started
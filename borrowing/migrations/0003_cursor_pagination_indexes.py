@@ -0,0 +1,21 @@
+# Generated by Django 4.0.4 on 2026-10-18 20:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrowing', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrowing',
+            index=models.Index(fields=['-borrow_date', '-id'], name='borrowing_borrow_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowing',
+            index=models.Index(fields=['user', '-borrow_date', '-id'], name='borrowing_user_borrow_date_idx'),
+        ),
+    ]
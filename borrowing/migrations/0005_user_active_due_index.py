@@ -0,0 +1,17 @@
+# Generated by Django 4.0.4 on 2026-10-18 20:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrowing', '0004_active_due_date_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrowing',
+            index=models.Index(condition=models.Q(('actual_return_date__isnull', True)), fields=['user', 'expected_return_date'], name='borrowing_user_active_due_idx'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.0.4 on 2026-10-18 20:50
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+
+def file_active_borrowings(apps, schema_editor):
+    Borrowing = apps.get_model("borrowing", "Borrowing")
+    DueReminder = apps.get_model("borrowing", "DueReminder")
+    today = timezone.now().date()
+    borrowings = (
+        Borrowing.objects.filter(actual_return_date__isnull=True)
+        .values_list("id", "expected_return_date")
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    batch = []
+    for borrowing_id, expected_return_date in borrowings:
+        batch.append(
+            DueReminder(
+                borrowing_id=borrowing_id,
+                kind="OVERDUE",
+                fire_on=expected_return_date,
+            )
+        )
+        if expected_return_date - timedelta(days=1) >= today:
+            batch.append(
+                DueReminder(
+                    borrowing_id=borrowing_id,
+                    kind="UPCOMING",
+                    fire_on=expected_return_date - timedelta(days=1),
+                )
+            )
+        if len(batch) >= BATCH_SIZE:
+            DueReminder.objects.bulk_create(batch)
+            batch = []
+    DueReminder.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrowing', '0005_user_active_due_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DueReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('UPCOMING', 'Upcoming'), ('OVERDUE', 'Overdue')], max_length=8)),
+                ('fire_on', models.DateField(db_index=True)),
+                ('borrowing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='due_reminders', to='borrowing.borrowing')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='duereminder',
+            constraint=models.UniqueConstraint(fields=('borrowing', 'kind'), name='unique_due_reminder'),
+        ),
+        migrations.RunPython(
+            file_active_borrowings, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.0.4 on 2026-10-18 21:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrowing', '0006_due_reminders'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='borrowing',
+            name='borrowing_borrow_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='borrowing',
+            name='borrowing_user_borrow_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='borrowing',
+            index=models.Index(fields=['user', '-id'], name='borrowing_user_id_idx'),
+        ),
+    ]
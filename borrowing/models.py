@@ -1,9 +1,8 @@
 from datetime import datetime
 from datetime import date
 
-import stripe
 from django.apps import apps
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 from django.conf import settings
@@ -28,6 +27,28 @@ class Borrowing(models.Model):
         related_name="borrowings",
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "-id"],
+                name="borrowing_user_id_idx",
+            ),
+            models.Index(
+                fields=["expected_return_date"],
+                condition=models.Q(actual_return_date__isnull=True),
+                name="borrowing_active_due_date_idx",
+            ),
+            models.Index(
+                fields=["user", "expected_return_date"],
+                condition=models.Q(actual_return_date__isnull=True),
+                name="borrowing_user_active_due_idx",
+            ),
+        ]
+
+    # Set once the copy has been taken off the shelf, so clean() does not
+    # count the reserved copy as unavailable.
+    copy_reserved = False
+
     def __str__(self) -> str:
         return (
             f"Book: {self.book.title}, Author: {self.book.author}. "
@@ -54,7 +75,11 @@ class Borrowing(models.Model):
                 "Actual return date cannot be before the borrow date."
             )
 
-        if not self.pk and self.book.inventory < 1:
+        if (
+            not self.pk
+            and not self.copy_reserved
+            and self.book.available_inventory < 1
+        ):
             raise ValidationError(
                 f"The book '{self.book.title}' is not available for borrowing."
             )
@@ -64,12 +89,23 @@ class Borrowing(models.Model):
         super().save(*args, **kwargs)
 
     def return_borrowing(self):
-        if self.actual_return_date is not None:
-            raise ValidationError("This borrowing has already been returned.")
-        self.actual_return_date = timezone.now().date()
-        self.book.inventory += 1
-        self.book.save()
-        self.save()
+        return_date = timezone.now().date()
+        with transaction.atomic():
+            # Only the caller whose UPDATE sets the return date restocks
+            # the book, so concurrent or stale returns cannot put the copy
+            # back twice.
+            returned = Borrowing.objects.filter(
+                pk=self.pk, actual_return_date__isnull=True
+            ).update(actual_return_date=return_date)
+            if not returned:
+                raise ValidationError(
+                    "This borrowing has already been returned."
+                )
+            self.actual_return_date = return_date
+            self.book.return_copy()
+            # Saved again so post_save receivers see the return.
+            self.save()
+        self.book.refresh_from_db(fields=["inventory"])
 
         if self.actual_return_date > self.expected_return_date:
             overdue_days = (
@@ -97,39 +133,30 @@ class Borrowing(models.Model):
         total_price = int(total_price * 100)
         return total_price
 
-    def create_stripe_session(self):
-        from payment.models import Payment  # Lazy import
-
-        stripe.api_key = settings.STRIPE_SECRET_KEY
-
-        total_price = self.calculate_total_price()
-
-        session = stripe.checkout.Session.create(
-            payment_method_types=["card"],
-            line_items=[
-                {
-                    "price_data": {
-                        "currency": "usd",
-                        "product_data": {
-                            "name": self.book.title,
-                        },
-                        "unit_amount": total_price,
-                    },
-                    "quantity": 1,
-                }
-            ],
-            mode="payment",
-            success_url="http://localhost:8000/api/payment/completed/"
-            + "?session_id={CHECKOUT_SESSION_ID}",
-            cancel_url="http://localhost:8000/api/payment/canceled/",
-        )
 
-        payment = Payment.objects.create(
-            borrowing=self,
-            session_url=session.url,
-            session_id=session.id,
-            money_to_pay=total_price,
-            status="PENDING",
-        )
+class DueReminder(models.Model):
+    """A reminder filed into the bucket of the day it should fire on."""
+
+    KIND_CHOICES = [
+        ("UPCOMING", "Upcoming"),
+        ("OVERDUE", "Overdue"),
+    ]
 
-        return payment
+    borrowing = models.ForeignKey(
+        Borrowing,
+        on_delete=models.CASCADE,
+        related_name="due_reminders",
+    )
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES)
+    fire_on = models.DateField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["borrowing", "kind"],
+                name="unique_due_reminder",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} on {self.fire_on}"
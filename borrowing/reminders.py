@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from borrowing.models import DueReminder
+from notification.delivery import enqueue_deliveries
+
+UPCOMING_NOTICE = timedelta(days=1)
+FIRE_BATCH_SIZE = 1000
+
+
+def build_reminders(borrowing, today):
+    reminders = [
+        DueReminder(
+            borrowing=borrowing,
+            kind="OVERDUE",
+            fire_on=borrowing.expected_return_date,
+        )
+    ]
+    upcoming_on = borrowing.expected_return_date - UPCOMING_NOTICE
+    if upcoming_on >= today:
+        reminders.append(
+            DueReminder(
+                borrowing=borrowing, kind="UPCOMING", fire_on=upcoming_on
+            )
+        )
+    return reminders
+
+
+def file_reminders(borrowing):
+    """Files the borrowing into the buckets of its reminder days."""
+    DueReminder.objects.bulk_create(
+        build_reminders(borrowing, timezone.now().date()),
+        ignore_conflicts=True,
+    )
+
+
+def cancel_reminders(borrowing):
+    DueReminder.objects.filter(borrowing=borrowing).delete()
+
+
+def format_upcoming_message(borrowing):
+    return (
+        f"📚 Upcoming Borrowings:\n\n"
+        f"🔔 Upcoming Borrowing Reminder:\n"
+        f"   • Book: {borrowing.book.title}\n"
+        f"   • Author: {borrowing.book.author}\n"
+        f"   • Due Date: "
+        f"{borrowing.expected_return_date.strftime('%d %B %Y')}\n"
+    )
+
+
+def format_overdue_message(title, author, expected_return_date):
+    return (
+        f"⚠️ Reminder: Your borrowing is overdue!\n\n"
+        f"   • Book: {title}\n"
+        f"   • Author: {author}\n"
+        f"   • Due Date: "
+        f"{expected_return_date.strftime('%d %B %Y')}\n"
+    )
+
+
+def format_reminder(reminder):
+    borrowing = reminder.borrowing
+    if reminder.kind == "UPCOMING":
+        return format_upcoming_message(borrowing)
+    return format_overdue_message(
+        borrowing.book.title,
+        borrowing.book.author,
+        borrowing.expected_return_date,
+    )
+
+
+def fire_due_reminders():
+    """Sends the reminders of today's bucket, and of any bucket a missed
+    tick left behind. Upcoming reminders fire once. Overdue reminders are
+    filed again into tomorrow's bucket until the book is returned. Work per
+    tick depends only on the reminders that are due."""
+    today = timezone.now().date()
+    fired = 0
+    while True:
+        with transaction.atomic():
+            reminders = list(
+                DueReminder.objects.select_for_update(
+                    skip_locked=True, of=("self",)
+                )
+                .filter(fire_on__lte=today)
+                .select_related("borrowing__book", "borrowing__user")
+                .defer("borrowing__book__search_vector")
+                .order_by("id")[:FIRE_BATCH_SIZE]
+            )
+            if not reminders:
+                return fired
+
+            enqueue_deliveries(
+                (
+                    reminder.borrowing.user.telegram_chat_id,
+                    format_reminder(reminder),
+                )
+                for reminder in reminders
+            )
+            DueReminder.objects.filter(
+                pk__in=[r.pk for r in reminders if r.kind == "UPCOMING"]
+            ).delete()
+            DueReminder.objects.filter(
+                pk__in=[r.pk for r in reminders if r.kind == "OVERDUE"]
+            ).update(fire_on=today + timedelta(days=1))
+        fired += len(reminders)
@@ -0,0 +1,90 @@
+from django.utils import timezone
+
+from borrowing.models import Borrowing
+
+REPORT_PAGE_SIZE = 10
+REPORT_FILTERS = ("all", "active", "overdue", "returned")
+# Telegram rejects messages longer than this.
+TELEGRAM_MESSAGE_LIMIT = 4096
+# Long enough for any real email or title, short enough that a full page
+# stays well within TELEGRAM_MESSAGE_LIMIT.
+REPORT_FIELD_LIMIT = 120
+
+
+def filter_borrowings(queryset, filter_name):
+    if filter_name == "active":
+        return queryset.filter(actual_return_date__isnull=True)
+    if filter_name == "overdue":
+        return queryset.filter(
+            actual_return_date__isnull=True,
+            expected_return_date__lte=timezone.now().date(),
+        )
+    if filter_name == "returned":
+        return queryset.filter(actual_return_date__isnull=False)
+    return queryset
+
+
+def get_borrowings_page(
+    filter_name="all", after_id=None, before_id=None, page_size=None
+):
+    """Returns one keyset page of borrowings ordered by id. Pages are
+    addressed by the last id of the previous page (after_id) or the first
+    id of the next one (before_id), so only page_size + 1 rows are read
+    however deep the page is."""
+    page_size = page_size or REPORT_PAGE_SIZE
+    queryset = filter_borrowings(
+        Borrowing.objects.select_related("user", "book").only(
+            "id",
+            "expected_return_date",
+            "actual_return_date",
+            "user__email",
+            "book__title",
+        ),
+        filter_name,
+    )
+    if before_id is not None:
+        rows = list(
+            queryset.filter(id__lt=before_id).order_by("-id")[: page_size + 1]
+        )
+        has_previous = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        has_next = True
+    else:
+        if after_id is not None:
+            queryset = queryset.filter(id__gt=after_id)
+        rows = list(queryset.order_by("id")[: page_size + 1])
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        has_previous = after_id is not None
+    return {
+        "borrowings": rows,
+        "has_previous": has_previous and bool(rows),
+        "has_next": has_next and bool(rows),
+    }
+
+
+def shorten(text, limit=REPORT_FIELD_LIMIT):
+    if len(text) <= limit:
+        return text
+    return text[: limit - 1] + "…"
+
+
+def format_borrowings_page(page, filter_name="all"):
+    message = f"📚 Borrowings ({filter_name}):\n\n"
+    if not page["borrowings"]:
+        return message + "No borrowings found in the database."
+    for borrowing in page["borrowings"]:
+        message += (
+            f"#{borrowing.id}\n"
+            f"   • User: {shorten(borrowing.user.email)}\n"
+            f"   • Book: {shorten(borrowing.book.title)}\n"
+            f"   • Due Date: "
+            f"{borrowing.expected_return_date.strftime('%d %B %Y')}\n"
+        )
+        if borrowing.actual_return_date:
+            message += (
+                f"   • Returned: "
+                f"{borrowing.actual_return_date.strftime('%d %B %Y')}\n"
+            )
+        message += "\n"
+    return shorten(message, TELEGRAM_MESSAGE_LIMIT)
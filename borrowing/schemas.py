@@ -33,3 +33,16 @@ class BorrowingSchema:
     return_borrowing = extend_schema(
         responses={200: BorrowingReturnSerializer()}
     )
+    export = extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="file_format",
+                description="csv (default) or ndjson",
+                required=False,
+                type={"type": "string"},
+            ),
+        ],
+        responses={200: None},
+        description="Stream borrowings as CSV or NDJSON (staff only). "
+        "Accepts the same filters as the list.",
+    )
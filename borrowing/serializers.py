@@ -1,3 +1,4 @@
+from django.db import transaction
 from rest_framework import serializers
 from borrowing.models import Borrowing
 from borrowing.signals import send_pending_payment_notification
@@ -6,6 +7,23 @@ from payment.models import Payment
 from payment.serializers import PaymentSerializer, SelectedPaymentSerializer
 
 
+class BookTitleRelatedField(serializers.SlugRelatedField):
+    """Resolves a book by title, falling back to the closest trigram match
+    when the title is misspelled."""
+
+    def __init__(self, **kwargs):
+        super().__init__(slug_field="title", **kwargs)
+
+    def to_internal_value(self, data):
+        try:
+            return super().to_internal_value(data)
+        except serializers.ValidationError:
+            book = self.get_queryset().closest_title(str(data))
+            if book is None:
+                raise
+            return book
+
+
 class BorrowingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Borrowing
@@ -61,9 +79,7 @@ class BorrowingDetailSerializer(serializers.ModelSerializer):
 
 class BorrowingCreateSerializer(serializers.ModelSerializer):
     payments = PaymentSerializer(many=True, read_only=True)
-    book = serializers.SlugRelatedField(
-        slug_field="title", queryset=Book.objects.all()
-    )
+    book = BookTitleRelatedField(queryset=Book.objects.all())
 
     class Meta:
         model = Borrowing
@@ -81,7 +97,7 @@ class BorrowingCreateSerializer(serializers.ModelSerializer):
     def validate(self, attrs):
         user = self.context["request"].user
         book = attrs["book"]
-        if book.inventory <= 0:
+        if book.available_inventory <= 0:
             raise serializers.ValidationError(
                 "This book is currently not available for borrowing."
             )
@@ -99,10 +115,14 @@ class BorrowingCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         user = self.context["request"].user
         book = validated_data["book"]
-        book.inventory -= 1
-        book.save()
-
-        borrowing = Borrowing.objects.create(user=user, **validated_data)
+        with transaction.atomic():
+            if not book.take_copy():
+                raise serializers.ValidationError(
+                    "This book is currently not available for borrowing."
+                )
+            borrowing = Borrowing(user=user, **validated_data)
+            borrowing.copy_reserved = True
+            borrowing.save()
         return borrowing
 
 
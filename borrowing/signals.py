@@ -1,31 +1,26 @@
-import os
-import requests
+from functools import partial
+
+from django.db import transaction
 from django.utils import timezone
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django_q.tasks import async_task
+from borrowing.cache import invalidate_lists
 from borrowing.models import Borrowing
-from user.models import User
-from payment.models import Payment
-
-TELEGRAM_BOT_TOKEN = os.environ.get("TOKEN")
-TELEGRAM_API_URL = (
-    f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+from borrowing.reminders import (
+    cancel_reminders,
+    file_reminders,
+    format_overdue_message,
+    format_upcoming_message,
 )
+from payment.models import Payment
+from notification.delivery import enqueue_deliveries
+from notification.digest import notify
 
 FINE_MULTIPLIER = 2
+NOTIFICATION_BATCH_SIZE = 1000
 
 
-def send_telegram_message(chat_id, message):
-    response = requests.post(
-        TELEGRAM_API_URL,
-        data={"chat_id": chat_id, "text": message},
-    )
-    print(response.json())
-
-
-def send_borrowing_notification(instance_id):
-    instance = Borrowing.objects.get(id=instance_id)
+def send_borrowing_notification(instance):
     user = instance.user
     message = (
         f"📚 New Borrowing Created!\n\n"
@@ -36,25 +31,27 @@ def send_borrowing_notification(instance_id):
         f"{instance.expected_return_date.strftime('%d %B %Y')}\n\n"
         f"💳 Please complete the payment for your borrowing"
     )
-    if user.telegram_chat_id:
-        response = requests.post(
-            TELEGRAM_API_URL,
-            data={"chat_id": user.telegram_chat_id, "text": message},
-        )
-        print(response.json())
+    notify(user.telegram_chat_id, message)
 
 
 def send_pending_payment_notification(user):
     message = ("⚠️ You have pending payments. "
                "Please complete the payments before borrowing a new book.")
-    if user.telegram_chat_id:
-        send_telegram_message(user.telegram_chat_id, message)
+    notify(user.telegram_chat_id, message)
 
 
 @receiver(post_save, sender=Borrowing)
 def handle_new_borrowing(sender, instance, created, **kwargs):
     if created:
-        async_task(send_borrowing_notification, instance.id)
+        send_borrowing_notification(instance)
+
+
+@receiver(post_save, sender=Borrowing)
+def handle_due_reminders(sender, instance, created, **kwargs):
+    if instance.actual_return_date:
+        cancel_reminders(instance)
+    elif created:
+        file_reminders(instance)
 
 
 @receiver(post_save, sender=Payment)
@@ -75,58 +72,62 @@ def handle_successful_payment(sender, instance, **kwargs):
             f"   • Payment Type: {instance.get_payment_type_display()}\n\n"
             f"Thank you for using our library services!"
         )
-        if user.telegram_chat_id:
-            async_task(send_telegram_message, user.telegram_chat_id, message)
-
-
-def check_all_borrowings():
-    borrowings = Borrowing.objects.all()
-    borrowings_message = "📚 All Borrowings:\n\n"
-    if borrowings.exists():
-        for borrowing in borrowings:
-            borrowings_message += (
-                f"   • User: {borrowing.user.email}\n"
-                f"   • Book: {borrowing.book.title}\n"
-                f"   • Due Date: "
-                f"{borrowing.expected_return_date.strftime('%d %B %Y')}\n\n"
-            )
-    else:
-        borrowings_message += "No borrowings found in the database."
-    return borrowings_message
+        notify(user.telegram_chat_id, message)
+
+
+def _invalidate_lists(user_id):
+    # Invalidate right away and again after commit, so a request that read
+    # the old rows before the commit cannot leave them cached.
+    invalidate_lists(user_id)
+    transaction.on_commit(partial(invalidate_lists, user_id))
+
+
+@receiver(post_save, sender=Borrowing)
+@receiver(post_delete, sender=Borrowing)
+def handle_borrowing_change(sender, instance, **kwargs):
+    _invalidate_lists(instance.user_id)
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def handle_payment_change(sender, instance, **kwargs):
+    user_id = (
+        Borrowing.objects.filter(pk=instance.borrowing_id)
+        .values_list("user_id", flat=True)
+        .first()
+    )
+    _invalidate_lists(user_id)
 
 
 def check_overdue_borrowings():
+    """Queues an overdue reminder for every active borrowing past its due
+    date whose user has linked Telegram. Returns how many were queued."""
     today = timezone.now().date()
-    overdue_borrowings = Borrowing.objects.filter(
-        expected_return_date__lte=today, actual_return_date__isnull=True
+    rows = (
+        Borrowing.objects.filter(
+            expected_return_date__lte=today,
+            actual_return_date__isnull=True,
+            user__telegram_chat_id__isnull=False,
+        )
+        .values_list(
+            "user__telegram_chat_id",
+            "book__title",
+            "book__author",
+            "expected_return_date",
+        )
+        .iterator(chunk_size=NOTIFICATION_BATCH_SIZE)
     )
-    overdue_message = "⏰ Overdue Borrowings:\n\n"
-    if overdue_borrowings.exists():
-        for borrowing in overdue_borrowings:
-            user = borrowing.user
-            message = (
-                f"⚠️ Reminder: Your borrowing is overdue!\n\n"
-                f"   • Book: {borrowing.book.title}\n"
-                f"   • Author: {borrowing.book.author}\n"
-                f"   • Due Date: "
-                f"{borrowing.expected_return_date.strftime('%d %B %Y')}\n"
-            )
-            if user.telegram_chat_id:
-                async_task(
-                    send_telegram_message, user.telegram_chat_id, message
-                )
-                overdue_message += message + "\n"
-    else:
-        overdue_message += "✅ No borrowings overdue today!"
-        users = User.objects.exclude(telegram_chat_id__isnull=True)
-        for user in users:
-            if user.telegram_chat_id:
-                async_task(
-                    send_telegram_message,
-                    user.telegram_chat_id,
-                    overdue_message,
-                )
-    return overdue_message
+    queued = 0
+    batch = []
+    for chat_id, title, author, expected_return_date in rows:
+        message = format_overdue_message(title, author, expected_return_date)
+        batch.append((chat_id, message))
+        if len(batch) >= NOTIFICATION_BATCH_SIZE:
+            queued += enqueue_deliveries(batch)
+            batch = []
+    if batch:
+        queued += enqueue_deliveries(batch)
+    return queued
 
 
 @receiver(post_save, sender=Borrowing)
@@ -154,39 +155,57 @@ def handle_return_borrowing(sender, instance, **kwargs):
                 f"   • Amount Due: ${fine_amount / 100:.2f}\n"
                 f"Please complete the payment to avoid further penalties."
             )
-            async_task(
-                send_telegram_message,
-                instance.user.telegram_chat_id,
-                fine_message,
-            )
+            notify(instance.user.telegram_chat_id, fine_message)
 
 
 def get_user_upcoming_borrowings(user):
     today = timezone.now().date()
-    upcoming_message = "📚 Upcoming Borrowings:\n\n"
     nearest_borrowing = (
-        Borrowing.objects.filter(user=user, expected_return_date__gte=today)
+        Borrowing.objects.filter(
+            user=user,
+            expected_return_date__gte=today,
+            actual_return_date__isnull=True,
+        )
+        .select_related("book")
+        .defer("book__search_vector")
         .order_by("expected_return_date")
         .first()
     )
     if nearest_borrowing:
-        upcoming_message += (
-            f"🔔 Upcoming Borrowing Reminder:\n"
-            f"   • Book: {nearest_borrowing.book.title}\n"
-            f"   • Author: {nearest_borrowing.book.author}\n"
-            f"   • Due Date: "
-            f"{nearest_borrowing.expected_return_date.strftime('%d %B %Y')}\n"
-        )
-    else:
-        upcoming_message += "✅ No upcoming borrowings found."
-    return upcoming_message
+        return format_upcoming_message(nearest_borrowing)
+    return "📚 Upcoming Borrowings:\n\n✅ No upcoming borrowings found."
 
 
 def notify_users_about_upcoming_borrowing():
-    users = User.objects.exclude(telegram_chat_id__isnull=True)
-    for user in users:
-        upcoming_message = get_user_upcoming_borrowings(user)
-        if user.telegram_chat_id:
-            async_task(
-                send_telegram_message, user.telegram_chat_id, upcoming_message
-            )
+    """Queues a reminder about the nearest active borrowing of every user
+    with linked Telegram. One DISTINCT ON (user_id) query finds them all.
+    Returns how many reminders were queued."""
+    today = timezone.now().date()
+    borrowings = (
+        Borrowing.objects.filter(
+            expected_return_date__gte=today,
+            actual_return_date__isnull=True,
+            user__telegram_chat_id__isnull=False,
+        )
+        .select_related("book", "user")
+        .only(
+            "expected_return_date",
+            "book__title",
+            "book__author",
+            "user__telegram_chat_id",
+        )
+        .order_by("user_id", "expected_return_date", "id")
+        .distinct("user_id")
+        .iterator(chunk_size=NOTIFICATION_BATCH_SIZE)
+    )
+    queued = 0
+    batch = []
+    for borrowing in borrowings:
+        message = format_upcoming_message(borrowing)
+        batch.append((borrowing.user.telegram_chat_id, message))
+        if len(batch) >= NOTIFICATION_BATCH_SIZE:
+            queued += enqueue_deliveries(batch)
+            batch = []
+    if batch:
+        queued += enqueue_deliveries(batch)
+    return queued
@@ -1,3 +1,10 @@
+import csv
+import io
+import json
+from base64 import b64decode
+from urllib.parse import parse_qs, urlparse
+from unittest.mock import patch
+
 from django.utils import timezone
 from django.urls import reverse
 from library.models import Book
@@ -6,6 +13,7 @@ from rest_framework.test import APITestCase
 
 from user.models import User
 from borrowing.models import Borrowing
+from payment.models import CheckoutOutbox, Payment
 
 
 class BorrowingFilterTests(APITestCase):
@@ -40,7 +48,7 @@ class BorrowingFilterTests(APITestCase):
         url = reverse("borrowing:borrowing-list")
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data["results"]), 2)
 
     def test_filter_by_user_id_as_staff(self):
         url = (
@@ -57,7 +65,7 @@ class BorrowingFilterTests(APITestCase):
         self.client.force_authenticate(user=staff_user)
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data["results"]), 2)
 
     def test_filter_by_user_id_as_non_staff(self):
         url = (
@@ -67,22 +75,270 @@ class BorrowingFilterTests(APITestCase):
         )
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data["results"]), 2)
 
     def test_filter_by_is_active_true(self):
         url = reverse("borrowing:borrowing-list") + "?is_active=true"
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data["results"]), 1)
 
     def test_filter_by_is_active_false(self):
         url = reverse("borrowing:borrowing-list") + "?is_active=false"
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data["results"]), 1)
 
     def test_no_filter_params(self):
         url = reverse("borrowing:borrowing-list")
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_cursor_pagination(self):
+        url = reverse("borrowing:borrowing-list") + "?limit=1"
+        first_page = self.client.get(url)
+        self.assertEqual(first_page.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(first_page.data["results"]), 1)
+        self.assertNotIn("count", first_page.data)
+
+        second_page = self.client.get(first_page.data["next"])
+        self.assertEqual(second_page.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(second_page.data["results"]), 1)
+        self.assertNotEqual(
+            first_page.data["results"][0]["id"],
+            second_page.data["results"][0]["id"],
+        )
+
+    def test_cursor_pages_through_same_day_borrowings(self):
+        for days in range(3, 8):
+            Borrowing.objects.create(
+                user=self.user,
+                book=self.book,
+                expected_return_date=timezone.now()
+                + timezone.timedelta(days=days),
+            )
+        expected = list(
+            Borrowing.objects.order_by("-id").values_list("id", flat=True)
+        )
+
+        seen = []
+        url = reverse("borrowing:borrowing-list") + "?limit=2"
+        while url:
+            response = self.client.get(url)
+            seen.extend(row["id"] for row in response.data["results"])
+            url = response.data["next"]
+            if url:
+                cursor = parse_qs(urlparse(url).query)["cursor"][0]
+                # Positioned by id alone, never by an offset into ties.
+                self.assertNotIn("o=", b64decode(cursor).decode())
+
+        self.assertEqual(seen, expected)
+
+    def test_list_cache_invalidated_on_new_borrowing(self):
+        url = reverse("borrowing:borrowing-list")
+        response = self.client.get(url)
+        self.assertEqual(len(response.data["results"]), 2)
+
+        Borrowing.objects.create(
+            user=self.user,
+            book=self.book,
+            expected_return_date=timezone.now() + timezone.timedelta(days=3),
+        )
+        response = self.client.get(url)
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_list_cache_is_per_user(self):
+        url = reverse("borrowing:borrowing-list")
+        self.client.get(url)
+
+        other_user = User.objects.create_user(
+            first_name="Jane", last_name="Roe", email="other@gmail.com"
+        )
+        self.client.force_authenticate(user=other_user)
+        response = self.client.get(url)
+        self.assertEqual(len(response.data["results"]), 0)
+
+
+class BorrowingCreateTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            first_name="John", last_name="Dee", email="user@gmail.com"
+        )
+        self.book = Book.objects.create(
+            title="Sample Book",
+            author="Sample Author",
+            inventory=2,
+            daily_fee=3,
+        )
+        self.client.force_authenticate(user=self.user)
+
+    @patch("payment.checkout.async_task")
+    @patch("payment.checkout.stripe.checkout.Session.create")
+    def test_create_returns_pending_payment_without_calling_stripe(
+        self, mock_create, mock_task
+    ):
+        url = reverse("borrowing:borrowing-list")
+        data = {
+            "book": "Sample Book",
+            "expected_return_date": (
+                timezone.now().date() + timezone.timedelta(days=3)
+            ).isoformat(),
+        }
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        [payment] = response.data["payments"]
+        self.assertEqual(payment["status"], "PENDING")
+        self.assertEqual(payment["session_url"], "")
+        self.assertTrue(
+            CheckoutOutbox.objects.filter(payment_id=payment["id"]).exists()
+        )
+        mock_create.assert_not_called()
+        mock_task.assert_called_once_with(
+            "payment.checkout.process_checkout_outbox"
+        )
+
+
+    def borrow(self):
+        url = reverse("borrowing:borrowing-list")
+        data = {
+            "book": "Sample Book",
+            "expected_return_date": (
+                timezone.now().date() + timezone.timedelta(days=3)
+            ).isoformat(),
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(url, data, format="json")
+
+    @patch("payment.checkout.async_task")
+    def test_borrow_last_copy(self, mock_task):
+        Book.objects.filter(pk=self.book.pk).update(inventory=1)
+
+        response = self.borrow()
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.inventory, 0)
+
+    @patch("payment.checkout.async_task")
+    def test_borrow_last_copy_of_sharded_book(self, mock_task):
+        self.book.set_inventory_shards(2)
+        self.book.shards.filter(index=0).update(inventory=0)
+        self.book.shards.filter(index=1).update(inventory=1)
+
+        response = self.borrow()
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_inventory, 0)
+        self.assertEqual(Borrowing.objects.count(), 1)
+
+        # The shelf is empty now.
+        Payment.objects.update(status="PAID")
+        response = self.borrow()
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class BorrowingExportTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            email="admin@example.com", is_staff=True
+        )
+        self.user = User.objects.create_user(email="user@gmail.com")
+        self.other_user = User.objects.create_user(email="other@gmail.com")
+        self.book = Book.objects.create(
+            title="Sample Book",
+            author="Sample Author",
+            inventory=2,
+            daily_fee=3,
+        )
+        self.return_date = timezone.now().date() + timezone.timedelta(days=7)
+        self.borrowing = Borrowing.objects.create(
+            user=self.user,
+            book=self.book,
+            expected_return_date=self.return_date,
+        )
+        self.other_borrowing = Borrowing.objects.create(
+            user=self.other_user,
+            book=self.book,
+            expected_return_date=self.return_date,
+        )
+        self.url = reverse("borrowing:borrowing-export")
+
+    def export(self, query=""):
+        response = self.client.get(self.url + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b"".join(response.streaming_content).decode()
+
+    def test_export_is_admin_only(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_export_unknown_format(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(self.url + "?file_format=xml")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_csv(self):
+        self.client.force_authenticate(user=self.admin)
+        rows = list(csv.reader(io.StringIO(self.export())))
+
+        self.assertEqual(
+            rows[0],
+            [
+                "id",
+                "book",
+                "author",
+                "user",
+                "borrow_date",
+                "expected_return_date",
+                "actual_return_date",
+            ],
+        )
+        self.assertEqual(
+            rows[1],
+            [
+                str(self.borrowing.id),
+                "Sample Book",
+                "Sample Author",
+                "user@gmail.com",
+                self.borrowing.borrow_date.isoformat(),
+                self.return_date.isoformat(),
+                "",
+            ],
+        )
+        self.assertEqual(len(rows), 3)
+
+    def test_export_ndjson(self):
+        self.client.force_authenticate(user=self.admin)
+        rows = [
+            json.loads(line)
+            for line in self.export("?file_format=ndjson").splitlines()
+        ]
+
+        self.assertEqual(
+            [row["id"] for row in rows],
+            [self.borrowing.id, self.other_borrowing.id],
+        )
+        self.assertEqual(rows[0]["user"], "user@gmail.com")
+        self.assertEqual(
+            rows[0]["expected_return_date"], self.return_date.isoformat()
+        )
+        self.assertIsNone(rows[0]["actual_return_date"])
+
+    def test_export_filters_by_user_id(self):
+        self.client.force_authenticate(user=self.admin)
+        content = self.export(
+            f"?file_format=ndjson&user_id={self.other_user.id}"
+        )
+
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(
+            [row["id"] for row in rows], [self.other_borrowing.id]
+        )
@@ -0,0 +1,152 @@
+from datetime import timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from borrowing.bot_queries import (
+    CONVERSATION_TIMEOUT,
+    advance_conversation,
+    finish_conversation,
+    get_conversation,
+    start_conversation,
+)
+from notification.models import ChatConversation
+from telegram_bot import handle_registration_message, start
+from user.models import User
+
+
+async def run_in_test_thread(func, *args, **kwargs):
+    # The bot's pool threads have their own connections, which cannot see
+    # the test transaction; run on the test's thread instead.
+    return await sync_to_async(func)(*args, **kwargs)
+
+
+def make_update(chat_id, text):
+    update = MagicMock()
+    update.message.chat_id = chat_id
+    update.message.text = text
+    update.message.reply_text = AsyncMock()
+    return update
+
+
+class ConversationTests(TestCase):
+    def test_start_resets_the_conversation(self):
+        start_conversation("100", "EMAIL")
+        advance_conversation("100", "FIRST_NAME", email="a@example.com")
+
+        start_conversation("100", "EMAIL")
+
+        conversation = get_conversation("100")
+        self.assertEqual(conversation.state, "EMAIL")
+        self.assertEqual(conversation.data, {})
+
+    def test_advance_merges_values(self):
+        start_conversation("100", "EMAIL")
+        advance_conversation("100", "FIRST_NAME", email="a@example.com")
+        advance_conversation("100", "LAST_NAME", first_name="Ann")
+
+        conversation = get_conversation("100")
+        self.assertEqual(conversation.state, "LAST_NAME")
+        self.assertEqual(
+            conversation.data, {"email": "a@example.com", "first_name": "Ann"}
+        )
+
+    def test_finish_deletes_and_returns_the_data(self):
+        start_conversation("100", "EMAIL")
+        advance_conversation("100", "FIRST_NAME", email="a@example.com")
+
+        data = finish_conversation("100", last_name="Lee")
+
+        self.assertEqual(data, {"email": "a@example.com", "last_name": "Lee"})
+        self.assertFalse(ChatConversation.objects.exists())
+        self.assertIsNone(finish_conversation("100", last_name="Lee"))
+
+    def test_chat_without_conversation(self):
+        self.assertIsNone(get_conversation("100"))
+        self.assertIsNone(advance_conversation("100", "FIRST_NAME"))
+        self.assertIsNone(finish_conversation("100"))
+
+    def test_abandoned_conversation_expires(self):
+        start_conversation("100", "EMAIL")
+        ChatConversation.objects.update(
+            updated_at=timezone.now()
+            - CONVERSATION_TIMEOUT
+            - timedelta(minutes=1)
+        )
+
+        self.assertIsNone(get_conversation("100"))
+
+
+@patch("borrowing.bot_queries.run_query", run_in_test_thread)
+class RegistrationFlowTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="reader@example.com",
+            password="password",
+            first_name="Ann",
+            last_name="Lee",
+        )
+
+    def send(self, text, handler=handle_registration_message):
+        # A fresh update and context for every message, as when each one
+        # reaches a different bot worker.
+        update = make_update(12345, text)
+        async_to_sync(handler)(update, MagicMock())
+        return update.message.reply_text
+
+    def test_registration_resumes_across_handlers(self):
+        self.send("/start", handler=start).assert_awaited_once_with(
+            "Hello! Please send me your email."
+        )
+        self.send("reader@example.com").assert_awaited_once_with(
+            "Now, please send your first name."
+        )
+        self.send("Ann").assert_awaited_once_with(
+            "Now, please send your last name."
+        )
+        self.send("Lee").assert_awaited_once_with(
+            "Thank you! Your chat ID has been saved."
+        )
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.telegram_chat_id, 12345)
+        self.assertFalse(ChatConversation.objects.exists())
+
+    def test_conversation_started_by_another_process_is_resumed(self):
+        ChatConversation.objects.create(
+            chat_id="12345",
+            state="LAST_NAME",
+            data={"email": "reader@example.com", "first_name": "Ann"},
+        )
+
+        self.send("Lee").assert_awaited_once_with(
+            "Thank you! Your chat ID has been saved."
+        )
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.telegram_chat_id, 12345)
+
+    def test_unknown_email_is_not_linked(self):
+        self.send("/start", handler=start)
+        self.send("nobody@example.com")
+        self.send("Ann")
+
+        self.send("Lee").assert_awaited_once_with(
+            "Sorry, I couldn't find that email."
+        )
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.telegram_chat_id)
+
+    def test_messages_outside_a_conversation_are_ignored(self):
+        self.send("hello").assert_not_awaited()
+
+        start_conversation("12345", "EMAIL")
+        ChatConversation.objects.update(
+            updated_at=timezone.now()
+            - CONVERSATION_TIMEOUT
+            - timedelta(minutes=1)
+        )
+        self.send("reader@example.com").assert_not_awaited()
@@ -0,0 +1,221 @@
+import math
+import threading
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import QueryDict
+from django.test import SimpleTestCase
+from rest_framework.response import Response
+
+from borrowing.cache import (
+    REBUILD_WAIT,
+    STALE_TIMEOUT,
+    cache_per_user,
+    list_cache_key,
+    should_refresh,
+    wait_for_rebuild,
+)
+
+
+class Clock:
+    """Stands in for the time module; sleep() advances the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.on_sleep = None
+
+    def time(self):
+        return self.now
+
+    monotonic = time
+
+    def sleep(self, seconds):
+        self.now += seconds
+        if self.on_sleep:
+            self.on_sleep()
+
+
+class ListView:
+    def __init__(self):
+        self.calls = 0
+        self.status = 200
+        self.before_build = None
+
+    @cache_per_user("borrowing", timeout=60)
+    def list(self, request):
+        self.calls += 1
+        calls = self.calls
+        if self.before_build:
+            self.before_build()
+        return Response({"results": [calls]}, status=self.status)
+
+
+class ListCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.cache = LocMemCache("borrowing-list-cache-tests", {})
+        self.cache.clear()
+        for target, value in (
+            ("borrowing.cache.time", self.clock),
+            ("borrowing.cache.cache", self.cache),
+            # No jitter: entries are refreshed exactly when they expire.
+            ("borrowing.cache.random.random", lambda: 0.0),
+        ):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.view = ListView()
+        self.request = SimpleNamespace(
+            user=SimpleNamespace(pk=1, is_staff=False),
+            path="/api/borrowings/",
+            query_params=QueryDict(""),
+        )
+
+    def get(self):
+        return self.view.list(self.request).data["results"]
+
+    def key(self):
+        return list_cache_key("borrowing", self.request)
+
+    def lock(self):
+        self.cache.add(f"{self.key()}:rebuild", True, 30)
+
+
+class ShouldRefreshTests(ListCacheTestCase):
+    def test_refreshes_at_expiry_without_jitter(self):
+        entry = {"expires_at": 1060.0, "build_time": 2.0}
+        self.assertFalse(should_refresh(entry, 1059.9))
+        self.assertTrue(should_refresh(entry, 1060.0))
+
+    def test_slow_builds_refresh_early(self):
+        # A jitter of exactly 1.
+        with patch("borrowing.cache.random.random", lambda: 1 - 1 / math.e):
+            self.assertTrue(
+                should_refresh(
+                    {"expires_at": 1060.0, "build_time": 2.0}, 1058.0
+                )
+            )
+            self.assertFalse(
+                should_refresh(
+                    {"expires_at": 1060.0, "build_time": 0.5}, 1058.0
+                )
+            )
+
+
+class WaitForRebuildTests(ListCacheTestCase):
+    def test_returns_the_entry_once_rebuilt(self):
+        entry = {"data": {"results": [1]}}
+        self.clock.on_sleep = lambda: self.cache.set("key", entry)
+
+        self.assertEqual(wait_for_rebuild("key"), entry)
+        self.assertLess(self.clock.now - 1000.0, REBUILD_WAIT)
+
+    def test_gives_up_after_the_wait(self):
+        self.assertIsNone(wait_for_rebuild("key"))
+        self.assertGreaterEqual(self.clock.now - 1000.0, REBUILD_WAIT)
+
+
+class CachePerUserTests(ListCacheTestCase):
+    def test_fresh_entry_is_served_from_cache(self):
+        self.assertEqual(self.get(), [1])
+        self.clock.now += 59
+        self.assertEqual(self.get(), [1])
+        self.assertEqual(self.view.calls, 1)
+
+    def test_expired_entry_is_rebuilt(self):
+        with patch.object(self.cache, "set", wraps=self.cache.set) as set_:
+            self.get()
+            self.clock.now += 60
+            self.assertEqual(self.get(), [2])
+
+        entry = self.cache.get(self.key())
+        self.assertEqual(entry["expires_at"], self.clock.now + 60)
+        # Kept past its expiry, so it can be served while being rebuilt.
+        self.assertEqual(set_.call_args.args[2], 60 + STALE_TIMEOUT)
+
+    def test_entry_is_refreshed_early_by_chance(self):
+        self.get()
+        self.clock.now += 58
+        with patch("borrowing.cache.random.random", lambda: 0.99):
+            # Simulate a build that took two seconds.
+            entry = self.cache.get(self.key())
+            entry["build_time"] = 2.0
+            self.cache.set(self.key(), entry)
+            self.assertEqual(self.get(), [2])
+
+    def test_stale_entry_is_served_while_another_worker_rebuilds(self):
+        self.get()
+        self.clock.now += 60
+        self.lock()
+
+        self.assertEqual(self.get(), [1])
+        self.assertEqual(self.view.calls, 1)
+
+    def test_missing_entry_waits_for_the_rebuild(self):
+        self.lock()
+        rebuilt = {"data": {"results": ["rebuilt"]}}
+        self.clock.on_sleep = lambda: self.cache.set(self.key(), rebuilt)
+
+        self.assertEqual(self.get(), ["rebuilt"])
+        self.assertEqual(self.view.calls, 0)
+
+    def test_wait_timeout_falls_back_to_the_view(self):
+        self.lock()
+
+        self.assertEqual(self.get(), [1])
+        self.assertGreaterEqual(self.clock.now - 1000.0, REBUILD_WAIT)
+        # Only the lock holder stores the entry.
+        self.assertIsNone(self.cache.get(self.key()))
+
+    def test_lock_is_released_after_a_failed_rebuild(self):
+        self.view.status = 500
+
+        self.get()
+
+        self.assertIsNone(self.cache.get(self.key()))
+        self.assertTrue(self.cache.add(f"{self.key()}:rebuild", True))
+
+    def start_rebuild(self):
+        """Starts a request that blocks inside the view until released."""
+        building = threading.Event()
+        release = threading.Event()
+
+        def before_build():
+            building.set()
+            release.wait(5)
+
+        self.view.before_build = before_build
+        results = []
+        builder = threading.Thread(target=lambda: results.append(self.get()))
+        builder.start()
+        self.assertTrue(building.wait(5))
+        self.view.before_build = None
+        return builder, release, results
+
+    def test_only_one_request_rebuilds_an_expired_entry(self):
+        self.get()
+        self.clock.now += 60
+        builder, release, results = self.start_rebuild()
+
+        stale = [self.get() for _ in range(5)]
+        release.set()
+        builder.join(5)
+
+        self.assertEqual(stale, [[1]] * 5)
+        self.assertEqual(results, [[2]])
+        self.assertEqual(self.view.calls, 2)
+        self.assertEqual(self.get(), [2])
+
+    def test_only_one_request_builds_a_missing_entry(self):
+        builder, release, results = self.start_rebuild()
+
+        def finish_rebuild():
+            release.set()
+            builder.join(5)
+
+        self.clock.on_sleep = finish_rebuild
+
+        self.assertEqual([self.get() for _ in range(5)], [[1]] * 5)
+        self.assertEqual(results, [[1]])
+        self.assertEqual(self.view.calls, 1)
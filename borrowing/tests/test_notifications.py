@@ -0,0 +1,53 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.utils import timezone
+
+from borrowing.models import Borrowing
+from borrowing.signals import notify_users_about_upcoming_borrowing
+from library.models import Book
+from user.models import User
+
+
+class UpcomingBorrowingNotificationTests(TestCase):
+    def setUp(self):
+        today = timezone.now().date()
+        self.first_book = Book.objects.create(
+            title="First", author="Author", inventory=5, daily_fee=1
+        )
+        self.second_book = Book.objects.create(
+            title="Second", author="Author", inventory=5, daily_fee=1
+        )
+        self.user = User.objects.create_user(
+            email="user@example.com", password="password", telegram_chat_id=1
+        )
+        User.objects.create_user(
+            email="idle@example.com", password="password", telegram_chat_id=2
+        )
+        Borrowing.objects.create(
+            user=self.user,
+            book=self.second_book,
+            expected_return_date=today + timedelta(days=5),
+        )
+        Borrowing.objects.create(
+            user=self.user,
+            book=self.first_book,
+            expected_return_date=today + timedelta(days=2),
+        )
+        Borrowing.objects.create(
+            user=self.user,
+            book=self.second_book,
+            expected_return_date=today + timedelta(days=1),
+            actual_return_date=today,
+        )
+
+    @patch("borrowing.signals.enqueue_deliveries", side_effect=len)
+    def test_one_reminder_per_user_for_nearest_borrowing(self, mock_enqueue):
+        with self.assertNumQueries(1):
+            queued = notify_users_about_upcoming_borrowing()
+
+        self.assertEqual(queued, 1)
+        [(chat_id, message)] = mock_enqueue.call_args.args[0]
+        self.assertEqual(chat_id, 1)
+        self.assertIn("Book: First", message)
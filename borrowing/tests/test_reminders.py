@@ -0,0 +1,56 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.utils import timezone
+
+from borrowing.models import Borrowing, DueReminder
+from borrowing.reminders import fire_due_reminders
+from library.models import Book
+from user.models import User
+
+
+class DueReminderTests(TestCase):
+    def setUp(self):
+        self.today = timezone.now().date()
+        self.book = Book.objects.create(
+            title="Dune", author="Frank Herbert", inventory=5, daily_fee=1
+        )
+        self.user = User.objects.create_user(
+            email="user@example.com", password="password", telegram_chat_id=1
+        )
+        self.borrowing = Borrowing.objects.create(
+            user=self.user,
+            book=self.book,
+            expected_return_date=self.today + timedelta(days=3),
+        )
+
+    def test_borrowing_is_filed_into_buckets(self):
+        reminders = dict(
+            DueReminder.objects.values_list("kind", "fire_on")
+        )
+        self.assertEqual(
+            reminders,
+            {
+                "UPCOMING": self.today + timedelta(days=2),
+                "OVERDUE": self.today + timedelta(days=3),
+            },
+        )
+
+    def test_return_cancels_reminders(self):
+        self.borrowing.return_borrowing()
+
+        self.assertFalse(DueReminder.objects.exists())
+
+    @patch("borrowing.reminders.enqueue_deliveries")
+    def test_fire_due_reminders(self, mock_enqueue):
+        DueReminder.objects.update(fire_on=self.today)
+
+        self.assertEqual(fire_due_reminders(), 2)
+
+        messages = list(mock_enqueue.call_args.args[0])
+        self.assertEqual(len(messages), 2)
+        overdue = DueReminder.objects.get()
+        self.assertEqual(overdue.kind, "OVERDUE")
+        self.assertEqual(overdue.fire_on, self.today + timedelta(days=1))
+        self.assertEqual(fire_due_reminders(), 0)
@@ -0,0 +1,88 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from borrowing.models import Borrowing
+from borrowing.reports import (
+    REPORT_FIELD_LIMIT,
+    TELEGRAM_MESSAGE_LIMIT,
+    format_borrowings_page,
+    get_borrowings_page,
+)
+from library.models import Book
+from user.models import User
+
+
+class BorrowingsPageTests(TestCase):
+    def setUp(self):
+        today = timezone.now().date()
+        book = Book.objects.create(
+            title="Dune", author="Frank Herbert", inventory=10, daily_fee=1
+        )
+        user = User.objects.create_user(
+            email="user@example.com", password="password"
+        )
+        self.borrowings = [
+            Borrowing.objects.create(
+                user=user,
+                book=book,
+                expected_return_date=today + timedelta(days=index),
+            )
+            for index in range(5)
+        ]
+
+    def test_keyset_pages(self):
+        first = get_borrowings_page(page_size=2)
+        self.assertEqual(first["borrowings"], self.borrowings[:2])
+        self.assertFalse(first["has_previous"])
+        self.assertTrue(first["has_next"])
+
+        second = get_borrowings_page(
+            after_id=first["borrowings"][-1].id, page_size=2
+        )
+        self.assertEqual(second["borrowings"], self.borrowings[2:4])
+
+        back = get_borrowings_page(
+            before_id=second["borrowings"][0].id, page_size=2
+        )
+        self.assertEqual(back["borrowings"], self.borrowings[:2])
+        self.assertFalse(back["has_previous"])
+
+    def test_overdue_filter(self):
+        page = get_borrowings_page("overdue")
+
+        self.assertEqual(page["borrowings"], self.borrowings[:1])
+
+
+class FormatBorrowingsPageTests(SimpleTestCase):
+    def make_page(self, count, title="Dune", email="user@example.com"):
+        today = timezone.now().date()
+        return {
+            "borrowings": [
+                SimpleNamespace(
+                    id=index,
+                    user=SimpleNamespace(email=email),
+                    book=SimpleNamespace(title=title),
+                    expected_return_date=today,
+                    actual_return_date=today,
+                )
+                for index in range(count)
+            ]
+        }
+
+    def test_long_titles_and_emails_are_shortened(self):
+        message = format_borrowings_page(
+            self.make_page(10, title="T" * 1000, email="e" * 300 + "@x.com")
+        )
+
+        self.assertLessEqual(len(message), TELEGRAM_MESSAGE_LIMIT)
+        self.assertIn("T" * (REPORT_FIELD_LIMIT - 1) + "…\n", message)
+        self.assertEqual(message.count("• Book:"), 10)
+
+    def test_message_never_exceeds_the_telegram_limit(self):
+        message = format_borrowings_page(self.make_page(100))
+
+        self.assertEqual(len(message), TELEGRAM_MESSAGE_LIMIT)
+        self.assertTrue(message.endswith("…"))
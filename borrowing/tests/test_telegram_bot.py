@@ -6,6 +6,7 @@ from telegram import Update, Message
 from telegram.ext import ContextTypes
 from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "library_service.settings")
 
@@ -22,11 +23,19 @@ from telegram_bot import (
     get_last_name,
     command_all_borrowings,
     command_upcoming_borrowings,
+    inline_book_search,
 )
+from library.catalog_index import IndexedBook
 
 User = get_user_model()
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Chat to user lookups are cached between commands.
+    cache.clear()
+
+
 @pytest.fixture
 def mock_update():
     return AsyncMock(Update)
@@ -40,94 +49,122 @@ def mock_context():
 
 
 @pytest.mark.asyncio
-@patch("telegram_bot.User.objects.filter")
-async def test_start(mock_user_filter, mock_update, mock_context):
+@patch("telegram_bot.astart_conversation", new_callable=AsyncMock)
+async def test_start(mock_start_conversation, mock_update, mock_context):
     mock_update.message = AsyncMock(Message)
     mock_update.message.chat_id = 12345
     mock_update.message.text = "test@example.com"
-    mock_user_filter.return_value.first.return_value = None
 
     await start(mock_update, mock_context)
+    mock_start_conversation.assert_called_once_with(12345, "EMAIL")
     mock_update.message.reply_text.assert_called_with(
         "Hello! Please send me your email."
     )
 
 
 @pytest.mark.asyncio
-@patch("telegram_bot.User.objects.filter")
-async def test_get_email(mock_user_filter, mock_update, mock_context):
+@patch("telegram_bot.aadvance_conversation", new_callable=AsyncMock)
+async def test_get_email(mock_advance_conversation, mock_update, mock_context):
     mock_update.message = AsyncMock(Message)
     mock_update.message.text = "test@example.com"
     mock_update.message.chat_id = 12345
-    mock_user_filter.return_value.first.return_value = None
 
     await get_email(mock_update, mock_context)
+    mock_advance_conversation.assert_called_once_with(
+        12345, "FIRST_NAME", email="test@example.com"
+    )
     mock_update.message.reply_text.assert_called_with(
         "Now, please send your first name."
     )
 
 
 @pytest.mark.asyncio
-@patch("telegram_bot.User.objects.filter")
-async def test_get_first_name(mock_user_filter, mock_update, mock_context):
+@patch("telegram_bot.aadvance_conversation", new_callable=AsyncMock)
+async def test_get_first_name(
+    mock_advance_conversation, mock_update, mock_context
+):
     mock_update.message = AsyncMock(Message)
     mock_update.message.text = "John"
     mock_update.message.chat_id = 12345
-    mock_user_filter.return_value.first.return_value = None
 
     await get_first_name(mock_update, mock_context)
+    mock_advance_conversation.assert_called_once_with(
+        12345, "LAST_NAME", first_name="John"
+    )
     mock_update.message.reply_text.assert_called_with(
         "Now, please send your last name."
     )
 
 
 @pytest.mark.asyncio
-@patch("telegram_bot.User.objects.filter")
-async def test_get_last_name(mock_user_filter, mock_update, mock_context):
+@patch("telegram_bot.afinish_conversation", new_callable=AsyncMock)
+@patch("telegram_bot.afind_user", new_callable=AsyncMock)
+async def test_get_last_name(
+    mock_find_user, mock_finish_conversation, mock_update, mock_context
+):
     mock_update.message = AsyncMock(Message)
     mock_update.message.text = "Doe"
     mock_update.message.chat_id = 12345
-    mock_user_filter.return_value.first.return_value = None
+    mock_finish_conversation.return_value = {
+        "email": "test@example.com",
+        "first_name": "John",
+        "last_name": "Doe",
+    }
+    mock_find_user.return_value = None
 
     await get_last_name(mock_update, mock_context)
+    mock_find_user.assert_awaited_once_with("test@example.com", "John", "Doe")
     mock_update.message.reply_text.assert_called_with(
         "Sorry, I couldn't find that email."
     )
 
 
 @pytest.mark.asyncio
-@patch("telegram_bot.check_all_borrowings")
-@patch("telegram_bot.User.objects.filter")
+@patch("borrowing.bot_queries.get_borrowings_page")
+@patch("telegram_bot.aget_user_by_chat_id", new_callable=AsyncMock)
 async def test_command_all_borrowings(
-    mock_user_filter, mock_check_all_borrowings, mock_update, mock_context
+    mock_get_user, mock_get_borrowings_page, mock_update, mock_context
 ):
     mock_update.message = AsyncMock(Message)
     mock_update.message.chat_id = 12345
-    mock_user_filter.return_value.first.return_value = await sync_to_async(
-        User
-    )(email="admin@example.com", is_staff=True, telegram_chat_id=12345)
-    mock_check_all_borrowings.return_value = "All borrowings message"
+    mock_context.args = ["overdue"]
+    mock_get_user.return_value = User(
+        email="admin@example.com", is_staff=True, telegram_chat_id=12345
+    )
+    borrowing = MagicMock(id=7, actual_return_date=None)
+    borrowing.user.email = "user@example.com"
+    borrowing.book.title = "Book 1"
+    borrowing.expected_return_date = timezone.now().date()
+    mock_get_borrowings_page.return_value = {
+        "borrowings": [borrowing],
+        "has_previous": False,
+        "has_next": True,
+    }
 
     await command_all_borrowings(mock_update, mock_context)
-    mock_context.bot.send_message.assert_called_with(
-        chat_id=12345, text="All borrowings message"
-    )
+
+    mock_get_borrowings_page.assert_called_once_with("overdue")
+    kwargs = mock_context.bot.send_message.call_args.kwargs
+    assert kwargs["chat_id"] == 12345
+    assert "Book: Book 1" in kwargs["text"]
+    [next_button] = kwargs["reply_markup"].inline_keyboard[1]
+    assert next_button.callback_data == "borrowings:overdue:after:7"
 
 
 @pytest.mark.asyncio
-@patch("telegram_bot.get_user_upcoming_borrowings")
-@patch("telegram_bot.User.objects.filter")
+@patch("borrowing.bot_queries.get_user_upcoming_borrowings")
+@patch("telegram_bot.aget_user_by_chat_id", new_callable=AsyncMock)
 async def test_command_upcoming_borrowings(
-    mock_user_filter,
+    mock_get_user,
     mock_get_user_upcoming_borrowings,
     mock_update,
     mock_context,
 ):
     mock_update.message = AsyncMock(Message)
     mock_update.message.chat_id = 12345
-    mock_user_filter.return_value.first.return_value = await sync_to_async(
-        User
-    )(email="user@example.com", is_staff=False, telegram_chat_id=12345)
+    mock_get_user.return_value = User(
+        email="user@example.com", is_staff=False, telegram_chat_id=12345
+    )
     mock_get_user_upcoming_borrowings.return_value = (
         "Upcoming borrowings message"
     )
@@ -141,47 +178,24 @@ async def test_command_upcoming_borrowings(
 @pytest.mark.asyncio
 @patch("borrowing.signals.timezone")
 @patch("borrowing.signals.Borrowing.objects.filter")
-@patch("borrowing.signals.async_task", new_callable=AsyncMock)
-@patch("borrowing.signals.send_telegram_message", new_callable=AsyncMock)
-@patch("borrowing.signals.User.objects.exclude")
+@patch("borrowing.signals.enqueue_deliveries")
 async def test_check_overdue_borrowings(
-    mock_user_exclude,
-    mock_send_telegram_message,
-    mock_async_task,
+    mock_enqueue_deliveries,
     mock_borrowing_filter,
     mock_timezone,
 ):
     today = timezone.now().date()
     mock_timezone.now.return_value.date.return_value = today
+    mock_enqueue_deliveries.side_effect = len
 
-    mock_borrowing_1 = MagicMock()
-    mock_borrowing_1.book.title = "Book 1"
-    mock_borrowing_1.book.author = "Author 1"
-    mock_borrowing_1.expected_return_date = today
-    mock_borrowing_1.actual_return_date = None
-    mock_user_1 = MagicMock()
-    mock_user_1.email = "user1@example.com"
-    mock_user_1.telegram_chat_id = "chat_id_1"
-    mock_borrowing_1.user = mock_user_1
-
-    mock_borrowing_2 = MagicMock()
-    mock_borrowing_2.book.title = "Book 2"
-    mock_borrowing_2.book.author = "Author 2"
-    mock_borrowing_2.expected_return_date = today
-    mock_borrowing_2.actual_return_date = None
-    mock_user_2 = MagicMock()
-    mock_user_2.email = "user2@example.com"
-    mock_user_2.telegram_chat_id = "chat_id_2"
-    mock_borrowing_2.user = mock_user_2
-
-    mock_borrowing_queryset = MagicMock()
-    mock_borrowing_queryset.exists.return_value = True
-    mock_borrowing_queryset.__iter__.return_value = iter(
-        [mock_borrowing_1, mock_borrowing_2]
-    )
-    mock_borrowing_filter.return_value = mock_borrowing_queryset
+    rows = [
+        ("chat_id_1", "Book 1", "Author 1", today),
+        ("chat_id_2", "Book 2", "Author 2", today),
+    ]
+    mock_borrowing_filter.return_value.values_list.return_value\
+        .iterator.return_value = iter(rows)
 
-    await sync_to_async(check_overdue_borrowings)()
+    queued = await sync_to_async(check_overdue_borrowings)()
 
     expected_message_1 = (
         "⚠️ Reminder: Your borrowing is overdue!\n\n"
@@ -196,11 +210,51 @@ async def test_check_overdue_borrowings(
         "   • Due Date: {}\n".format(today.strftime("%d %B %Y"))
     )
 
-    print(mock_async_task.call_args_list)
+    assert queued == 2
+    mock_enqueue_deliveries.assert_called_once_with(
+        [
+            ("chat_id_1", expected_message_1),
+            ("chat_id_2", expected_message_2),
+        ]
+    )
+
 
-    mock_async_task.assert_any_call(
-        mock_send_telegram_message, "chat_id_1", expected_message_1
+@pytest.mark.asyncio
+@patch("telegram_bot.asearch_catalog", new_callable=AsyncMock)
+async def test_inline_book_search(mock_search, mock_update, mock_context):
+    mock_update.inline_query = AsyncMock()
+    mock_update.inline_query.query = "dune"
+    mock_search.return_value = [
+        IndexedBook(
+            1, "Dune", "Frank Herbert", 2, frozenset(), ("dune", 1)
+        ),
+        IndexedBook(
+            2, "Dune Messiah", "Frank Herbert", 0, frozenset(), ("dune", 2)
+        ),
+    ]
+
+    await inline_book_search(mock_update, mock_context)
+
+    mock_search.assert_awaited_once_with("dune")
+    [results], kwargs = mock_update.inline_query.answer.call_args
+    assert [result.id for result in results] == ["1", "2"]
+    assert results[0].description == "Frank Herbert · ✅ 2 available"
+    assert results[1].input_message_content.message_text == (
+        "📖 Dune Messiah\n👤 Frank Herbert\n❌ Not available"
     )
-    mock_async_task.assert_any_call(
-        mock_send_telegram_message, "chat_id_2", expected_message_2
+
+
+@pytest.mark.asyncio
+@patch("telegram_bot.asearch_catalog", new_callable=AsyncMock)
+async def test_inline_book_search_empty_query(
+    mock_search, mock_update, mock_context
+):
+    mock_update.inline_query = AsyncMock()
+    mock_update.inline_query.query = " "
+
+    await inline_book_search(mock_update, mock_context)
+
+    mock_search.assert_not_awaited()
+    mock_update.inline_query.answer.assert_awaited_once_with(
+        [], cache_time=10
     )
@@ -1,13 +1,14 @@
 from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
 from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action
-from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from django.utils import timezone
 from django.apps import apps
+from django.db import transaction
 
+from borrowing.cache import cache_per_user
 from borrowing.models import Borrowing
+from borrowing.pagination import BorrowingCursorPagination
 from borrowing.schemas import BorrowingSchema
 from borrowing.serializers import (
     BorrowingSerializer,
@@ -16,7 +17,19 @@ from borrowing.serializers import (
     BorrowingCreateSerializer,
     BorrowingReturnSerializer,
 )
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from library_service.export import EXPORT_FORMATS, export_response
+from payment.checkout import queue_checkout_session
+
+BORROWING_EXPORT_FIELDS = {
+    "id": "id",
+    "book": "book__title",
+    "author": "book__author",
+    "user": "user__email",
+    "borrow_date": "borrow_date",
+    "expected_return_date": "expected_return_date",
+    "actual_return_date": "actual_return_date",
+}
 
 
 @method_decorator(name="list", decorator=BorrowingSchema.list_schema)
@@ -24,6 +37,7 @@ from rest_framework.permissions import IsAuthenticated
 @method_decorator(
     name="return_borrowing", decorator=BorrowingSchema.return_borrowing
 )
+@method_decorator(name="export", decorator=BorrowingSchema.export)
 class BorrowingViewSet(
     mixins.ListModelMixin,
     mixins.CreateModelMixin,
@@ -32,9 +46,13 @@ class BorrowingViewSet(
 ):
     serializer_class = BorrowingSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = BorrowingCursorPagination
 
     def get_queryset(self):
-        queryset = Borrowing.objects.all().select_related("book", "user")
+        queryset = (
+            Borrowing.objects.select_related("book", "user")
+            .defer("book__search_vector")
+        )
         is_active = self.request.query_params.get("is_active")
         user = self.request.user
 
@@ -102,13 +120,26 @@ class BorrowingViewSet(
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def perform_create(self, serializer):
-        borrowing = serializer.save()
-        try:
-            borrowing.create_stripe_session()
-        except Exception as e:
-            borrowing.delete()
-            raise ValidationError(f"Error creating Stripe session: {e}")
-
-    @method_decorator(cache_page(60 * 60))
+        # The Stripe checkout session is created by a worker after commit;
+        # the response carries the pending payment for the client to poll.
+        with transaction.atomic():
+            borrowing = serializer.save()
+            queue_checkout_session(borrowing)
+
+    @cache_per_user("borrowing")
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
+
+    @action(detail=False, methods=["GET"], permission_classes=[IsAdminUser])
+    def export(self, request):
+        file_format = request.query_params.get("file_format", "csv")
+        if file_format not in EXPORT_FORMATS:
+            return Response(
+                {"error": f"Unsupported file format: {file_format}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        queryset = self.get_queryset().order_by("id")
+        return export_response(
+            queryset, BORROWING_EXPORT_FIELDS, file_format, "borrowings"
+        )
@@ -0,0 +1,55 @@
+import hashlib
+import uuid
+
+from django.core.cache import cache
+from django.views.decorators.http import condition
+
+CATALOG_VERSION_KEY = "library:catalog_version"
+CATALOG_SEQUENCE_KEY = "library:catalog_sequence"
+# Change entries only need to outlive the slowest in-process catalog index
+# refresh; an index that falls further behind rebuilds from scratch.
+CATALOG_CHANGE_TIMEOUT = 60 * 60
+FULL_RELOAD = "*"
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(CATALOG_VERSION_KEY, "")
+    return version
+
+
+def catalog_change_key(sequence):
+    return f"library:catalog_change:{sequence}"
+
+
+def get_catalog_sequence():
+    return cache.get(CATALOG_SEQUENCE_KEY, 0)
+
+
+def touch_catalog(*book_ids):
+    """Marks the catalog as changed. Passing the ids of the changed books
+    lets in-process indexes reload just those books; without ids they
+    rebuild completely."""
+    cache.set(CATALOG_VERSION_KEY, uuid.uuid4().hex, None)
+    cache.add(CATALOG_SEQUENCE_KEY, 0, None)
+    sequence = cache.incr(CATALOG_SEQUENCE_KEY)
+    cache.set(
+        catalog_change_key(sequence),
+        list(book_ids) or FULL_RELOAD,
+        CATALOG_CHANGE_TIMEOUT,
+    )
+
+
+def catalog_etag(request, *args, **kwargs):
+    key = (
+        f"{get_catalog_version()}:{request.get_full_path()}:"
+        f"{request.META.get('HTTP_ACCEPT', '')}"
+    )
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+# Validated by ETag alone: Last-Modified has one-second resolution, so a
+# change in the same second as a cached response would still get a 304.
+catalog_condition = condition(etag_func=catalog_etag)
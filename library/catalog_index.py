@@ -0,0 +1,236 @@
+import bisect
+import heapq
+import re
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+from django.core.cache import cache
+
+from library.catalog import (
+    FULL_RELOAD,
+    catalog_change_key,
+    get_catalog_sequence,
+)
+from library.models import Book
+
+# Prefixes are indexed up to this length; longer query tokens are matched
+# by filtering the candidates of their first MAX_PREFIX characters.
+MAX_PREFIX = 10
+# The shared change sequence is checked at most this often, so a burst of
+# keystrokes costs one cache lookup rather than one per query.
+REFRESH_INTERVAL = 1
+# An index further behind than this rebuilds instead of replaying changes.
+MAX_REPLAYED_CHANGES = 500
+
+TOKEN_RE = re.compile(r"\w+")
+
+IndexedBook = namedtuple(
+    "IndexedBook", "id title author inventory tokens sort_key"
+)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.casefold())
+
+
+def load_books(book_ids=None):
+    books = Book.objects.with_shard_inventory()
+    if book_ids is not None:
+        books = books.filter(pk__in=book_ids)
+    rows = books.values_list(
+        "id",
+        "title",
+        "author",
+        "inventory",
+        "inventory_shards",
+        "shard_inventory",
+    )
+    for book_id, title, author, inventory, shards, shard_inventory in (
+        rows.iterator()
+    ):
+        yield IndexedBook(
+            book_id,
+            title,
+            author or "",
+            (shard_inventory or 0) if shards else inventory,
+            frozenset(tokenize(f"{title} {author or ''}")),
+            (title.casefold(), book_id),
+        )
+
+
+class CatalogIndex:
+    """In-process title/author prefix index over the whole catalog.
+
+    Every Book change is recorded by touch_catalog in a shared sequence of
+    cache entries; refresh() replays the entries this process has not seen
+    yet and reloads only the affected books, falling back to a full rebuild
+    when entries have expired or a change did not name its books.
+    """
+
+    def __init__(self):
+        self._books = {}
+        self._prefixes = defaultdict(set)
+        self._ordered = []
+        self._sequence = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._books)
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < REFRESH_INTERVAL:
+            return
+        with self._refresh_lock:
+            self._checked_at = now
+            # Read the sequence before loading, so changes committed while
+            # loading are replayed on the next refresh.
+            sequence = get_catalog_sequence()
+            if sequence == self._sequence:
+                return
+            book_ids = self._changed_book_ids(sequence)
+            if book_ids is None:
+                self._rebuild()
+            else:
+                self._reload(book_ids)
+            self._sequence = sequence
+
+    def search(self, query, limit=10):
+        tokens = set(tokenize(query))
+        if not tokens:
+            return []
+        title_prefix = query.strip().casefold()
+        long_tokens = [token for token in tokens if len(token) > MAX_PREFIX]
+        with self._lock:
+            matches = sorted(
+                (
+                    self._prefixes.get(token[:MAX_PREFIX], set())
+                    for token in tokens
+                ),
+                key=len,
+            )
+            candidates = matches[0]
+            for ids in matches[1:]:
+                if not candidates:
+                    break
+                candidates = candidates & ids
+            if long_tokens:
+                candidates = {
+                    book_id for book_id in candidates
+                    if all(
+                        any(
+                            word.startswith(token)
+                            for word in self._books[book_id].tokens
+                        )
+                        for token in long_tokens
+                    )
+                }
+            # Titles starting with the query come first, the rest follow
+            # in title order. Broad queries such as a single letter match
+            # much of the catalog, and walking the titles in order finds
+            # the first few matches sooner than sorting all of them.
+            if len(candidates) ** 2 > limit * len(self._books):
+                return self._first_in_title_order(
+                    candidates, title_prefix, limit
+                )
+            return heapq.nsmallest(
+                limit,
+                (self._books[book_id] for book_id in candidates),
+                key=lambda book: (
+                    not book.sort_key[0].startswith(title_prefix),
+                    book.sort_key,
+                ),
+            )
+
+    def _first_in_title_order(self, candidates, title_prefix, limit):
+        found = []
+        position = bisect.bisect_left(self._ordered, (title_prefix,))
+        while len(found) < limit and position < len(self._ordered):
+            title, book_id = self._ordered[position]
+            if not title.startswith(title_prefix):
+                break
+            if book_id in candidates:
+                found.append(book_id)
+            position += 1
+        prefixed = set(found)
+        for title, book_id in self._ordered:
+            if len(found) >= limit:
+                break
+            if book_id in candidates and book_id not in prefixed:
+                found.append(book_id)
+        return [self._books[book_id] for book_id in found]
+
+    def _changed_book_ids(self, sequence):
+        if self._sequence is None or sequence < self._sequence:
+            return None
+        if sequence - self._sequence > MAX_REPLAYED_CHANGES:
+            return None
+        keys = [
+            catalog_change_key(number)
+            for number in range(self._sequence + 1, sequence + 1)
+        ]
+        changes = cache.get_many(keys)
+        if len(changes) < len(keys):
+            return None
+        book_ids = set()
+        for change in changes.values():
+            if change == FULL_RELOAD:
+                return None
+            book_ids.update(change)
+        return book_ids
+
+    def _rebuild(self):
+        books = {}
+        prefixes = defaultdict(set)
+        for book in load_books():
+            books[book.id] = book
+            for prefix in self._book_prefixes(book):
+                prefixes[prefix].add(book.id)
+        ordered = sorted(book.sort_key for book in books.values())
+        with self._lock:
+            self._books = books
+            self._prefixes = prefixes
+            self._ordered = ordered
+
+    def _reload(self, book_ids):
+        if not book_ids:
+            return
+        books = {book.id: book for book in load_books(book_ids)}
+        with self._lock:
+            for book_id in book_ids:
+                self._remove(book_id)
+                book = books.get(book_id)
+                if book is not None:
+                    self._add(book)
+
+    def _add(self, book):
+        self._books[book.id] = book
+        bisect.insort(self._ordered, book.sort_key)
+        for prefix in self._book_prefixes(book):
+            self._prefixes[prefix].add(book.id)
+
+    def _remove(self, book_id):
+        book = self._books.pop(book_id, None)
+        if book is None:
+            return
+        del self._ordered[bisect.bisect_left(self._ordered, book.sort_key)]
+        for prefix in self._book_prefixes(book):
+            ids = self._prefixes.get(prefix)
+            if ids is not None:
+                ids.discard(book_id)
+                if not ids:
+                    del self._prefixes[prefix]
+
+    @staticmethod
+    def _book_prefixes(book):
+        return {
+            token[:length]
+            for token in book.tokens
+            for length in range(1, min(len(token), MAX_PREFIX) + 1)
+        }
+
+
+catalog_index = CatalogIndex()
@@ -0,0 +1,101 @@
+import csv
+import json
+import os
+
+from django_q.tasks import async_task
+
+from library.catalog import touch_catalog
+from library.models import Book
+from library.serializers import BookSerializer
+
+IMPORT_FORMATS = ("csv", "ndjson")
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+NOTIFICATION_TITLES = 5
+
+
+def guess_format(file_name):
+    extension = os.path.splitext(file_name)[1].lstrip(".").lower()
+    if extension in ("json", "jsonl"):
+        return "ndjson"
+    return extension
+
+
+def read_rows(stream, file_format):
+    """Yields (line number, row, error) for every record of a text stream
+    without reading the whole stream into memory."""
+    if file_format == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row, None
+    elif file_format == "ndjson":
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line), None
+            except json.JSONDecodeError as error:
+                yield line_number, None, {"non_field_errors": [str(error)]}
+    else:
+        raise ValueError(f"Unsupported import format: {file_format}")
+
+
+class BookImport:
+    """Validates rows one by one and inserts them in batches, so memory use
+    does not depend on the size of the feed."""
+
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.titles = []
+        self._batch = []
+
+    def run(self, stream, file_format):
+        for line_number, row, error in read_rows(stream, file_format):
+            if error is None:
+                serializer = BookSerializer(data=row)
+                if serializer.is_valid():
+                    self._add(Book(**serializer.validated_data))
+                    continue
+                error = serializer.errors
+            self._fail(line_number, error)
+        self._flush()
+
+        if self.created:
+            touch_catalog()
+            async_task(
+                "library.signals.send_new_arrivals_notification",
+                self.created,
+                self.titles,
+            )
+        return self.summary()
+
+    def summary(self):
+        return {
+            "created": self.created,
+            "failed": self.failed,
+            "errors": self.errors,
+        }
+
+    def _add(self, book):
+        self._batch.append(book)
+        if len(self._batch) >= self.batch_size:
+            self._flush()
+
+    def _fail(self, line_number, error):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_number, "errors": error})
+
+    def _flush(self):
+        if not self._batch:
+            return
+        # bulk_create skips post_save, so no per-book broadcast is sent;
+        # the search vector is filled in by the database trigger.
+        Book.objects.bulk_create(self._batch)
+        self.created += len(self._batch)
+        for book in self._batch[: NOTIFICATION_TITLES - len(self.titles)]:
+            self.titles.append(book.title)
+        self._batch = []
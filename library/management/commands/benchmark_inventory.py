@@ -0,0 +1,129 @@
+import threading
+import time
+
+from django.core.management import BaseCommand
+from django.db import connection
+
+from library.models import Book
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Stress test concurrent borrows of a single book and check that "
+        "no inventory updates are lost."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--copies", type=int, default=1000)
+        parser.add_argument("--attempts", type=int, default=1500)
+        parser.add_argument("--workers", type=int, default=32)
+        parser.add_argument(
+            "--naive",
+            action="store_true",
+            help="Use the old read-modify-write update for comparison.",
+        )
+        parser.add_argument(
+            "--shards",
+            type=int,
+            default=0,
+            help="Also run with the inventory split across this many "
+            "shards and compare throughput with the single-row path.",
+        )
+
+    def handle(self, *args, **options):
+        if options["naive"]:
+            self.run("read-modify-write", self.naive_borrow, 0, options)
+            return
+
+        single = self.run("single row", self.atomic_borrow, 0, options)
+        if options["shards"]:
+            sharded = self.run(
+                f"{options['shards']} shards",
+                self.atomic_borrow,
+                options["shards"],
+                options,
+            )
+            self.stdout.write(f"Sharded speedup: {sharded / single:.2f}x")
+
+    def run(self, label, borrow, shards, options):
+        copies = options["copies"]
+        attempts = options["attempts"]
+        workers = options["workers"]
+
+        # bulk_create skips post_save, so no new-book broadcast is sent.
+        book = Book.objects.bulk_create(
+            [
+                Book(
+                    title="Inventory benchmark",
+                    cover="SOFT",
+                    inventory=copies,
+                    daily_fee=0,
+                )
+            ]
+        )[0]
+        if shards:
+            book.set_inventory_shards(shards)
+
+        successes = []
+        lock = threading.Lock()
+
+        def worker(count):
+            taken = 0
+            try:
+                for _ in range(count):
+                    if borrow(book):
+                        taken += 1
+            finally:
+                connection.close()
+            with lock:
+                successes.append(taken)
+
+        shares = [
+            attempts // workers + (1 if index < attempts % workers else 0)
+            for index in range(workers)
+        ]
+        threads = [
+            threading.Thread(target=worker, args=(share,)) for share in shares
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        throughput = attempts / elapsed
+
+        try:
+            left = Book.objects.get(pk=book.pk).available_inventory
+            taken = sum(successes)
+            expected = copies - taken
+            self.stdout.write(
+                f"[{label}] {attempts} borrow attempts with {workers} "
+                f"workers in {elapsed:.2f}s ({throughput:.0f}/s)"
+            )
+            self.stdout.write(
+                f"[{label}] Borrowed: {taken}, inventory left: {left}, "
+                f"expected: {expected}"
+            )
+            if taken > copies or left != expected:
+                self.stdout.write(
+                    self.style.ERROR(f"Lost updates: {left - expected}")
+                )
+            else:
+                self.stdout.write(self.style.SUCCESS("Inventory is correct"))
+        finally:
+            Book.objects.filter(pk=book.pk).delete()
+        return throughput
+
+    @staticmethod
+    def atomic_borrow(book):
+        return book.take_copy()
+
+    @staticmethod
+    def naive_borrow(book):
+        book = Book.objects.get(pk=book.pk)
+        if book.inventory <= 0:
+            return False
+        book.inventory -= 1
+        book.save(update_fields=["inventory"])
+        return True
@@ -0,0 +1,45 @@
+from django.core.management import BaseCommand, CommandError
+
+from library.importers import (
+    BookImport,
+    IMPORT_BATCH_SIZE,
+    IMPORT_FORMATS,
+    guess_format,
+)
+
+
+class Command(BaseCommand):
+    help = "Import books from a CSV or NDJSON feed."  # noqa: VNE003
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--format",
+            choices=IMPORT_FORMATS,
+            help="Defaults to the file extension.",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=IMPORT_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"] or guess_format(path)
+        if file_format not in IMPORT_FORMATS:
+            raise CommandError(
+                f"Cannot tell the format of {path}, use --format."
+            )
+
+        with open(path, encoding="utf-8", newline="") as stream:
+            summary = BookImport(options["batch_size"]).run(
+                stream, file_format
+            )
+
+        for error in summary["errors"]:
+            self.stderr.write(f"Line {error['line']}: {error['errors']}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {summary['created']} books, "
+                f"{summary['failed']} rows failed."
+            )
+        )
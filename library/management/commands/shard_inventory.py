@@ -0,0 +1,32 @@
+from django.core.management import BaseCommand, CommandError
+
+from library.models import Book
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Split the inventory of a hot book across counter shards "
+        "(0 shards moves it back onto the book row)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("book_id", type=int)
+        parser.add_argument("shards", type=int)
+
+    def handle(self, *args, **options):
+        shards = options["shards"]
+        if not 0 <= shards <= 256:
+            raise CommandError("Shards must be between 0 and 256.")
+
+        try:
+            book = Book.objects.get(pk=options["book_id"])
+        except Book.DoesNotExist:
+            raise CommandError(f"Book {options['book_id']} does not exist.")
+
+        book.set_inventory_shards(shards)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"'{book.title}': {book.available_inventory} copies "
+                f"in {shards or 'no'} shards"
+            )
+        )
@@ -0,0 +1,32 @@
+# Generated by Django 4.0.4 on 2026-10-18 20:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0003_book_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='inventory_shards',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='InventoryShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField()),
+                ('inventory', models.PositiveIntegerField(default=0)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='library.book')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='inventoryshard',
+            constraint=models.UniqueConstraint(fields=('book', 'index'), name='unique_inventory_shard'),
+        ),
+    ]
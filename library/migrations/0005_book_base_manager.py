@@ -0,0 +1,17 @@
+# Generated by Django 4.0.4 on 2026-10-18 21:26
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0004_inventory_shards'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='book',
+            options={'base_manager_name': 'objects'},
+        ),
+    ]
@@ -1,4 +1,93 @@
-from django.db import models
+import random
+from functools import partial
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVectorField,
+    TrigramSimilarity,
+)
+from django.db import models, transaction
+from django.db.models import Case, F, Q, OuterRef, Subquery, Sum, When
+from django.db.models.functions import Greatest
+
+from library.catalog import touch_catalog
+
+SEARCH_CONFIG = "english"
+
+
+class BookQuerySet(models.QuerySet):
+    def search(self, text):
+        query = SearchQuery(
+            text, search_type="websearch", config=SEARCH_CONFIG
+        )
+        return (
+            self.filter(search_vector=query)
+            .annotate(rank=SearchRank(F("search_vector"), query))
+            .order_by("-rank", "id")
+        )
+
+    def similar_to(self, text):
+        # The trigram_similar lookup compiles to the pg_trgm "%" operator,
+        # which is what lets Postgres use the gin_trgm_ops indexes.
+        return (
+            self.filter(
+                Q(title__trigram_similar=text)
+                | Q(author__trigram_similar=text)
+            )
+            .annotate(
+                similarity=Greatest(
+                    TrigramSimilarity("title", text),
+                    TrigramSimilarity("author", text),
+                )
+            )
+            .order_by("-similarity", "id")
+        )
+
+    def take_copy(self, book_id):
+        """Atomically takes one copy off the shelf. Returns False when the
+        book is out of stock."""
+        taken = self.filter(pk=book_id, inventory__gt=0).update(
+            inventory=F("inventory") - 1
+        )
+        if taken:
+            transaction.on_commit(partial(touch_catalog, book_id))
+        return bool(taken)
+
+    def return_copy(self, book_id):
+        self.filter(pk=book_id).update(inventory=F("inventory") + 1)
+        transaction.on_commit(partial(touch_catalog, book_id))
+
+    def with_shard_inventory(self):
+        totals = (
+            InventoryShard.objects.filter(book=OuterRef("pk"))
+            .values("book")
+            .annotate(total=Sum("inventory"))
+            .values("total")
+        )
+        # CASE keeps Postgres from running the subquery for unsharded rows.
+        return self.annotate(
+            shard_inventory=Case(
+                When(inventory_shards__gt=0, then=Subquery(totals)),
+                output_field=models.PositiveIntegerField(),
+            )
+        )
+
+    def closest_title(self, text):
+        return (
+            self.filter(title__trigram_similar=text)
+            .annotate(similarity=TrigramSimilarity("title", text))
+            .order_by("-similarity", "id")
+            .first()
+        )
+
+
+class BookManager(models.Manager):
+    def get_queryset(self):
+        # Postgres reads the search vector when searching; Python never
+        # needs it.
+        return super().get_queryset().defer("search_vector")
 
 
 class Book(models.Model):
@@ -12,6 +101,133 @@ class Book(models.Model):
     cover = models.CharField(max_length=4, choices=COVER_CHOICES)
     inventory = models.PositiveIntegerField()
     daily_fee = models.DecimalField(max_digits=6, decimal_places=2)
+    # Maintained by the library_book_search_vector trigger, so rows written
+    # with bulk_create or COPY are searchable as well.
+    search_vector = SearchVectorField(null=True, editable=False)
+    # When non-zero, the stock is split across this many InventoryShard rows
+    # and the inventory column is unused.
+    inventory_shards = models.PositiveSmallIntegerField(
+        default=0, editable=False
+    )
+
+    objects = BookManager.from_queryset(BookQuerySet)()
+
+    class Meta:
+        # Also used for related lookups such as borrowing.book.
+        base_manager_name = "objects"
+        indexes = [
+            models.Index(fields=["title"], name="library_book_title_idx"),
+            GinIndex(fields=["search_vector"], name="library_book_search_idx"),
+            GinIndex(
+                fields=["title"],
+                name="library_book_title_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+            GinIndex(
+                fields=["author"],
+                name="library_book_author_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
 
     def __str__(self):
         return self.title
+
+    @property
+    def available_inventory(self):
+        if not self.inventory_shards:
+            return self.inventory
+        if hasattr(self, "shard_inventory"):
+            return self.shard_inventory or 0
+        return self.shards.aggregate(total=Sum("inventory"))["total"] or 0
+
+    def take_copy(self):
+        if self.inventory_shards:
+            return InventoryShard.objects.take(self.pk, self.inventory_shards)
+        return Book.objects.take_copy(self.pk)
+
+    def return_copy(self):
+        if self.inventory_shards:
+            InventoryShard.objects.put_back(self.pk, self.inventory_shards)
+        else:
+            Book.objects.return_copy(self.pk)
+
+    def set_inventory_shards(self, shards):
+        """Spreads the stock over `shards` counter rows, so concurrent
+        borrows of a popular book do not all update the same row. Passing
+        0 moves the stock back onto the book row."""
+        with transaction.atomic():
+            book = Book.objects.select_for_update().get(pk=self.pk)
+            total = book.inventory + sum(
+                book.shards.select_for_update().values_list(
+                    "inventory", flat=True
+                )
+            )
+            book.shards.all().delete()
+            InventoryShard.objects.bulk_create(
+                InventoryShard(
+                    book=book,
+                    index=index,
+                    inventory=total // shards
+                    + (1 if index < total % shards else 0),
+                )
+                for index in range(shards)
+            )
+            Book.objects.filter(pk=self.pk).update(
+                inventory=0 if shards else total, inventory_shards=shards
+            )
+            transaction.on_commit(partial(touch_catalog, self.pk))
+        self.refresh_from_db(fields=["inventory", "inventory_shards"])
+
+
+class InventoryShardQuerySet(models.QuerySet):
+    def take(self, book_id, shards):
+        # Try one random shard first; only when it is empty look up the
+        # shards that still have stock.
+        index = random.randrange(shards)
+        if self._take_from(book_id, index=index):
+            return True
+
+        shard_ids = list(
+            self.filter(book_id=book_id, inventory__gt=0).values_list(
+                "id", flat=True
+            )
+        )
+        random.shuffle(shard_ids)
+        return any(
+            self._take_from(book_id, pk=shard_id) for shard_id in shard_ids
+        )
+
+    def put_back(self, book_id, shards):
+        self.filter(book_id=book_id, index=random.randrange(shards)).update(
+            inventory=F("inventory") + 1
+        )
+        transaction.on_commit(partial(touch_catalog, book_id))
+
+    def _take_from(self, book_id, **lookup):
+        taken = self.filter(
+            book_id=book_id, inventory__gt=0, **lookup
+        ).update(inventory=F("inventory") - 1)
+        if taken:
+            transaction.on_commit(partial(touch_catalog, book_id))
+        return bool(taken)
+
+
+class InventoryShard(models.Model):
+    book = models.ForeignKey(
+        Book, on_delete=models.CASCADE, related_name="shards"
+    )
+    index = models.PositiveSmallIntegerField()
+    inventory = models.PositiveIntegerField(default=0)
+
+    objects = InventoryShardQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["book", "index"], name="unique_inventory_shard"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.book.title} #{self.index}: {self.inventory}"
@@ -1,5 +1,6 @@
 from drf_spectacular.utils import (
     extend_schema,
+    OpenApiParameter,
 )
 
 from library.serializers import BookSerializer
@@ -7,12 +8,67 @@ from library.serializers import BookSerializer
 
 class BookSchema:
     list_schema = extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="search",
+                description="Full-text search by title and author, "
+                "results are ranked by relevance",
+                required=False,
+                type={"type": "string"},
+            ),
+        ],
         responses={
             200: BookSerializer(many=True),
-        }
+        },
     )
     retrieve = extend_schema(
         responses={
             200: BookSerializer(many=True),
         }
     )
+    suggest = extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="q",
+                description="Title or author, typos are tolerated",
+                required=True,
+                type={"type": "string"},
+            ),
+        ],
+        responses={
+            200: BookSerializer(many=True),
+        },
+    )
+    import_books = extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="file_format",
+                description="csv or ndjson, "
+                "defaults to the extension of the uploaded file",
+                required=False,
+                type={"type": "string"},
+            ),
+        ],
+        request={
+            "multipart/form-data": {
+                "type": "object",
+                "properties": {
+                    "file": {"type": "string", "format": "binary"},
+                },
+            }
+        },
+        description="Bulk import books from a CSV or NDJSON feed "
+        "(admin only).",
+    )
+    export = extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="file_format",
+                description="csv (default) or ndjson",
+                required=False,
+                type={"type": "string"},
+            ),
+        ],
+        responses={200: None},
+        description="Stream the whole catalog as CSV or NDJSON (admin only).",
+    )
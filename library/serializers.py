@@ -13,3 +13,26 @@ class BookSerializer(serializers.ModelSerializer):
             "inventory",
             "daily_fee",
         )
+
+    def validate_inventory(self, value):
+        book = self.instance
+        if (
+            book is not None
+            and book.inventory_shards
+            and value != book.available_inventory
+        ):
+            raise serializers.ValidationError(
+                "The inventory of a sharded book is changed "
+                "with the shard_inventory command."
+            )
+        return value
+
+    def update(self, instance, validated_data):
+        if instance.inventory_shards:
+            validated_data.pop("inventory", None)
+        return super().update(instance, validated_data)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data["inventory"] = instance.available_inventory
+        return data
@@ -1,44 +1,42 @@
-import os
-import requests
+from functools import partial
 
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from django_q.tasks import async_task
 
+from library.catalog import touch_catalog
 from library.models import Book
-from user.models import User
-
-TELEGRAM_BOT_TOKEN = os.environ.get("TOKEN")
-TELEGRAM_API_URL = (
-    f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-)
-
-
-def send_telegram_message(chat_id, message):
-    response = requests.post(
-        TELEGRAM_API_URL,
-        data={"chat_id": chat_id, "text": message},
-    )
-    print(response.json())
+from notification.tasks import broadcast
+from notification.telegram import send_telegram_message
 
 
 @receiver(post_save, sender=Book)
 def send_telegram_notification(sender, instance, created, **kwargs):
     if created:
-        users = User.objects.exclude(telegram_chat_id__isnull=True)
         message = (
             f"📚 New Book Added!\n\n"
             f"📖 Title: {instance.title}\n"
             f"👤 Author: {instance.author}\n"
             f"💵 Price per day: ${float(instance.daily_fee):.2f}\n"
         )
-        for user in users:
-            chat_id = user.telegram_chat_id
-            if chat_id:
-                response = requests.post(
-                    TELEGRAM_API_URL,
-                    data={"chat_id": chat_id, "text": message},
-                )
-                print(response.json())
+        transaction.on_commit(
+            partial(async_task, "notification.tasks.broadcast", message)
+        )
+
+
+def send_new_arrivals_notification(count, titles):
+    message = f"📚 {count} New Books Added!\n\n"
+    message += "".join(f"📖 {title}\n" for title in titles)
+    if count > len(titles):
+        message += f"...and {count - len(titles)} more\n"
+    broadcast(message)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def handle_catalog_change(sender, instance, **kwargs):
+    transaction.on_commit(partial(touch_catalog, instance.pk))
 
 
 def send_borrowing_notification(instance, created):
@@ -51,8 +49,4 @@ def send_borrowing_notification(instance, created):
             f"Due date: {instance.expected_return_date}\n"
         )
         if user.telegram_chat_id:
-            response = requests.post(
-                TELEGRAM_API_URL,
-                data={"chat_id": user.telegram_chat_id, "text": message},
-            )
-            print(response.json())
+            send_telegram_message(user.telegram_chat_id, message)
@@ -0,0 +1,89 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from library.catalog import touch_catalog
+from library.catalog_index import CatalogIndex
+from library.models import Book
+
+
+@patch("library.signals.async_task")
+class CatalogIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.dune = self.create_book("Dune", "Frank Herbert", 3)
+        self.messiah = self.create_book("Dune Messiah", "Frank Herbert", 0)
+        self.hobbit = self.create_book("The Hobbit", "J. R. R. Tolkien", 5)
+        self.index = CatalogIndex()
+        self.index.refresh(force=True)
+
+    def create_book(self, title, author, inventory):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Book.objects.create(
+                title=title,
+                author=author,
+                cover="SOFT",
+                inventory=inventory,
+                daily_fee="1.00",
+            )
+
+    def titles(self, query):
+        return [book.title for book in self.index.search(query)]
+
+    def test_search_matches_title_and_author_prefixes(self, mock_task):
+        self.assertEqual(self.titles("du"), ["Dune", "Dune Messiah"])
+        self.assertEqual(self.titles("herb mess"), ["Dune Messiah"])
+        self.assertEqual(self.titles("tolk"), ["The Hobbit"])
+        self.assertEqual(self.titles("hobbit dune"), [])
+        self.assertEqual(self.titles("  "), [])
+
+    def test_title_prefix_matches_rank_first(self, mock_task):
+        self.create_book("Frank and Stein", "Someone Else", 1)
+        self.index.refresh(force=True)
+
+        self.assertEqual(
+            self.titles("frank"), ["Frank and Stein", "Dune", "Dune Messiah"]
+        )
+
+    def test_search_does_not_query_the_database(self, mock_task):
+        with self.assertNumQueries(0):
+            self.index.search("dune")
+
+    def test_refresh_reloads_only_changed_books(self, mock_task):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dune.take_copy()
+        self.hobbit.title = "The Hobbit, or There and Back Again"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hobbit.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.messiah.delete()
+
+        with patch.object(self.index, "_rebuild") as mock_rebuild:
+            self.index.refresh(force=True)
+
+        mock_rebuild.assert_not_called()
+        [dune] = self.index.search("dune")
+        self.assertEqual(dune.inventory, 2)
+        self.assertEqual(
+            self.titles("back again"), ["The Hobbit, or There and Back Again"]
+        )
+        self.assertEqual(len(self.index), 2)
+
+    def test_change_without_book_ids_rebuilds(self, mock_task):
+        Book.objects.filter(pk=self.dune.pk).update(title="Arrakis")
+        touch_catalog()
+
+        self.index.refresh(force=True)
+
+        self.assertEqual(self.titles("arrakis"), ["Arrakis"])
+        self.assertEqual(self.titles("dune"), ["Dune Messiah"])
+
+    def test_refresh_is_throttled(self, mock_task):
+        self.create_book("Neuromancer", "William Gibson", 1)
+
+        self.index.refresh()
+        self.assertEqual(self.titles("neuro"), [])
+
+        self.index.refresh(force=True)
+        self.assertEqual(self.titles("neuro"), ["Neuromancer"])
@@ -1,7 +1,17 @@
-from django.test import TestCase
+import threading
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.db import connection
 from django.db.utils import IntegrityError, DataError
 from django.core.exceptions import ValidationError
+from rest_framework import exceptions
+from borrowing.models import Borrowing
+from borrowing.views import BorrowingViewSet
 from library.models import Book
+from payment.views import PaymentViewSet
 
 
 class BookModelTests(TestCase):
@@ -66,3 +76,131 @@ class BookModelTests(TestCase):
                 inventory=10,
                 daily_fee="invalid",
             )
+
+    def test_take_copy(self):
+        book = Book.objects.create(
+            title="Test Book",
+            author="Test Author",
+            cover="HARD",
+            inventory=1,
+            daily_fee="1.50",
+        )
+        self.assertTrue(Book.objects.take_copy(book.pk))
+        self.assertFalse(Book.objects.take_copy(book.pk))
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 0)
+
+        Book.objects.return_copy(book.pk)
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 1)
+
+    def test_stale_return_restocks_once(self):
+        book = Book.objects.create(
+            title="Test Book",
+            author="Test Author",
+            cover="HARD",
+            inventory=1,
+            daily_fee="1.50",
+        )
+        borrowing = Borrowing.objects.create(
+            expected_return_date=date.today() + timedelta(days=10),
+            book=book,
+            user=get_user_model().objects.create_user(
+                email="reader@test.com", password="testpass123"
+            ),
+        )
+        stale = Borrowing.objects.get(pk=borrowing.pk)
+
+        borrowing.return_borrowing()
+        with self.assertRaises(exceptions.ValidationError):
+            stale.return_borrowing()
+
+        book.refresh_from_db()
+        self.assertEqual(book.inventory, 2)
+
+    def test_sharded_inventory(self):
+        book = Book.objects.create(
+            title="Test Book",
+            author="Test Author",
+            cover="HARD",
+            inventory=5,
+            daily_fee="1.50",
+        )
+        book.set_inventory_shards(3)
+        self.assertEqual(book.inventory, 0)
+        self.assertEqual(book.shards.count(), 3)
+        self.assertEqual(book.available_inventory, 5)
+
+        for _ in range(5):
+            self.assertTrue(book.take_copy())
+        self.assertFalse(book.take_copy())
+        self.assertEqual(book.available_inventory, 0)
+
+        book.return_copy()
+        book.set_inventory_shards(0)
+        self.assertEqual(book.inventory, 1)
+        self.assertFalse(book.shards.exists())
+
+
+class ConcurrentReturnTests(TransactionTestCase):
+    def test_concurrent_returns_restock_once(self):
+        book = Book.objects.create(
+            title="Test Book",
+            author="Test Author",
+            cover="HARD",
+            inventory=1,
+            daily_fee="1.50",
+        )
+        borrowing = Borrowing.objects.create(
+            expected_return_date=date.today() + timedelta(days=10),
+            book=book,
+            user=get_user_model().objects.create_user(
+                email="reader@test.com", password="testpass123"
+            ),
+        )
+        workers = 8
+        barrier = threading.Barrier(workers)
+        results = []
+
+        def worker():
+            instance = Borrowing.objects.get(pk=borrowing.pk)
+            barrier.wait()
+            try:
+                instance.return_borrowing()
+                results.append(True)
+            except exceptions.ValidationError:
+                results.append(False)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        book.refresh_from_db()
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(book.inventory, 2)
+
+
+class SearchVectorDeferralTests(SimpleTestCase):
+    def assertNotLoaded(self, queryset):
+        columns = str(queryset.query).split(" FROM ")[0]
+        self.assertNotIn('"search_vector"', columns)
+
+    def test_search_vector_is_not_loaded(self):
+        self.assertNotLoaded(Book.objects.all())
+        self.assertNotLoaded(Book._base_manager.all())
+        request = SimpleNamespace(
+            user=SimpleNamespace(is_staff=True), query_params={}
+        )
+        for viewset in (BorrowingViewSet, PaymentViewSet):
+            with self.subTest(viewset=viewset.__name__):
+                self.assertNotLoaded(
+                    viewset(request=request, action="list").get_queryset()
+                )
+
+    def test_search_still_filters_on_the_vector(self):
+        query = str(Book.objects.search("dune").query)
+        self.assertIn('"search_vector" @@', query)
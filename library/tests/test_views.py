@@ -1,3 +1,9 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -5,6 +11,7 @@ from rest_framework_simplejwt.tokens import RefreshToken
 
 from user.models import User
 from library.models import Book
+from library.views import BookViewSet
 
 
 class BookTest(APITestCase):
@@ -83,7 +90,7 @@ class BookTest(APITestCase):
         )
         response = self.client.get(url, format="json")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data["results"]), 1)
 
     def test_get_book(self):
         url = reverse("library:book-detail", kwargs={"pk": self.book.id})
@@ -129,3 +136,186 @@ class BookTest(APITestCase):
         response = self.client.delete(url, format="json")
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Book.objects.count(), 0)
+
+    def test_search_books(self):
+        Book.objects.create(
+            title="The Hobbit",
+            author="J. R. R. Tolkien",
+            cover="HARD",
+            inventory=3,
+            daily_fee=1.99,
+        )
+        Book.objects.create(
+            title="Tolkien: A Biography",
+            author="Humphrey Carpenter",
+            cover="SOFT",
+            inventory=1,
+            daily_fee=0.99,
+        )
+        url = reverse("library:book-list") + "?search=tolkien"
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.regular_token["access"]}'
+        )
+        response = self.client.get(url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        titles = [book["title"] for book in response.data["results"]]
+        self.assertEqual(titles, ["Tolkien: A Biography", "The Hobbit"])
+
+    def test_suggest_books_with_typo(self):
+        Book.objects.create(
+            title="Pride and Prejudice",
+            author="Jane Austen",
+            cover="SOFT",
+            inventory=2,
+            daily_fee=1.49,
+        )
+        url = reverse("library:book-suggest") + "?q=Prid and Prejudise"
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.regular_token["access"]}'
+        )
+        response = self.client.get(url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]["title"], "Pride and Prejudice")
+
+    def test_suggest_books_requires_query(self):
+        url = reverse("library:book-suggest")
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.regular_token["access"]}'
+        )
+        response = self.client.get(url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_books_not_modified(self):
+        url = reverse("library:book-list")
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.regular_token["access"]}'
+        )
+        response = self.client.get(url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+
+        response = self.client.get(url, format="json", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.create(
+                title="Another Book",
+                cover="SOFT",
+                inventory=1,
+                daily_fee=1.00,
+            )
+        response = self.client.get(url, format="json", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_books_is_validated_by_etag_only(self):
+        url = reverse("library:book-list")
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.regular_token["access"]}'
+        )
+        response = self.client.get(url, format="json")
+        self.assertNotIn("Last-Modified", response)
+
+        response = self.client.get(
+            url,
+            format="json",
+            HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @patch("library.importers.async_task")
+    def test_import_books(self, mock_async_task):
+        feed = (
+            "title,author,cover,inventory,daily_fee\n"
+            "Dune,Frank Herbert,SOFT,4,1.99\n"
+            "Emma,Jane Austen,HARD,2,0.99\n"
+            "Broken,Nobody,PAPER,x,1\n"
+        )
+        url = reverse("library:book-import-books")
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.admin_token["access"]}'
+        )
+        response = self.client.post(
+            url,
+            {"file": SimpleUploadedFile("feed.csv", feed.encode())},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(response.data["failed"], 1)
+        self.assertEqual(response.data["errors"][0]["line"], 4)
+        self.assertEqual(Book.objects.count(), 3)
+        mock_async_task.assert_called_once_with(
+            "library.signals.send_new_arrivals_notification",
+            2,
+            ["Dune", "Emma"],
+        )
+
+    def test_import_books_regular_user(self):
+        url = reverse("library:book-import-books")
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.regular_token["access"]}'
+        )
+        response = self.client.post(url, {}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_export_books_ndjson(self):
+        url = reverse("library:book-export") + "?file_format=ndjson"
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.admin_token["access"]}'
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])["title"], "Test Book")
+        self.assertEqual(json.loads(lines[0])["inventory"], 5)
+
+    def test_export_books_unknown_format(self):
+        url = reverse("library:book-export") + "?file_format=xml"
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.admin_token["access"]}'
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @patch("library.signals.async_task")
+    def test_create_book_enqueues_broadcast_on_commit(self, mock_async_task):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            Book.objects.create(
+                title="Dune",
+                author="Frank Herbert",
+                cover="SOFT",
+                inventory=1,
+                daily_fee=1.00,
+            )
+        mock_async_task.assert_not_called()
+
+        for callback in callbacks:
+            callback()
+        mock_async_task.assert_called_once()
+        self.assertEqual(
+            mock_async_task.call_args.args[0], "notification.tasks.broadcast"
+        )
+
+
+class BookViewSetQuerysetTests(SimpleTestCase):
+    def get_queryset(self, action):
+        view = BookViewSet(
+            action=action, request=SimpleNamespace(query_params={})
+        )
+        return view.get_queryset()
+
+    def test_shard_totals_only_for_actions_showing_inventory(self):
+        for action in ("list", "retrieve", "suggest", "partial_update"):
+            with self.subTest(action=action):
+                self.assertIn(
+                    "shard_inventory",
+                    self.get_queryset(action).query.annotations,
+                )
+        for action in ("destroy", "import_books"):
+            with self.subTest(action=action):
+                self.assertNotIn(
+                    "shard_inventory",
+                    self.get_queryset(action).query.annotations,
+                )
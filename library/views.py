@@ -1,14 +1,142 @@
+import io
+
 from django.utils.decorators import method_decorator
-from rest_framework import viewsets
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.parsers import MultiPartParser
+from django.db.models.functions import Coalesce
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from library.catalog import catalog_condition
+from library.importers import BookImport, IMPORT_FORMATS, guess_format
 from library.models import Book
+from library.pagination import BookCursorPagination
 from library.permissions import IsAdminOrIfAuthenticatedReadOnly
 from library.schemas import BookSchema
 from library.serializers import BookSerializer
+from library_service.export import EXPORT_FORMATS, export_response
+
+SUGGESTIONS_LIMIT = 10
+# Actions whose responses show the available inventory. Only these pay for
+# the shard totals.
+INVENTORY_ACTIONS = (
+    "list",
+    "retrieve",
+    "suggest",
+    "update",
+    "partial_update",
+)
+BOOK_EXPORT_FIELDS = {
+    "id": "id",
+    "title": "title",
+    "author": "author",
+    "cover": "cover",
+    "inventory": "total_inventory",
+    "daily_fee": "daily_fee",
+}
 
 
 @method_decorator(name="list", decorator=BookSchema.list_schema)
 @method_decorator(name="retrieve", decorator=BookSchema.retrieve)
+@method_decorator(name="suggest", decorator=BookSchema.suggest)
+@method_decorator(name="import_books", decorator=BookSchema.import_books)
+@method_decorator(name="export", decorator=BookSchema.export)
 class BookViewSet(viewsets.ModelViewSet):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [IsAdminOrIfAuthenticatedReadOnly]
+    pagination_class = BookCursorPagination
+
+    @property
+    def paginator(self):
+        # Search results are ordered by rank, which has no stable keyset,
+        # so they keep using limit/offset pages.
+        if not hasattr(self, "_paginator"):
+            if self.request and self.request.query_params.get("search"):
+                self._paginator = LimitOffsetPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        search = self.request.query_params.get("search")
+
+        if self.action in INVENTORY_ACTIONS:
+            queryset = queryset.with_shard_inventory()
+
+        if self.action == "list" and search:
+            queryset = queryset.search(search)
+
+        return queryset
+
+    @method_decorator(catalog_condition)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @method_decorator(catalog_condition)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @action(detail=False, methods=["GET"])
+    def suggest(self, request):
+        text = request.query_params.get("q", "").strip()
+        if not text:
+            return Response(
+                {"error": "Query parameter 'q' is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        books = self.get_queryset().similar_to(text)[:SUGGESTIONS_LIMIT]
+        serializer = self.get_serializer(books, many=True)
+        return Response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=["POST"],
+        url_path="import",
+        permission_classes=[IsAdminUser],
+        parser_classes=[MultiPartParser],
+    )
+    def import_books(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"error": "A CSV or NDJSON file is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        file_format = request.query_params.get(
+            "file_format", guess_format(upload.name)
+        )
+        if file_format not in IMPORT_FORMATS:
+            return Response(
+                {"error": f"Unsupported file format: {file_format}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        stream = io.TextIOWrapper(upload.file, encoding="utf-8", newline="")
+        summary = BookImport().run(stream, file_format)
+        return Response(summary, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["GET"], permission_classes=[IsAdminUser])
+    def export(self, request):
+        file_format = request.query_params.get("file_format", "csv")
+        if file_format not in EXPORT_FORMATS:
+            return Response(
+                {"error": f"Unsupported file format: {file_format}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        queryset = (
+            Book.objects.with_shard_inventory()
+            .annotate(
+                total_inventory=Coalesce("shard_inventory", "inventory")
+            )
+            .order_by("id")
+        )
+        return export_response(
+            queryset, BOOK_EXPORT_FIELDS, file_format, "books"
+        )
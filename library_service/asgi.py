@@ -1,7 +1,59 @@
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "library_service.settings")
 
-application = get_asgi_application()
+_END = object()
+
+
+class StreamingSafeASGIHandler(ASGIHandler):
+    """Django 4.0 iterates streaming responses, such as the CSV/NDJSON
+    exports, on the event loop, where their database reads are not allowed.
+    This handler pulls each part from the thread the view ran on instead."""
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            await super().send_response(response, send)
+            return
+
+        headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode("ascii")
+            if isinstance(value, str):
+                value = value.encode("latin1")
+            headers.append((bytes(header), bytes(value)))
+        for cookie in response.cookies.values():
+            headers.append(
+                (
+                    b"Set-Cookie",
+                    cookie.output(header="").encode("ascii").strip(),
+                )
+            )
+        await send(
+            {
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": headers,
+            }
+        )
+        parts = iter(response)
+        next_part = sync_to_async(next, thread_sensitive=True)
+        while (part := await next_part(parts, _END)) is not _END:
+            for chunk, _ in self.chunk_bytes(part):
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": chunk,
+                        "more_body": True,
+                    }
+                )
+        await send({"type": "http.response.body"})
+        await sync_to_async(response.close, thread_sensitive=True)()
+
+
+django.setup(set_prefix=False)
+application = StreamingSafeASGIHandler()
@@ -0,0 +1,434 @@
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import redis
+from asgiref.sync import sync_to_async
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+from django.core.cache.backends.redis import RedisCache
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+
+class LocalTier:
+    """Bounded in-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        # Read-through fills in progress: key -> token (see begin_fill).
+        self._fills = {}
+        self._lock = threading.Lock()
+
+    def _live_entry(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key, pickled, expires_at):
+        self._fills.pop(key, None)
+        self._entries[key] = (pickled, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live_entry(key)
+        if entry is None:
+            return MISSING
+        return pickle.loads(entry[0])
+
+    def set(self, key, value, timeout):
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires_at = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._store(key, pickled, expires_at)
+
+    def add(self, key, value, timeout):
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires_at = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            if self._live_entry(key) is not None:
+                return False
+            self._store(key, pickled, expires_at)
+            return True
+
+    def incr(self, key, delta):
+        """Adds delta to a stored number, keeping its expiry. Returns
+        MISSING if the key is not there."""
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is None:
+                return MISSING
+            value = pickle.loads(entry[0]) + delta
+            self._store(
+                key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), entry[1]
+            )
+        return value
+
+    def begin_fill(self, key):
+        """Starts filling the key with a value read from Redis. Returns a
+        token for finish_fill()."""
+        token = object()
+        with self._lock:
+            self._fills[key] = token
+        return token
+
+    def finish_fill(self, key, token, value, timeout):
+        """Stores the value read since begin_fill(), unless the key was
+        written or invalidated meanwhile: the value may predate that
+        change and would otherwise be served until it expires."""
+        store = value is not MISSING and timeout != 0
+        if store:
+            pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            expires_at = (
+                None if timeout is None else time.monotonic() + timeout
+            )
+        with self._lock:
+            if self._fills.get(key) is not token:
+                return
+            del self._fills[key]
+            if store:
+                self._store(key, pickled, expires_at)
+
+    def delete(self, key):
+        with self._lock:
+            self._fills.pop(key, None)
+            return self._entries.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._fills.clear()
+            self._entries.clear()
+
+
+class CacheNode:
+    """Process-wide state shared by every TwoTierCache instance that points
+    at the same Redis location: the local tier, the Redis health flag and
+    the invalidation listener."""
+
+    _nodes = {}
+    _nodes_lock = threading.Lock()
+
+    def __init__(self, server, channel, max_entries, retry_interval):
+        self.id = uuid.uuid4().hex
+        self.server = server
+        self.channel = channel
+        self.retry_interval = retry_interval
+        self.local = LocalTier(max_entries)
+        self.down_until = 0
+        self._listener_pid = None
+        self._listener_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, server, channel, max_entries, retry_interval):
+        with cls._nodes_lock:
+            node = cls._nodes.get((server, channel))
+            if node is None:
+                node = cls(server, channel, max_entries, retry_interval)
+                cls._nodes[(server, channel)] = node
+            return node
+
+    @property
+    def is_down(self):
+        return time.monotonic() < self.down_until
+
+    def mark_down(self, error):
+        if not self.is_down:
+            logger.warning(
+                "Redis cache unavailable, using local cache only: %s", error
+            )
+        self.down_until = time.monotonic() + self.retry_interval
+
+    def mark_up(self):
+        if self.down_until:
+            # Invalidations were missed while Redis was unreachable, so
+            # nothing in the local tier can be trusted any more.
+            self.down_until = 0
+            self.local.clear()
+            logger.info("Redis cache is reachable again")
+
+    def publish(self, client, keys):
+        message = "\n".join([self.id, *keys])
+        client.publish(self.channel, message)
+
+    def ensure_listener(self):
+        if self._listener_pid == os.getpid():
+            return
+        with self._listener_lock:
+            if self._listener_pid == os.getpid():
+                return
+            if self._listener_pid is not None:
+                # A forked worker inherits neither the listener thread nor
+                # the invalidations sent since the fork, and must not share
+                # its parent's id, or each would ignore the other's
+                # messages.
+                self.id = uuid.uuid4().hex
+                self.local.clear()
+            threading.Thread(
+                target=self._listen,
+                name="cache-invalidation-listener",
+                daemon=True,
+            ).start()
+            self._listener_pid = os.getpid()
+
+    def _listen(self):
+        client = redis.Redis.from_url(self.server)
+        while True:
+            try:
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                self.local.clear()
+                while True:
+                    message = pubsub.get_message(timeout=self.retry_interval)
+                    if message is not None:
+                        self._handle(message["data"].decode())
+            except redis.RedisError as error:
+                self.mark_down(error)
+                time.sleep(self.retry_interval)
+
+    def _handle(self, message):
+        sender, *keys = message.split("\n")
+        if sender == self.id:
+            return
+        if keys == ["*"]:
+            self.local.clear()
+            return
+        for key in keys:
+            self.local.delete(key)
+
+
+class TwoTierCache(BaseCache):
+    """Redis cache with a bounded in-process LRU in front of it.
+
+    Reads are served from the local tier when possible. Writes go to Redis
+    and are broadcast over pub/sub, so other workers drop their local copy.
+    While Redis is unreachable the cache keeps working from the local tier
+    alone and retries Redis every RETRY_INTERVAL seconds.
+
+    OPTIONS:
+        LOCAL_MAX_ENTRIES: size of the local tier (default 1000).
+        LOCAL_TIMEOUT: longest time an entry lives in the local tier, which
+            bounds staleness if an invalidation is lost (default 30).
+        RETRY_INTERVAL: seconds between reconnect attempts (default 5).
+        INVALIDATION_CHANNEL: pub/sub channel name.
+    Other options are passed through to RedisCache. Keep socket timeouts
+    short in LOCATION (e.g. ?socket_timeout=1) so an outage is detected
+    quickly.
+    """
+
+    def __init__(self, server, params):
+        super().__init__(params)
+        options = dict(params.get("OPTIONS", {}))
+        self.local_timeout = options.pop("LOCAL_TIMEOUT", 30)
+        max_entries = options.pop("LOCAL_MAX_ENTRIES", 1000)
+        retry_interval = options.pop("RETRY_INTERVAL", 5)
+        channel = options.pop("INVALIDATION_CHANNEL", "cache:invalidate")
+
+        self._remote = RedisCache(server, {**params, "OPTIONS": options})
+        servers = self._remote._servers
+        self._node = CacheNode.get(
+            servers[0], channel, max_entries, retry_interval
+        )
+
+    @property
+    def _local(self):
+        return self._node.local
+
+    def _call_remote(self, method, *args, **kwargs):
+        if self._node.is_down:
+            return MISSING
+        self._node.ensure_listener()
+        try:
+            result = getattr(self._remote, method)(*args, **kwargs)
+        except redis.RedisError as error:
+            self._node.mark_down(error)
+            return MISSING
+        self._node.mark_up()
+        return result
+
+    def _publish(self, keys):
+        if self._node.is_down:
+            return
+        try:
+            client = self._remote._cache.get_client(write=True)
+            self._node.publish(client, keys)
+        except redis.RedisError as error:
+            self._node.mark_down(error)
+
+    def _local_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is not None and timeout <= 0:
+            return 0
+        if self._node.is_down:
+            return timeout
+        if timeout is None:
+            return self.local_timeout
+        return min(timeout, self.local_timeout)
+
+    def _set_local(self, key, value, timeout):
+        local_timeout = self._local_timeout(timeout)
+        if local_timeout == 0:
+            self._local.delete(key)
+        else:
+            self._local.set(key, value, local_timeout)
+
+    def _fill_local(self, key, token, value):
+        self._local.finish_fill(
+            key, token, value, self._local_timeout(DEFAULT_TIMEOUT)
+        )
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        added = self._call_remote("add", key, value, timeout, version)
+        if added is MISSING:
+            # Redis is unreachable, so the local tier decides alone.
+            local_timeout = self._local_timeout(timeout)
+            return local_timeout != 0 and self._local.add(
+                local_key, value, local_timeout
+            )
+        if added:
+            self._set_local(local_key, value, timeout)
+            self._publish([local_key])
+        return added
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        value = self._local.get(local_key)
+        if value is not MISSING:
+            return value
+
+        token = self._local.begin_fill(local_key)
+        value = self._call_remote("get", key, MISSING, version)
+        self._fill_local(local_key, token, value)
+        if value is MISSING:
+            return default
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        self._call_remote("set", key, value, timeout, version)
+        self._set_local(local_key, value, timeout)
+        self._publish([local_key])
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        touched = self._call_remote("touch", key, timeout, version)
+        if touched is MISSING:
+            value = self._local.get(local_key)
+            if value is MISSING:
+                return False
+            self._set_local(local_key, value, timeout)
+            return True
+        return touched
+
+    def delete(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        deleted = self._call_remote("delete", key, version)
+        deleted_locally = self._local.delete(local_key)
+        self._publish([local_key])
+        return deleted_locally if deleted is MISSING else deleted
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remote_keys = {}
+        for key in keys:
+            local_key = self.make_and_validate_key(key, version=version)
+            value = self._local.get(local_key)
+            if value is MISSING:
+                remote_keys[key] = local_key
+            else:
+                found[key] = value
+
+        if remote_keys:
+            tokens = {
+                key: self._local.begin_fill(local_key)
+                for key, local_key in remote_keys.items()
+            }
+            fetched = self._call_remote("get_many", list(remote_keys), version)
+            if fetched is MISSING:
+                fetched = {}
+            for key, local_key in remote_keys.items():
+                self._fill_local(
+                    local_key, tokens[key], fetched.get(key, MISSING)
+                )
+            found.update(fetched)
+        return found
+
+    def has_key(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        if self._local.get(local_key) is not MISSING:
+            return True
+        return self._call_remote("has_key", key, version) is True
+
+    def incr(self, key, delta=1, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        value = self._call_remote("incr", key, delta, version)
+        if value is MISSING:
+            value = self._local.incr(local_key, delta)
+            if value is MISSING:
+                raise ValueError(f"Key '{key}' not found")
+            return value
+
+        self._local.delete(local_key)
+        self._publish([local_key])
+        return value
+
+    async def aincr(self, key, delta=1, version=None):
+        # BaseCache.aincr is a get followed by a set, which loses updates
+        # under concurrency; incr is atomic in Redis and the local tier.
+        return await sync_to_async(self.incr, thread_sensitive=True)(
+            key, delta, version
+        )
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._call_remote("set_many", data, timeout, version)
+        local_keys = []
+        for key, value in data.items():
+            local_key = self.make_and_validate_key(key, version=version)
+            self._set_local(local_key, value, timeout)
+            local_keys.append(local_key)
+        self._publish(local_keys)
+        return []
+
+    def delete_many(self, keys, version=None):
+        self._call_remote("delete_many", keys, version)
+        local_keys = []
+        for key in keys:
+            local_key = self.make_and_validate_key(key, version=version)
+            self._local.delete(local_key)
+            local_keys.append(local_key)
+        self._publish(local_keys)
+
+    def clear(self):
+        self._call_remote("clear")
+        self._local.clear()
+        self._publish(["*"])
+
+    def eval_script(self, script, keys, args):
+        """Runs a Lua script on Redis, where it executes atomically. Keys
+        are passed as they are, without the cache's key prefix or version.
+        Returns MISSING while Redis is unreachable."""
+        if self._node.is_down:
+            return MISSING
+        try:
+            client = self._remote._cache.get_client(write=True)
+            result = client.register_script(script)(keys, args)
+        except redis.RedisError as error:
+            self._node.mark_down(error)
+            return MISSING
+        self._node.mark_up()
+        return result
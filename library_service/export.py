@@ -0,0 +1,61 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+EXPORT_FORMATS = ("csv", "ndjson")
+EXPORT_CHUNK_SIZE = 2000
+ROWS_PER_WRITE = 500
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+class Echo:
+    """File-like object whose write() hands the line back to csv.writer."""
+
+    def write(self, line):
+        return line
+
+
+def _format_rows(rows, columns, file_format):
+    if file_format == "csv":
+        writer = csv.writer(Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder)
+            yield "\n"
+
+
+def stream_rows(queryset, fields, file_format):
+    """Streams `fields` ({column: lookup}) of every row in the queryset.
+
+    Rows are read through a server-side cursor in chunks and written out in
+    blocks, so memory use does not grow with the number of rows."""
+    rows = queryset.values_list(*fields.values()).iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    )
+    block = []
+    for line in _format_rows(rows, list(fields), file_format):
+        block.append(line)
+        if len(block) >= ROWS_PER_WRITE:
+            yield "".join(block)
+            block = []
+    if block:
+        yield "".join(block)
+
+
+def export_response(queryset, fields, file_format, file_name):
+    response = StreamingHttpResponse(
+        stream_rows(queryset, fields, file_format),
+        content_type=CONTENT_TYPES[file_format],
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="{file_name}.{file_format}"'
+    )
+    return response
@@ -29,6 +29,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     # External apps
     "rest_framework_simplejwt",
     "rest_framework",
@@ -39,6 +40,7 @@ INSTALLED_APPS = [
     "borrowing.apps.BorrowingConfig",
     "payment",
     "user",
+    "notification.apps.NotificationConfig",
 ]
 
 MIDDLEWARE = [
@@ -85,6 +87,9 @@ DATABASES = {
     }
 }
 
+# Threads (and so database connections) the Telegram bot uses for queries.
+BOT_DB_POOL_SIZE = int(os.environ.get("BOT_DB_POOL_SIZE", 10))
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -157,12 +162,30 @@ SIMPLE_JWT = {
 # Telegram Bot Token
 
 TELEGRAM_BOT_TOKEN = os.environ.get("TOKEN")
+# Secret Telegram sends with webhook updates; required for webhook mode.
+TELEGRAM_WEBHOOK_SECRET = os.environ.get("TELEGRAM_WEBHOOK_SECRET")
+TELEGRAM_API_URL = os.environ.get(
+    "TELEGRAM_API_URL", "https://api.telegram.org"
+)
+# Messages per second, for the whole bot and for a single chat.
+TELEGRAM_RATE_LIMIT = 30
+TELEGRAM_CHAT_RATE_LIMIT = 1
+# Notifications sent to one chat within this many seconds are delivered
+# together as a single digest.
+NOTIFICATION_DIGEST_WINDOW = int(
+    os.environ.get("NOTIFICATION_DIGEST_WINDOW", 60)
+)
+# Failed deliveries are moved to the dead-letter table after this many tries.
+NOTIFICATION_MAX_ATTEMPTS = 5
 
 # Stripe settings
 
 STRIPE_SECRET_KEY = os.environ.get("STRIPE_SECRET_KEY")
 STRIPE_API_VERSION = os.environ.get("STRIPE_API_VERSION")
 STRIPE_PUBLIC_KEY = os.environ.get("STRIPE_PUBLISHABLE_KEY")
+# A checkout session that still cannot be created after this many tries
+# is given up on and its borrowing is cancelled.
+PAYMENT_CHECKOUT_MAX_ATTEMPTS = 5
 
 # Django Q settings
 
@@ -184,11 +207,17 @@ REDIS_PASSWORD = os.environ.get("REDIS_PASSWORD")
 
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "BACKEND": "library_service.cache.TwoTierCache",
         "LOCATION": os.getenv(
             "REDIS_URL",
-            f"redis://:{REDIS_PASSWORD}@{REDIS_HOST}:{REDIS_PORT}/0",
+            f"redis://:{REDIS_PASSWORD}@{REDIS_HOST}:{REDIS_PORT}/0"
+            "?socket_connect_timeout=1&socket_timeout=1",
         ),
+        "OPTIONS": {
+            "LOCAL_MAX_ENTRIES": 1000,
+            "LOCAL_TIMEOUT": 30,
+            "RETRY_INTERVAL": 5,
+        },
     }
 }
 
@@ -0,0 +1,308 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import redis
+from django.test import SimpleTestCase
+
+from library_service.cache import CacheNode, LocalTier, MISSING, TwoTierCache
+
+
+class FakeRedis:
+    """Dict-backed stand-in for the remote RedisCache and its pub/sub,
+    shared by every fake worker of a test."""
+
+    def __init__(self):
+        self.data = {}
+        self.down = False
+        self.calls = 0
+        self.subscribers = []
+        # Runs while a read is in flight, to interleave other workers.
+        self.during_read = None
+        self._cache = SimpleNamespace(get_client=lambda write=False: self)
+
+    def _check(self):
+        self.calls += 1
+        if self.down:
+            raise redis.ConnectionError("Connection refused")
+
+    def _read(self):
+        during_read, self.during_read = self.during_read, None
+        if during_read:
+            during_read()
+
+    def get(self, key, default=None, version=None):
+        self._check()
+        value = self.data.get(key, default)
+        self._read()
+        return value
+
+    def get_many(self, keys, version=None):
+        self._check()
+        found = {key: self.data[key] for key in keys if key in self.data}
+        self._read()
+        return found
+
+    def set(self, key, value, timeout=None, version=None):
+        self._check()
+        self.data[key] = value
+
+    def add(self, key, value, timeout=None, version=None):
+        self._check()
+        if key in self.data:
+            return False
+        self.data[key] = value
+        return True
+
+    def delete(self, key, version=None):
+        self._check()
+        return self.data.pop(key, MISSING) is not MISSING
+
+    def incr(self, key, delta=1, version=None):
+        self._check()
+        if key not in self.data:
+            raise ValueError(f"Key '{key}' not found")
+        self.data[key] += delta
+        return self.data[key]
+
+    def clear(self):
+        self._check()
+        self.data.clear()
+
+    def publish(self, channel, message):
+        self._check()
+        for node in self.subscribers:
+            node._handle(message)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CacheTestCase(SimpleTestCase):
+    def setUp(self):
+        self.clock = Clock()
+        patcher = patch("library_service.cache.time.monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.redis = FakeRedis()
+
+    def make_worker(self, **options):
+        """A TwoTierCache with its own node, as in a separate process."""
+        options = {
+            "LOCAL_MAX_ENTRIES": 100,
+            "LOCAL_TIMEOUT": 30,
+            "RETRY_INTERVAL": 5,
+            **options,
+        }
+        cache = TwoTierCache(
+            "redis://fake:6379/0", {"TIMEOUT": 300, "OPTIONS": options}
+        )
+        cache._remote = self.redis
+        cache._node = CacheNode(
+            "redis://fake:6379/0",
+            "cache:invalidate",
+            options["LOCAL_MAX_ENTRIES"],
+            options["RETRY_INTERVAL"],
+        )
+        cache._node.ensure_listener = lambda: None
+        self.redis.subscribers.append(cache._node)
+        return cache
+
+
+class LocalTierTests(CacheTestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        tier = LocalTier(max_entries=2)
+        tier.set("a", 1, None)
+        tier.set("b", 2, None)
+        tier.get("a")
+        tier.set("c", 3, None)
+
+        self.assertEqual(tier.get("a"), 1)
+        self.assertIs(tier.get("b"), MISSING)
+        self.assertEqual(tier.get("c"), 3)
+
+    def test_entries_expire(self):
+        tier = LocalTier(max_entries=10)
+        tier.set("a", 1, 10)
+        self.clock.now += 9
+        self.assertEqual(tier.get("a"), 1)
+        self.clock.now += 1
+        self.assertIs(tier.get("a"), MISSING)
+
+    def test_add_and_incr(self):
+        tier = LocalTier(max_entries=10)
+        self.assertTrue(tier.add("a", 1, 10))
+        self.assertFalse(tier.add("a", 5, 10))
+        self.assertEqual(tier.incr("a", 2), 3)
+        self.assertIs(tier.incr("missing", 1), MISSING)
+
+        # incr keeps the expiry of the entry.
+        self.clock.now += 10
+        self.assertIs(tier.get("a"), MISSING)
+        self.assertTrue(tier.add("a", 7, 10))
+
+
+class TwoTierCacheTests(CacheTestCase):
+    def test_reads_are_served_from_the_local_tier(self):
+        cache = self.make_worker()
+        cache.set("key", "value")
+        calls = self.redis.calls
+
+        self.assertEqual(cache.get("key"), "value")
+        self.assertEqual(self.redis.calls, calls)
+
+    def test_local_timeout_bounds_staleness(self):
+        cache = self.make_worker(LOCAL_TIMEOUT=30)
+        cache.set("key", "old")
+        # Changed behind the cache's back, e.g. by a lost invalidation.
+        self.redis.data["key"] = "new"
+
+        self.assertEqual(cache.get("key"), "old")
+        self.clock.now += 30
+        self.assertEqual(cache.get("key"), "new")
+
+    def test_writes_invalidate_other_workers(self):
+        first = self.make_worker()
+        second = self.make_worker()
+        first.set("key", 1)
+        self.assertEqual(second.get("key"), 1)
+
+        first.set("key", 2)
+        self.assertEqual(second.get("key"), 2)
+
+        first.delete("key")
+        self.assertIsNone(second.get("key"))
+
+        second.set("other", 1)
+        first.clear()
+        self.assertIsNone(second.get("other"))
+
+    def test_value_invalidated_during_a_read_is_not_kept(self):
+        reader = self.make_worker()
+        writer = self.make_worker()
+        writer.set("key", "old")
+        writer.set("other", "old")
+
+        # The new values are written and broadcast after the reads fetched
+        # the old ones, but before they reached the local tier.
+        self.redis.during_read = lambda: writer.set("key", "new")
+        self.assertEqual(reader.get("key"), "old")
+        self.redis.during_read = lambda: writer.set("other", "new")
+        self.assertEqual(reader.get_many(["other"]), {"other": "old"})
+
+        self.assertEqual(reader.get("key"), "new")
+        self.assertEqual(reader.get("other"), "new")
+
+    def test_workers_ignore_their_own_invalidations(self):
+        cache = self.make_worker()
+        cache.set("key", 1)
+        calls = self.redis.calls
+
+        self.assertEqual(cache.get("key"), 1)
+        self.assertEqual(self.redis.calls, calls)
+
+    def test_add_is_decided_by_redis(self):
+        first = self.make_worker()
+        second = self.make_worker()
+
+        self.assertTrue(first.add("key", 1))
+        self.assertFalse(second.add("key", 2))
+        self.assertEqual(second.get("key"), 1)
+
+    def test_incr(self):
+        first = self.make_worker()
+        second = self.make_worker()
+        with self.assertRaises(ValueError):
+            first.incr("counter")
+
+        first.set("counter", 1)
+        self.assertEqual(second.get("counter"), 1)
+        self.assertEqual(first.incr("counter", 2), 3)
+        self.assertEqual(second.get("counter"), 3)
+
+    def test_concurrent_aincr_loses_no_updates(self):
+        cache = self.make_worker()
+        cache.set("counter", 0)
+
+        async def run():
+            return await asyncio.gather(
+                *(cache.aincr("counter") for _ in range(20))
+            )
+
+        self.assertEqual(sorted(asyncio.run(run())), list(range(1, 21)))
+        self.assertEqual(cache.get("counter"), 20)
+
+    def test_falls_back_to_the_local_tier_while_redis_is_down(self):
+        cache = self.make_worker(RETRY_INTERVAL=5)
+        self.redis.down = True
+
+        cache.set("key", "value")
+        self.assertTrue(cache._node.is_down)
+        self.assertEqual(cache.get("key"), "value")
+        self.assertTrue(cache.add("lock", 1, 10))
+        self.assertFalse(cache.add("lock", 1, 10))
+        cache.set("counter", 0)
+        self.assertEqual(cache.incr("counter"), 1)
+        with self.assertRaises(ValueError):
+            cache.incr("missing")
+
+    def test_local_incr_is_atomic_while_redis_is_down(self):
+        cache = self.make_worker()
+        self.redis.down = True
+        cache.set("counter", 0)
+
+        def worker():
+            for _ in range(200):
+                cache.incr("counter")
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(cache.get("counter"), 1600)
+
+    def test_redis_is_retried_after_the_retry_interval(self):
+        cache = self.make_worker(RETRY_INTERVAL=5)
+        self.redis.data["remote"] = "value"
+        self.redis.down = True
+        cache.set("local", "stale")
+        calls = self.redis.calls
+
+        # No remote calls while Redis is marked down.
+        self.assertIsNone(cache.get("remote"))
+        self.assertEqual(self.redis.calls, calls)
+
+        self.redis.down = False
+        self.clock.now += 5
+        self.assertEqual(cache.get("remote"), "value")
+        self.assertFalse(cache._node.is_down)
+        # Invalidations may have been missed meanwhile, so the local tier
+        # was dropped.
+        self.assertIsNone(cache.get("local"))
+
+
+class CacheNodeTests(SimpleTestCase):
+    @patch.object(CacheNode, "_listen")
+    def test_listener_is_restarted_after_a_fork(self, mock_listen):
+        node = CacheNode("redis://fake:6379/0", "cache:invalidate", 10, 5)
+        with patch("library_service.cache.os.getpid", return_value=100):
+            node.ensure_listener()
+            node.ensure_listener()
+        parent_id = node.id
+        node.local.set("key", 1, None)
+
+        with patch("library_service.cache.os.getpid", return_value=101):
+            node.ensure_listener()
+
+        self.assertEqual(mock_listen.call_count, 2)
+        # The child must not drop its parent's messages as its own.
+        self.assertNotEqual(node.id, parent_id)
+        self.assertIs(node.local.get("key"), MISSING)
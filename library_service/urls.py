@@ -12,6 +12,10 @@ urlpatterns = [
     path("api/library/", include("library.urls", namespace="library")),
     path("api/payment/", include("payment.urls", namespace="payment")),
     path("api/user/", include("user.urls", namespace="user")),
+    path(
+        "api/telegram/",
+        include("notification.urls", namespace="notification"),
+    ),
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     path(
         "api/schema/swagger-ui/",
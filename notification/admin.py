@@ -0,0 +1,7 @@
+from django.contrib import admin
+from notification.models import DeadLetter, Delivery, PendingNotification
+
+
+admin.site.register(PendingNotification)
+admin.site.register(Delivery)
+admin.site.register(DeadLetter)
@@ -0,0 +1,131 @@
+import time
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django_q.tasks import async_task
+
+from notification.models import DeadLetter, Delivery
+from notification.telegram import deliver_messages
+
+CLAIM_BATCH_SIZE = 100
+# A claimed delivery is handed to another worker if it is not settled
+# within this time, e.g. because the worker died mid-batch.
+CLAIM_LEASE = timedelta(minutes=5)
+RETRY_BASE = timedelta(seconds=30)
+RETRY_MAX = timedelta(hours=1)
+# Stay well inside the django-q task timeout.
+PROCESS_TIME_LIMIT = 40
+
+
+def enqueue_deliveries(messages):
+    """Records (chat_id, message) pairs in the ledger in the current
+    transaction and starts a worker once it commits."""
+    deliveries = Delivery.objects.bulk_create(
+        [
+            Delivery(chat_id=chat_id, message=message)
+            for chat_id, message in messages
+            if chat_id
+        ]
+    )
+    if deliveries:
+        transaction.on_commit(
+            partial(async_task, "notification.delivery.process_deliveries")
+        )
+    return len(deliveries)
+
+
+def deliver(chat_id, message):
+    enqueue_deliveries([(chat_id, message)])
+
+
+def claim_deliveries(batch_size=CLAIM_BATCH_SIZE):
+    now = timezone.now()
+    with transaction.atomic():
+        deliveries = list(
+            Delivery.objects.select_for_update(skip_locked=True)
+            .filter(status="PENDING", next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        Delivery.objects.filter(
+            pk__in=[delivery.pk for delivery in deliveries]
+        ).update(attempts=F("attempts") + 1, next_attempt_at=now + CLAIM_LEASE)
+    for delivery in deliveries:
+        delivery.attempts += 1
+    return deliveries
+
+
+def retry_delay(attempts):
+    return min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX)
+
+
+def record_results(deliveries, errors):
+    now = timezone.now()
+    sent = []
+    failed = []
+    dead_letters = []
+    for delivery, error in zip(deliveries, errors):
+        if error is None:
+            sent.append(delivery.pk)
+            continue
+        delivery.last_error = error
+        if delivery.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+            delivery.status = "FAILED"
+            dead_letters.append(DeadLetter(delivery=delivery, error=error))
+        else:
+            delivery.next_attempt_at = now + retry_delay(delivery.attempts)
+        failed.append(delivery)
+
+    with transaction.atomic():
+        Delivery.objects.filter(pk__in=sent).update(
+            status="SENT", sent_at=now, last_error=""
+        )
+        Delivery.objects.bulk_update(
+            failed, ["status", "last_error", "next_attempt_at"]
+        )
+        DeadLetter.objects.bulk_create(dead_letters)
+
+
+def process_deliveries(batch_size=CLAIM_BATCH_SIZE):
+    """Claims due deliveries in batches and sends them. Several workers can
+    run this at once; SKIP LOCKED keeps their batches apart. Rows are only
+    marked sent after Telegram accepted them, so a crash leads to a resend
+    rather than a lost message."""
+    started = time.monotonic()
+    processed = 0
+    while time.monotonic() - started < PROCESS_TIME_LIMIT:
+        deliveries = claim_deliveries(batch_size)
+        if not deliveries:
+            return processed
+        errors = deliver_messages(
+            (delivery.chat_id, delivery.message) for delivery in deliveries
+        )
+        record_results(deliveries, errors)
+        processed += len(deliveries)
+
+    async_task("notification.delivery.process_deliveries", batch_size)
+    return processed
+
+
+def replay_dead_letters(dead_letters):
+    """Puts the deliveries of the given dead letters back in the queue."""
+    with transaction.atomic():
+        delivery_ids = list(
+            dead_letters.values_list("delivery_id", flat=True)
+        )
+        Delivery.objects.filter(pk__in=delivery_ids).update(
+            status="PENDING",
+            attempts=0,
+            next_attempt_at=timezone.now(),
+        )
+        DeadLetter.objects.filter(delivery_id__in=delivery_ids).delete()
+        if delivery_ids:
+            transaction.on_commit(
+                partial(
+                    async_task, "notification.delivery.process_deliveries"
+                )
+            )
+    return len(delivery_ids)
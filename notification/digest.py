@@ -0,0 +1,78 @@
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django_q.models import Schedule
+from django_q.tasks import schedule
+
+from notification.models import PendingNotification
+from notification.delivery import enqueue_deliveries
+
+MAX_MESSAGE_LENGTH = 4096
+SEPARATOR = "\n\n➖➖➖➖➖\n\n"
+
+
+def notify(chat_id, message):
+    """Buffers a message for the chat; everything buffered within
+    NOTIFICATION_DIGEST_WINDOW seconds is delivered as one digest."""
+    if not chat_id:
+        return
+    PendingNotification.objects.create(chat_id=chat_id, message=message)
+    transaction.on_commit(partial(schedule_flush, chat_id))
+
+
+def schedule_flush(chat_id):
+    window = settings.NOTIFICATION_DIGEST_WINDOW
+    # Only the first message of a window schedules the flush.
+    if not cache.add(f"notification:digest:{chat_id}", True, window):
+        return
+    schedule(
+        "notification.digest.flush_digest",
+        chat_id,
+        schedule_type=Schedule.ONCE,
+        next_run=timezone.now() + timedelta(seconds=window),
+    )
+
+
+def build_digest(messages):
+    """Joins messages into as few Telegram messages as the length limit
+    allows."""
+    if len(messages) == 1:
+        return messages
+    header = f"📬 You have {len(messages)} new notifications\n\n"
+    parts = []
+    current = header
+    for message in messages:
+        candidate = (
+            message if current == header else SEPARATOR + message
+        )
+        if len(current) + len(candidate) > MAX_MESSAGE_LENGTH:
+            parts.append(current)
+            current = ""
+            candidate = message
+        current += candidate
+    parts.append(current)
+    return parts
+
+
+def flush_digest(chat_id):
+    """Moves the buffered messages of the chat into the delivery ledger
+    as one digest."""
+    with transaction.atomic():
+        pending = list(
+            PendingNotification.objects.select_for_update(skip_locked=True)
+            .filter(chat_id=chat_id)
+            .order_by("id")
+        )
+        if not pending:
+            return
+        PendingNotification.objects.filter(
+            pk__in=[notification.pk for notification in pending]
+        ).delete()
+        messages = build_digest(
+            [notification.message for notification in pending]
+        )
+        enqueue_deliveries((chat_id, message) for message in messages)
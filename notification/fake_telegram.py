@@ -0,0 +1,75 @@
+import asyncio
+import json
+import time
+
+
+class FakeTelegramAPI:
+    """Minimal keep-alive HTTP server that answers sendMessage like the
+    Bot API, for benchmarking the sender offline.
+
+    `latency` delays every response, and `rate_limit` answers 429 once more
+    than that many requests arrive within the same second."""
+
+    def __init__(self, latency=0.0, rate_limit=None):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.connections = 0
+        self.requests = 0
+        self.rejected = 0
+        self._window = 0
+        self._window_requests = 0
+        self._server = None
+
+    async def start(self, host="127.0.0.1", port=0):
+        self._server = await asyncio.start_server(self._handle, host, port)
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.decode("latin-1").split("\r\n")[1:]:
+                    name, _, value = line.partition(":")
+                    if name.strip().lower() == "content-length":
+                        length = int(value)
+                await reader.readexactly(length)
+                status, body = await self._respond()
+                payload = json.dumps(body).encode()
+                writer.write(
+                    f"HTTP/1.1 {status}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(payload)}\r\n\r\n".encode()
+                    + payload
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self):
+        self.requests += 1
+        if self.rate_limit:
+            window = int(time.time())
+            if window != self._window:
+                self._window = window
+                self._window_requests = 0
+            self._window_requests += 1
+            if self._window_requests > self.rate_limit:
+                self.rejected += 1
+                return "429 Too Many Requests", {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": "Too Many Requests: retry after 1",
+                    "parameters": {"retry_after": 1},
+                }
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return "200 OK", {"ok": True, "result": {}}
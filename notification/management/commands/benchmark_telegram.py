@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+from django.core.management import BaseCommand
+
+from notification.fake_telegram import FakeTelegramAPI
+from notification.telegram import TelegramSender
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Measure Telegram sender throughput against a local fake Bot API."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=1000)
+        parser.add_argument("--chats", type=int, default=1000)
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.05,
+            help="Seconds the fake API takes to answer each request.",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=30,
+            help="Global messages per second allowed by the sender.",
+        )
+        parser.add_argument(
+            "--server-limit",
+            type=int,
+            default=None,
+            help="Requests per second after which the fake API answers 429.",
+        )
+        parser.add_argument("--concurrency", type=int, default=50)
+
+    def handle(self, *args, **options):
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        api = FakeTelegramAPI(options["latency"], options["server_limit"])
+        base_url = await api.start()
+        messages = [
+            (index % options["chats"], f"Benchmark message {index}")
+            for index in range(options["messages"])
+        ]
+        try:
+            async with TelegramSender(
+                token="benchmark",
+                base_url=base_url,
+                rate=options["rate"],
+                chat_rate=1,
+                concurrency=options["concurrency"],
+            ) as sender:
+                started = time.perf_counter()
+                delivered = await sender.send_many(messages)
+                elapsed = time.perf_counter() - started
+        finally:
+            await api.stop()
+
+        self.stdout.write(
+            f"Delivered {delivered}/{len(messages)} messages in "
+            f"{elapsed:.2f}s ({delivered / elapsed:.1f}/s)"
+        )
+        self.stdout.write(
+            f"Requests: {api.requests}, connections opened: "
+            f"{api.connections}, rejected with 429: {api.rejected}"
+        )
@@ -0,0 +1,36 @@
+from django.core.management import BaseCommand, CommandError
+
+from notification.delivery import replay_dead_letters
+from notification.models import DeadLetter
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Queue dead-lettered Telegram notifications for delivery again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "ids",
+            nargs="*",
+            type=int,
+            help="Dead letter ids to replay.",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Replay every dead letter.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["ids"] and not options["all"]:
+            raise CommandError("Pass dead letter ids or --all.")
+
+        dead_letters = DeadLetter.objects.all()
+        if options["ids"]:
+            dead_letters = dead_letters.filter(pk__in=options["ids"])
+
+        replayed = replay_dead_letters(dead_letters)
+        self.stdout.write(
+            self.style.SUCCESS(f"Queued {replayed} deliveries again")
+        )
@@ -0,0 +1,53 @@
+import asyncio
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from telegram import Bot, Update
+
+
+class Command(BaseCommand):
+    help = (  # noqa: VNE003
+        "Point the Telegram bot at the webhook endpoint, or remove the "
+        "webhook to go back to polling."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "url",
+            nargs="?",
+            help="Public URL of /api/telegram/webhook/.",
+        )
+        parser.add_argument(
+            "--delete",
+            action="store_true",
+            help="Remove the webhook.",
+        )
+
+    def handle(self, *args, **options):
+        if options["delete"]:
+            asyncio.run(self.delete_webhook())
+            self.stdout.write(self.style.SUCCESS("Webhook removed"))
+            return
+
+        if not options["url"]:
+            raise CommandError("Pass the webhook URL or --delete.")
+        if not settings.TELEGRAM_WEBHOOK_SECRET:
+            raise CommandError("Set TELEGRAM_WEBHOOK_SECRET first.")
+        asyncio.run(self.set_webhook(options["url"]))
+        self.stdout.write(
+            self.style.SUCCESS(f"Webhook set to {options['url']}")
+        )
+
+    @staticmethod
+    async def set_webhook(url):
+        async with Bot(settings.TELEGRAM_BOT_TOKEN) as bot:
+            await bot.set_webhook(
+                url=url,
+                secret_token=settings.TELEGRAM_WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES,
+            )
+
+    @staticmethod
+    async def delete_webhook():
+        async with Bot(settings.TELEGRAM_BOT_TOKEN) as bot:
+            await bot.delete_webhook()
@@ -0,0 +1,23 @@
+# Generated by Django 4.0.4 on 2026-10-18 20:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notification', '0002_delivery_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatConversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chat_id', models.CharField(max_length=50, unique=True)),
+                ('state', models.CharField(choices=[('EMAIL', 'Email'), ('FIRST_NAME', 'First name'), ('LAST_NAME', 'Last name')], max_length=10)),
+                ('data', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
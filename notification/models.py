@@ -0,0 +1,80 @@
+from django.db import models
+from django.utils import timezone
+
+
+class PendingNotification(models.Model):
+    chat_id = models.CharField(max_length=50)
+    message = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["chat_id", "id"],
+                name="notification_pending_chat_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.chat_id}: {self.message[:30]}"
+
+
+class Delivery(models.Model):
+    STATUS_CHOICES = [
+        ("PENDING", "Pending"),
+        ("SENT", "Sent"),
+        ("FAILED", "Failed"),
+    ]
+
+    chat_id = models.CharField(max_length=50)
+    message = models.TextField()
+    status = models.CharField(
+        max_length=7, choices=STATUS_CHOICES, default="PENDING"
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "deliveries"
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at"],
+                condition=models.Q(status="PENDING"),
+                name="notification_delivery_due_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.chat_id} - {self.get_status_display()}"
+
+
+class DeadLetter(models.Model):
+    delivery = models.OneToOneField(
+        Delivery, on_delete=models.CASCADE, related_name="dead_letter"
+    )
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.delivery.chat_id}: {self.error[:30]}"
+
+
+class ChatConversation(models.Model):
+    """Where a chat is in the bot's /start registration flow."""
+
+    STATE_CHOICES = [
+        ("EMAIL", "Email"),
+        ("FIRST_NAME", "First name"),
+        ("LAST_NAME", "Last name"),
+    ]
+
+    chat_id = models.CharField(max_length=50, unique=True)
+    state = models.CharField(max_length=10, choices=STATE_CHOICES)
+    data = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.chat_id}: {self.get_state_display()}"
@@ -0,0 +1,32 @@
+from django_q.tasks import async_task
+
+from notification.telegram import send_messages
+from user.models import User
+
+BROADCAST_BATCH_SIZE = 500
+
+
+def get_subscribed_chat_ids(batch_size=BROADCAST_BATCH_SIZE):
+    return (
+        User.objects.exclude(telegram_chat_id__isnull=True)
+        .order_by("pk")
+        .values_list("telegram_chat_id", flat=True)
+        .iterator(chunk_size=batch_size)
+    )
+
+
+def broadcast(message, batch_size=BROADCAST_BATCH_SIZE):
+    """Splits the subscribers into batches and enqueues one send_batch task
+    per batch, so the fanout is spread across the cluster workers."""
+    batch = []
+    for chat_id in get_subscribed_chat_ids(batch_size):
+        batch.append(chat_id)
+        if len(batch) >= batch_size:
+            async_task("notification.tasks.send_batch", batch, message)
+            batch = []
+    if batch:
+        async_task("notification.tasks.send_batch", batch, message)
+
+
+def send_batch(chat_ids, message):
+    return send_messages((chat_id, message) for chat_id in chat_ids)
@@ -0,0 +1,355 @@
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+from functools import partial
+
+import httpx
+from django.conf import settings
+from django.core.cache import cache
+
+from library_service.cache import MISSING
+
+logger = logging.getLogger(__name__)
+
+REQUEST_TIMEOUT = httpx.Timeout(10, connect=3)
+MAX_CONCURRENCY = 50
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5
+
+
+# Refills the chat and bot buckets (KEYS[1], KEYS[2]) and takes a token from
+# both, or from neither. ARGV holds the rate and capacity of each bucket.
+# Returns how long to wait before trying again, "0" once the tokens are
+# taken. KEYS[3] is set while the chat is paused after a 429.
+TAKE_SCRIPT = """
+local paused = redis.call('PTTL', KEYS[3])
+if paused > 0 then
+    return tostring(paused / 1000)
+end
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local tokens = {}
+local wait = 0
+for i = 1, 2 do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local capacity = tonumber(ARGV[2 * i])
+    local bucket = redis.call('HMGET', KEYS[i], 'tokens', 'at')
+    local level = tonumber(bucket[1]) or capacity
+    local at = tonumber(bucket[2]) or now
+    tokens[i] = math.min(capacity, level + math.max(0, now - at) * rate)
+    if tokens[i] < 1 then
+        wait = math.max(wait, (1 - tokens[i]) / rate)
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i = 1, 2 do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local capacity = tonumber(ARGV[2 * i])
+    redis.call('HSET', KEYS[i], 'tokens', tokens[i] - 1, 'at', now)
+    redis.call('PEXPIRE', KEYS[i], math.ceil(capacity / rate * 1000) + 1000)
+end
+return '0'
+"""
+PAUSE_SCRIPT = "redis.call('SET', KEYS[1], 1, 'PX', ARGV[1])"
+# Bucket capacity in seconds of the rate: short bursts are allowed, but any
+# one second never sees more than 1.1 times the rate.
+BURST_SECONDS = 0.1
+
+
+class LocalBuckets:
+    """Token buckets kept in this process, used while Redis is unreachable;
+    every process then enforces the limits on its own."""
+
+    MAX_BUCKETS = 10000
+
+    def __init__(self):
+        self._buckets = {}
+        self._pauses = {}
+        self._lock = threading.Lock()
+
+    def take(self, buckets, pause_key):
+        """Takes a token from each (key, rate, capacity) bucket, or from
+        none. Returns how long to wait before trying again, 0 once taken."""
+        now = time.monotonic()
+        with self._lock:
+            paused = self._pauses.get(pause_key, 0) - now
+            if paused > 0:
+                return paused
+            self._pauses.pop(pause_key, None)
+            levels = []
+            wait = 0
+            for key, rate, capacity in buckets:
+                level, at = self._buckets.get(key, (capacity, now))
+                level = min(capacity, level + (now - at) * rate)
+                levels.append(level)
+                if level < 1:
+                    wait = max(wait, (1 - level) / rate)
+            if wait:
+                return wait
+            if len(self._buckets) >= self.MAX_BUCKETS:
+                self._buckets.clear()
+            for (key, rate, capacity), level in zip(buckets, levels):
+                self._buckets[key] = (level - 1, now)
+            return 0
+
+    def pause(self, pause_key, seconds):
+        with self._lock:
+            self._pauses[pause_key] = time.monotonic() + seconds
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+            self._pauses.clear()
+
+
+local_buckets = LocalBuckets()
+
+
+class SharedRateLimiter:
+    """Global and per-chat Telegram rate limits kept in Redis, so every
+    call, process and django-q worker sending for the same bot draws from
+    one budget.
+
+    Each limit is a token bucket. One Lua script refills both buckets of a
+    send and takes from them atomically, in a single round trip. A 429
+    response pauses only its chat, for the `retry_after` Telegram asks for.
+    """
+
+    def __init__(self, token, rate, chat_rate):
+        # Keys are derived from the token without exposing it.
+        digest = hashlib.md5(token.encode()).hexdigest()[:12]
+        self.prefix = f"telegram:{digest}"
+        self.rate = rate
+        self.chat_rate = chat_rate
+
+    async def acquire(self, chat_id):
+        loop = asyncio.get_running_loop()
+        while True:
+            # redis-py 3 has no asyncio client.
+            wait = await loop.run_in_executor(None, self._take, chat_id)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    async def pause(self, chat_id, seconds):
+        """Hands out no tokens for the chat for `seconds`, e.g. after a
+        429."""
+        key = self._pause_key(chat_id)
+        result = await asyncio.get_running_loop().run_in_executor(
+            None,
+            partial(
+                self._eval, PAUSE_SCRIPT, [key], [math.ceil(seconds * 1000)]
+            ),
+        )
+        if result is MISSING:
+            local_buckets.pause(key, seconds)
+
+    def _pause_key(self, chat_id):
+        return f"{self.prefix}:pause:{chat_id}"
+
+    def _buckets(self, chat_id):
+        return [
+            (
+                f"{self.prefix}:chat:{chat_id}",
+                self.chat_rate,
+                max(1, self.chat_rate * BURST_SECONDS),
+            ),
+            (
+                f"{self.prefix}:bot",
+                self.rate,
+                max(1, self.rate * BURST_SECONDS),
+            ),
+        ]
+
+    def _take(self, chat_id):
+        buckets = self._buckets(chat_id)
+        pause_key = self._pause_key(chat_id)
+        keys = [key for key, _, _ in buckets] + [pause_key]
+        args = []
+        for _, rate, capacity in buckets:
+            args += [rate, capacity]
+        wait = self._eval(TAKE_SCRIPT, keys, args)
+        if wait is MISSING:
+            return local_buckets.take(buckets, pause_key)
+        return float(wait)
+
+    @staticmethod
+    def _eval(script, keys, args):
+        eval_script = getattr(cache, "eval_script", None)
+        if eval_script is None:
+            return MISSING
+        return eval_script(script, keys, args)
+
+
+class TelegramSender:
+    """Sends messages over one pooled keep-alive connection set.
+
+    Every request waits for a token from the shared global and per-chat
+    buckets, and a 429 response pauses its chat for the `retry_after`
+    Telegram asks for. Use it as an async context manager.
+    """
+
+    def __init__(
+        self,
+        token=None,
+        base_url=None,
+        rate=None,
+        chat_rate=None,
+        concurrency=MAX_CONCURRENCY,
+    ):
+        token = token or settings.TELEGRAM_BOT_TOKEN
+        base_url = base_url or settings.TELEGRAM_API_URL
+        self.url = f"{base_url}/bot{token}/sendMessage"
+        self.concurrency = concurrency
+        self.limiter = SharedRateLimiter(
+            token,
+            rate or settings.TELEGRAM_RATE_LIMIT,
+            chat_rate or settings.TELEGRAM_CHAT_RATE_LIMIT,
+        )
+        self.client = None
+
+    async def __aenter__(self):
+        self.client = httpx.AsyncClient(
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=self.concurrency,
+                max_keepalive_connections=self.concurrency,
+            ),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.client.aclose()
+        self.client = None
+
+    async def send(self, chat_id, text):
+        """Returns True once Telegram has accepted the message."""
+        return await self.deliver(chat_id, text) is None
+
+    async def deliver(self, chat_id, text):
+        """Returns None once Telegram has accepted the message, otherwise
+        the last error."""
+        error = None
+        for attempt in range(MAX_RETRIES):
+            await self.limiter.acquire(chat_id)
+            try:
+                response = await self.client.post(
+                    self.url, data={"chat_id": chat_id, "text": text}
+                )
+            except httpx.HTTPError as exception:
+                error = repr(exception)
+                logger.warning(
+                    "Telegram request to %s failed: %s", chat_id, error
+                )
+                await asyncio.sleep(BACKOFF_BASE * 2**attempt)
+                continue
+
+            if response.status_code == 429:
+                error = response.text
+                retry_after = (
+                    response.json().get("parameters", {}).get("retry_after", 1)
+                )
+                await self.limiter.pause(chat_id, retry_after)
+                continue
+            if response.status_code >= 500:
+                error = f"{response.status_code}: {response.text}"
+                await asyncio.sleep(BACKOFF_BASE * 2**attempt)
+                continue
+            if response.is_error:
+                logger.warning(
+                    "Telegram rejected message to %s: %s",
+                    chat_id,
+                    response.text,
+                )
+                return f"{response.status_code}: {response.text}"
+            return None
+
+        logger.warning("Giving up on Telegram message to %s", chat_id)
+        return error
+
+    async def deliver_many(self, messages):
+        """Sends (chat_id, text) pairs concurrently and returns the result
+        of deliver() for each of them, in order."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def deliver(chat_id, text):
+            async with semaphore:
+                return await self.deliver(chat_id, text)
+
+        return await asyncio.gather(
+            *(deliver(chat_id, text) for chat_id, text in messages)
+        )
+
+    async def send_many(self, messages):
+        """Sends (chat_id, text) pairs concurrently and returns how many
+        were delivered."""
+        errors = await self.deliver_many(messages)
+        return sum(error is None for error in errors)
+
+
+class SenderThread:
+    """Runs one long-lived TelegramSender on a private event loop thread,
+    so sync callers share its connections across calls instead of opening
+    a new client every time."""
+
+    def __init__(self, **sender_kwargs):
+        self.sender_kwargs = sender_kwargs
+        self.loop = None
+        self.sender = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            # Threads do not survive a fork, so a forked worker starts its
+            # own loop.
+            if self._pid == os.getpid():
+                return
+            loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=loop.run_forever, name="telegram-sender", daemon=True
+            ).start()
+            sender = TelegramSender(**self.sender_kwargs)
+            asyncio.run_coroutine_threadsafe(
+                sender.__aenter__(), loop
+            ).result()
+            self.loop, self.sender, self._pid = loop, sender, os.getpid()
+
+    def run(self, func, *args):
+        """Runs the coroutine function `func(sender, *args)` on the sender
+        loop and waits for its result."""
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(
+            func(self.sender, *args), self.loop
+        ).result()
+
+    def close(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            asyncio.run_coroutine_threadsafe(
+                self.sender.__aexit__(None, None, None), self.loop
+            ).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.loop, self.sender, self._pid = None, None, None
+
+
+sender_thread = SenderThread()
+
+
+def send_messages(messages):
+    return sender_thread.run(TelegramSender.send_many, list(messages))
+
+
+def deliver_messages(messages):
+    return sender_thread.run(TelegramSender.deliver_many, list(messages))
+
+
+def send_telegram_message(chat_id, message):
+    return send_messages([(chat_id, message)]) == 1
@@ -0,0 +1,62 @@
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+
+from notification.delivery import (
+    enqueue_deliveries,
+    process_deliveries,
+    replay_dead_letters,
+)
+from notification.models import DeadLetter, Delivery
+
+
+@override_settings(NOTIFICATION_MAX_ATTEMPTS=2)
+@patch("notification.delivery.async_task")
+class DeliveryTests(TestCase):
+    def setUp(self):
+        enqueue_deliveries([("1000", "First"), ("2000", "Second"), ("", "x")])
+
+    @patch("notification.delivery.deliver_messages", return_value=[None, None])
+    def test_deliveries_are_sent_once(self, mock_deliver, mock_async_task):
+        self.assertEqual(process_deliveries(), 2)
+        self.assertEqual(
+            Delivery.objects.filter(status="SENT").count(), 2
+        )
+
+        self.assertEqual(process_deliveries(), 0)
+        mock_deliver.assert_called_once()
+
+    @patch(
+        "notification.delivery.deliver_messages",
+        return_value=[None, "500: error"],
+    )
+    def test_failed_delivery_is_retried_later(
+        self, mock_deliver, mock_async_task
+    ):
+        process_deliveries()
+
+        failed = Delivery.objects.get(chat_id="2000")
+        self.assertEqual(failed.status, "PENDING")
+        self.assertEqual(failed.attempts, 1)
+        self.assertEqual(failed.last_error, "500: error")
+        self.assertEqual(process_deliveries(), 0)
+
+    @patch(
+        "notification.delivery.deliver_messages",
+        return_value=["403: blocked"],
+    )
+    def test_dead_letter_and_replay(self, mock_deliver, mock_async_task):
+        Delivery.objects.filter(chat_id="1000").delete()
+        Delivery.objects.update(attempts=1)
+
+        process_deliveries()
+
+        dead_letter = DeadLetter.objects.get()
+        self.assertEqual(dead_letter.delivery.status, "FAILED")
+        self.assertEqual(dead_letter.error, "403: blocked")
+
+        self.assertEqual(replay_dead_letters(DeadLetter.objects.all()), 1)
+        delivery = Delivery.objects.get()
+        self.assertEqual(delivery.status, "PENDING")
+        self.assertEqual(delivery.attempts, 0)
+        self.assertFalse(DeadLetter.objects.exists())
@@ -0,0 +1,74 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from notification.digest import (
+    MAX_MESSAGE_LENGTH,
+    build_digest,
+    flush_digest,
+    notify,
+)
+from notification.models import Delivery, PendingNotification
+
+
+class BuildDigestTests(SimpleTestCase):
+    def test_single_message_is_sent_as_is(self):
+        self.assertEqual(build_digest(["Hello"]), ["Hello"])
+
+    def test_messages_are_joined(self):
+        digest = build_digest(["First", "Second"])
+
+        self.assertEqual(len(digest), 1)
+        self.assertIn("2 new notifications", digest[0])
+        self.assertIn("First", digest[0])
+        self.assertIn("Second", digest[0])
+
+    def test_long_digest_is_split(self):
+        messages = ["x" * 3000, "y" * 3000]
+
+        digest = build_digest(messages)
+
+        self.assertEqual(len(digest), 2)
+        for part in digest:
+            self.assertLessEqual(len(part), MAX_MESSAGE_LENGTH)
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache"
+        }
+    }
+)
+class NotifyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @patch("notification.digest.schedule")
+    def test_burst_schedules_one_flush(self, mock_schedule):
+        with self.captureOnCommitCallbacks(execute=True):
+            notify("1000", "Borrowing created")
+            notify("1000", "Payment successful")
+
+        self.assertEqual(PendingNotification.objects.count(), 2)
+        mock_schedule.assert_called_once()
+
+    @patch("notification.delivery.async_task")
+    def test_flush_queues_one_digest(self, mock_async_task):
+        PendingNotification.objects.create(chat_id="1000", message="First")
+        PendingNotification.objects.create(chat_id="1000", message="Second")
+        PendingNotification.objects.create(chat_id="2000", message="Other")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            flush_digest("1000")
+
+        delivery = Delivery.objects.get()
+        self.assertEqual(delivery.chat_id, "1000")
+        self.assertIn("First", delivery.message)
+        self.assertIn("Second", delivery.message)
+        mock_async_task.assert_called_once()
+        self.assertEqual(
+            list(PendingNotification.objects.values_list("chat_id", flat=True)),
+            ["2000"],
+        )
@@ -0,0 +1,40 @@
+from unittest.mock import call, patch
+
+from django.test import TestCase
+
+from notification.tasks import broadcast, send_batch
+from user.models import User
+
+
+class BroadcastTests(TestCase):
+    def setUp(self):
+        for index in range(5):
+            User.objects.create_user(
+                email=f"user{index}@example.com",
+                password="password",
+                telegram_chat_id=1000 + index,
+            )
+        User.objects.create_user(
+            email="nochat@example.com", password="password"
+        )
+
+    @patch("notification.tasks.async_task")
+    def test_broadcast_enqueues_batches(self, mock_async_task):
+        broadcast("Hello", batch_size=2)
+
+        self.assertEqual(
+            mock_async_task.call_args_list,
+            [
+                call("notification.tasks.send_batch", [1000, 1001], "Hello"),
+                call("notification.tasks.send_batch", [1002, 1003], "Hello"),
+                call("notification.tasks.send_batch", [1004], "Hello"),
+            ],
+        )
+
+    @patch("notification.tasks.send_messages", return_value=2)
+    def test_send_batch(self, mock_send_messages):
+        sent = send_batch(["1000", "1001"], "Hello")
+
+        self.assertEqual(sent, 2)
+        messages = mock_send_messages.call_args.args[0]
+        self.assertEqual(list(messages), [("1000", "Hello"), ("1001", "Hello")])
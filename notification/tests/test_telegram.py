@@ -0,0 +1,144 @@
+import asyncio
+import time
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from notification.fake_telegram import FakeTelegramAPI
+from notification.telegram import (
+    SenderThread,
+    SharedRateLimiter,
+    TelegramSender,
+    local_buckets,
+)
+
+
+class TelegramSenderTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        local_buckets.clear()
+
+    def send(self, api, messages, **kwargs):
+        async def run():
+            base_url = await api.start()
+            try:
+                async with TelegramSender(
+                    token="test", base_url=base_url, **kwargs
+                ) as sender:
+                    return await sender.send_many(messages)
+            finally:
+                await api.stop()
+
+        return asyncio.run(run())
+
+    def test_send_many_reuses_connections(self):
+        api = FakeTelegramAPI()
+        messages = [(chat_id, "Hello") for chat_id in range(40)]
+
+        delivered = self.send(
+            api, messages, rate=1000, chat_rate=1, concurrency=4
+        )
+
+        self.assertEqual(delivered, 40)
+        self.assertEqual(api.requests, 40)
+        self.assertLessEqual(api.connections, 4)
+
+    def test_send_retries_after_rate_limit(self):
+        api = FakeTelegramAPI(rate_limit=5)
+        messages = [(chat_id, "Hello") for chat_id in range(10)]
+
+        delivered = self.send(api, messages, rate=1000, chat_rate=10)
+
+        self.assertEqual(delivered, 10)
+        self.assertGreater(api.rejected, 0)
+
+    def test_rate_limit_is_shared_between_senders(self):
+        api = FakeTelegramAPI()
+
+        async def run():
+            base_url = await api.start()
+            try:
+                async with TelegramSender(
+                    token="test", base_url=base_url, rate=10, chat_rate=10
+                ) as first, TelegramSender(
+                    token="test", base_url=base_url, rate=10, chat_rate=10
+                ) as second:
+                    started = time.monotonic()
+                    delivered = await asyncio.gather(
+                        first.send_many([(1, "Hello")] * 11),
+                        second.send_many([(2, "Hello")] * 11),
+                    )
+                    return sum(delivered), time.monotonic() - started
+            finally:
+                await api.stop()
+
+        delivered, elapsed = asyncio.run(run())
+
+        # 22 messages at 10 per second from one shared bucket.
+        self.assertEqual(delivered, 22)
+        self.assertGreater(elapsed, 1.9)
+
+
+class SharedRateLimiterTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        local_buckets.clear()
+        self.limiter = SharedRateLimiter("test", rate=100, chat_rate=1)
+
+    def test_bucket_spaces_out_sends_to_a_chat(self):
+        self.assertEqual(self.limiter._take(1), 0)
+        wait = self.limiter._take(1)
+        self.assertGreater(wait, 0.9)
+        self.assertLessEqual(wait, 1)
+        # Other chats draw from their own bucket.
+        self.assertEqual(self.limiter._take(2), 0)
+
+    def test_global_burst_is_bounded(self):
+        taken = sum(
+            self.limiter._take(chat_id) == 0 for chat_id in range(100)
+        )
+        # A tenth of a second's worth, not a whole window.
+        self.assertEqual(taken, 10)
+
+    def test_rate_limit_pauses_only_its_chat(self):
+        asyncio.run(self.limiter.pause(1, 5))
+
+        self.assertGreater(self.limiter._take(1), 4)
+        self.assertEqual(self.limiter._take(2), 0)
+
+
+class SenderThreadTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        local_buckets.clear()
+
+    def test_calls_reuse_the_sender_and_its_connections(self):
+        api = FakeTelegramAPI()
+        sender_thread = SenderThread(
+            token="test", rate=1000, chat_rate=1000, concurrency=1
+        )
+        # The fake API runs on the sender loop, so it is served while the
+        # calls below wait for their results.
+        sender_thread._ensure_started()
+        base_url = asyncio.run_coroutine_threadsafe(
+            api.start(), sender_thread.loop
+        ).result()
+        sender_thread.sender.url = f"{base_url}/bottest/sendMessage"
+        try:
+            sender = sender_thread.sender
+            for chat_id in range(3):
+                self.assertEqual(
+                    sender_thread.run(
+                        TelegramSender.send_many, [(chat_id, "Hello")]
+                    ),
+                    1,
+                )
+            self.assertIs(sender_thread.sender, sender)
+        finally:
+            asyncio.run_coroutine_threadsafe(
+                api.stop(), sender_thread.loop
+            ).result()
+            sender_thread.close()
+
+        self.assertEqual(api.requests, 3)
+        self.assertEqual(api.connections, 1)
@@ -0,0 +1,99 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
+
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from django.utils.asyncio import async_unsafe
+
+from library_service import asgi
+
+
+@override_settings(
+    TELEGRAM_WEBHOOK_SECRET="secret",
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache"
+        }
+    },
+)
+class TelegramWebhookTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = reverse("notification:telegram-webhook")
+
+    def post(self, data, secret="secret"):
+        return self.client.post(
+            self.url,
+            json.dumps(data),
+            content_type="application/json",
+            HTTP_X_TELEGRAM_BOT_API_SECRET_TOKEN=secret,
+        )
+
+    def test_wrong_secret_is_rejected(self):
+        response = self.post({"update_id": 1}, secret="wrong")
+
+        self.assertEqual(response.status_code, 403)
+
+    @patch("notification.views.get_application")
+    def test_duplicate_update_is_processed_once(self, mock_get_application):
+        application = mock_get_application.return_value
+        application.process_update = AsyncMock()
+
+        self.assertEqual(self.post({"update_id": 1}).status_code, 200)
+        self.assertEqual(self.post({"update_id": 1}).status_code, 200)
+
+        application.process_update.assert_called_once()
+
+
+class ASGIApplicationTests(SimpleTestCase):
+    def call(self, response):
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/api/borrowings/export/",
+            "query_string": b"",
+            "headers": [],
+        }
+        with patch.object(
+            asgi.application,
+            "get_response_async",
+            AsyncMock(return_value=response),
+        ):
+            asyncio.run(asgi.application(scope, receive, send))
+        return messages
+
+    def test_streaming_response_is_iterated_off_the_event_loop(self):
+        # Database queries are guarded the same way.
+        read_rows = async_unsafe(lambda: ["id\r\n", "1\r\n"])
+
+        def rows():
+            yield from read_rows()
+
+        messages = self.call(
+            StreamingHttpResponse(rows(), content_type="text/csv")
+        )
+
+        self.assertEqual(messages[0]["status"], 200)
+        self.assertIn(
+            (b"Content-Type", b"text/csv"), messages[0]["headers"]
+        )
+        body = b"".join(message.get("body", b"") for message in messages[1:])
+        self.assertEqual(body, b"id\r\n1\r\n")
+        self.assertFalse(messages[-1].get("more_body", False))
+
+    def test_regular_response(self):
+        messages = self.call(HttpResponse(b"ok"))
+
+        self.assertEqual(messages[0]["status"], 200)
+        self.assertEqual(messages[1]["body"], b"ok")
@@ -0,0 +1,9 @@
+from django.urls import path
+
+from notification.views import telegram_webhook
+
+urlpatterns = [
+    path("webhook/", telegram_webhook, name="telegram-webhook"),
+]
+
+app_name = "notification"
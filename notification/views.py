@@ -0,0 +1,73 @@
+import asyncio
+import json
+import logging
+import weakref
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import (
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+    HttpResponseNotAllowed,
+)
+from django.utils.crypto import constant_time_compare
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+# Telegram retries an update for a while if it gets no 200 response.
+UPDATE_DEDUPE_TIMEOUT = 60 * 60 * 24
+
+# An Application is bound to the event loop it was initialized in.
+_applications = weakref.WeakKeyDictionary()
+
+
+async def get_application():
+    loop = asyncio.get_running_loop()
+    application = _applications.get(loop)
+    if application is None:
+        from telegram_bot import build_application
+
+        application = build_application(webhook=True)
+        await application.initialize()
+        _applications[loop] = application
+    return application
+
+
+async def telegram_webhook(request):
+    """Receives updates from Telegram and hands them to the bot's
+    handlers. Updates are deduplicated by update_id across workers, so the
+    endpoint can be served by any number of processes."""
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+
+    secret = settings.TELEGRAM_WEBHOOK_SECRET
+    token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+    if not secret or not constant_time_compare(token, secret):
+        return HttpResponseForbidden()
+
+    try:
+        data = json.loads(request.body)
+        update_id = data["update_id"]
+    except (ValueError, KeyError, TypeError):
+        return HttpResponseBadRequest()
+
+    key = f"telegram:update:{update_id}"
+    if not await cache.aadd(key, True, UPDATE_DEDUPE_TIMEOUT):
+        return HttpResponse()
+
+    application = await get_application()
+    try:
+        await application.process_update(Update.de_json(data, application.bot))
+    except Exception:
+        # Let Telegram deliver the update again.
+        await cache.adelete(key)
+        logger.exception("Failed to process Telegram update %s", update_id)
+        raise
+    return HttpResponse()
+
+
+# csrf_exempt() in Django 4.0 wraps views in a sync function, which would
+# break this async view.
+telegram_webhook.csrf_exempt = True
@@ -0,0 +1,191 @@
+import time
+from datetime import timedelta
+from functools import partial
+
+import stripe
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Min
+from django.utils import timezone
+from django_q.models import Schedule
+from django_q.tasks import async_task, schedule
+from rest_framework.exceptions import ValidationError
+
+from payment.models import CheckoutOutbox, Payment
+
+CLAIM_BATCH_SIZE = 20
+# A claimed entry is handed to another worker if it is not settled within
+# this time, e.g. because the worker died mid-batch.
+CLAIM_LEASE = timedelta(minutes=5)
+RETRY_BASE = timedelta(seconds=10)
+RETRY_MAX = timedelta(minutes=10)
+# Stay well inside the django-q task timeout.
+PROCESS_TIME_LIMIT = 40
+
+SUCCESS_URL = (
+    "http://localhost:8000/api/payment/completed/"
+    "?session_id={CHECKOUT_SESSION_ID}"
+)
+CANCEL_URL = "http://localhost:8000/api/payment/canceled/"
+
+# Errors that retrying the same request will not fix.
+PERMANENT_ERRORS = (
+    stripe.error.InvalidRequestError,
+    stripe.error.AuthenticationError,
+    stripe.error.PermissionError,
+)
+
+
+def queue_checkout_session(borrowing):
+    """Creates the pending payment of a new borrowing and queues its
+    checkout session in the current transaction. A worker is started once
+    the transaction commits."""
+    payment = Payment.objects.create(
+        borrowing=borrowing,
+        money_to_pay=borrowing.calculate_total_price(),
+        status="PENDING",
+    )
+    CheckoutOutbox.objects.create(payment=payment)
+    transaction.on_commit(
+        partial(async_task, "payment.checkout.process_checkout_outbox")
+    )
+    return payment
+
+
+def create_checkout_session(payment):
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    return stripe.checkout.Session.create(
+        payment_method_types=["card"],
+        line_items=[
+            {
+                "price_data": {
+                    "currency": "usd",
+                    "product_data": {
+                        "name": payment.borrowing.book.title,
+                    },
+                    "unit_amount": int(payment.money_to_pay),
+                },
+                "quantity": 1,
+            }
+        ],
+        mode="payment",
+        success_url=SUCCESS_URL,
+        cancel_url=CANCEL_URL,
+        # A retry after a crash or timeout gets the session Stripe already
+        # created instead of a second one.
+        idempotency_key=f"checkout-session-{payment.pk}",
+    )
+
+
+def claim_checkouts(batch_size=CLAIM_BATCH_SIZE):
+    now = timezone.now()
+    with transaction.atomic():
+        entries = list(
+            CheckoutOutbox.objects.select_for_update(
+                skip_locked=True, of=("self",)
+            )
+            .select_related("payment__borrowing__book")
+            .defer("payment__borrowing__book__search_vector")
+            .filter(status="PENDING", next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        CheckoutOutbox.objects.filter(
+            pk__in=[entry.pk for entry in entries]
+        ).update(attempts=F("attempts") + 1, next_attempt_at=now + CLAIM_LEASE)
+    for entry in entries:
+        entry.attempts += 1
+    return entries
+
+
+def retry_delay(attempts):
+    return min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX)
+
+
+def record_session(entry, session):
+    payment = entry.payment
+    payment.session_url = session.url
+    payment.session_id = session.id
+    entry.status = "DONE"
+    entry.last_error = ""
+    entry.processed_at = timezone.now()
+    with transaction.atomic():
+        payment.save(update_fields=["session_url", "session_id", "updated_at"])
+        entry.save(update_fields=["status", "last_error", "processed_at"])
+
+
+def record_failure(entry, error):
+    entry.last_error = str(error)
+    if (
+        isinstance(error, PERMANENT_ERRORS)
+        or entry.attempts >= settings.PAYMENT_CHECKOUT_MAX_ATTEMPTS
+    ):
+        cancel_checkout(entry)
+        return
+    entry.next_attempt_at = timezone.now() + retry_delay(entry.attempts)
+    entry.save(update_fields=["last_error", "next_attempt_at"])
+
+
+def cancel_checkout(entry):
+    """Gives up on the checkout session: the payment is marked failed and
+    the borrowed copy goes back on the shelf."""
+    payment = entry.payment
+    borrowing = payment.borrowing
+    entry.status = "FAILED"
+    entry.processed_at = timezone.now()
+    payment.status = "FAILED"
+    with transaction.atomic():
+        entry.save(update_fields=["status", "last_error", "processed_at"])
+        payment.save(update_fields=["status", "updated_at"])
+        try:
+            borrowing.return_borrowing()
+        except ValidationError:
+            # The user returned the book while the session was failing.
+            pass
+
+
+def schedule_retry():
+    """Schedules a run for when the earliest pending entry falls due, so
+    retries do not depend on a periodic schedule."""
+    next_attempt_at = CheckoutOutbox.objects.filter(
+        status="PENDING"
+    ).aggregate(next_attempt_at=Min("next_attempt_at"))["next_attempt_at"]
+    if next_attempt_at is None:
+        return
+    # One run per due time, however many workers get here.
+    wait = (next_attempt_at - timezone.now()).total_seconds()
+    if not cache.add(
+        f"payment:checkout:retry:{next_attempt_at.timestamp()}",
+        True,
+        max(wait, 0) + 60,
+    ):
+        return
+    schedule(
+        "payment.checkout.process_checkout_outbox",
+        schedule_type=Schedule.ONCE,
+        next_run=next_attempt_at,
+    )
+
+
+def process_checkout_outbox(batch_size=CLAIM_BATCH_SIZE):
+    """Creates the checkout sessions of claimed outbox entries. Several
+    workers can run this at once; SKIP LOCKED keeps their batches apart.
+    Returns how many entries were processed."""
+    started = time.monotonic()
+    processed = 0
+    while time.monotonic() - started < PROCESS_TIME_LIMIT:
+        entries = claim_checkouts(batch_size)
+        if not entries:
+            schedule_retry()
+            return processed
+        for entry in entries:
+            try:
+                session = create_checkout_session(entry.payment)
+            except stripe.error.StripeError as error:
+                record_failure(entry, error)
+            else:
+                record_session(entry, session)
+        processed += len(entries)
+
+    async_task("payment.checkout.process_checkout_outbox", batch_size)
+    return processed
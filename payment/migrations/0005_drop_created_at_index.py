@@ -0,0 +1,17 @@
+# Generated by Django 4.0.4 on 2026-10-18 21:22
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0004_checkout_outbox'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='payment',
+            name='payment_created_at_idx',
+        ),
+    ]
@@ -1,10 +1,12 @@
 from django.db import models
+from django.utils import timezone
 
 
 class Payment(models.Model):
     STATUS_CHOICES = [
         ("PENDING", "Pending"),
         ("PAID", "Paid"),
+        ("FAILED", "Failed"),
     ]
 
     TYPE_CHOICES = [
@@ -23,11 +25,50 @@ class Payment(models.Model):
         on_delete=models.CASCADE,
         related_name="payments",
     )
-    session_url = models.URLField(max_length=500)
-    session_id = models.CharField(max_length=255)
+    # Blank until the checkout session has been created by
+    # payment.checkout.process_checkout_outbox.
+    session_url = models.URLField(max_length=500, blank=True)
+    session_id = models.CharField(max_length=255, blank=True)
     money_to_pay = models.DecimalField(decimal_places=2, max_digits=10)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.borrowing.book.title} - {self.get_status_display()}"
+
+
+class CheckoutOutbox(models.Model):
+    """A Stripe checkout session still to be created for a payment. Rows
+    are written in the same transaction as the payment and processed by
+    payment.checkout.process_checkout_outbox."""
+
+    STATUS_CHOICES = [
+        ("PENDING", "Pending"),
+        ("DONE", "Done"),
+        ("FAILED", "Failed"),
+    ]
+
+    payment = models.OneToOneField(
+        Payment, on_delete=models.CASCADE, related_name="checkout_outbox"
+    )
+    status = models.CharField(
+        max_length=7, choices=STATUS_CHOICES, default="PENDING"
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "checkout outbox"
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at"],
+                condition=models.Q(status="PENDING"),
+                name="payment_checkout_due_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Payment {self.payment_id} - {self.get_status_display()}"
@@ -0,0 +1,10 @@
+from rest_framework.pagination import CursorPagination
+
+
+class PaymentCursorPagination(CursorPagination):
+    # DRF builds the cursor from the first ordering field only, so it has
+    # to be unique: ties on a date would be paged through by OFFSET. Ids
+    # grow with the creation time, so newest still comes first.
+    ordering = "-id"
+    page_size_query_param = "limit"
+    max_page_size = 100
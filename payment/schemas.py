@@ -111,3 +111,16 @@ class PaymentSchema:
         },
         description="Handle the cancellation of a payment session.",
     )
+
+    export = extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="file_format",
+                description="csv (default) or ndjson",
+                required=False,
+                type={"type": "string"},
+            ),
+        ],
+        responses={200: None},
+        description="Stream payments as CSV or NDJSON (staff only).",
+    )
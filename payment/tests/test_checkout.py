@@ -0,0 +1,149 @@
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import stripe
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from borrowing.models import Borrowing
+from library.models import Book
+from payment.checkout import (
+    claim_checkouts,
+    process_checkout_outbox,
+    queue_checkout_session,
+)
+from payment.models import CheckoutOutbox
+from user.models import User
+
+
+@patch("payment.checkout.schedule")
+@patch("payment.checkout.async_task")
+@patch("payment.checkout.stripe.checkout.Session.create")
+class CheckoutOutboxTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="reader@example.com", password="password"
+        )
+        self.book = Book.objects.create(
+            title="Dune",
+            author="Frank Herbert",
+            cover="SOFT",
+            inventory=2,
+            daily_fee="1.00",
+        )
+        self.borrowing = Borrowing.objects.create(
+            user=self.user,
+            book=self.book,
+            expected_return_date=timezone.now().date() + timedelta(days=7),
+        )
+        Book.objects.filter(pk=self.book.pk).update(inventory=1)
+
+    def queue(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return queue_checkout_session(self.borrowing)
+
+    def test_queue_creates_pending_payment_and_outbox_entry(
+        self, mock_create, mock_task, mock_schedule
+    ):
+        payment = self.queue()
+
+        self.assertEqual(payment.status, "PENDING")
+        self.assertEqual(payment.session_url, "")
+        self.assertEqual(payment.money_to_pay, 700)
+        self.assertEqual(payment.checkout_outbox.status, "PENDING")
+        mock_create.assert_not_called()
+        mock_task.assert_called_once_with(
+            "payment.checkout.process_checkout_outbox"
+        )
+
+    def test_process_records_session(
+        self, mock_create, mock_task, mock_schedule
+    ):
+        payment = self.queue()
+        mock_create.return_value = SimpleNamespace(
+            id="cs_test_1", url="https://checkout.stripe.com/c/cs_test_1"
+        )
+
+        self.assertEqual(process_checkout_outbox(), 1)
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.session_id, "cs_test_1")
+        self.assertEqual(
+            payment.session_url, "https://checkout.stripe.com/c/cs_test_1"
+        )
+        self.assertEqual(payment.checkout_outbox.status, "DONE")
+        kwargs = mock_create.call_args.kwargs
+        self.assertEqual(
+            kwargs["idempotency_key"], f"checkout-session-{payment.pk}"
+        )
+        price_data = kwargs["line_items"][0]["price_data"]
+        self.assertEqual(price_data["unit_amount"], 700)
+        mock_schedule.assert_not_called()
+
+    def test_transient_error_is_retried_later(
+        self, mock_create, mock_task, mock_schedule
+    ):
+        payment = self.queue()
+        mock_create.side_effect = stripe.error.APIConnectionError("timeout")
+
+        process_checkout_outbox()
+
+        entry = CheckoutOutbox.objects.get(payment=payment)
+        self.assertEqual(entry.status, "PENDING")
+        self.assertEqual(entry.attempts, 1)
+        self.assertEqual(entry.last_error, "timeout")
+        self.assertGreater(entry.next_attempt_at, timezone.now())
+        self.assertEqual(claim_checkouts(), [])
+        mock_schedule.assert_called_once()
+        self.assertEqual(
+            mock_schedule.call_args.kwargs["next_run"], entry.next_attempt_at
+        )
+
+    @override_settings(PAYMENT_CHECKOUT_MAX_ATTEMPTS=1)
+    def test_final_failure_cancels_borrowing(
+        self, mock_create, mock_task, mock_schedule
+    ):
+        payment = self.queue()
+        mock_create.side_effect = stripe.error.APIConnectionError("timeout")
+
+        process_checkout_outbox()
+
+        payment.refresh_from_db()
+        self.borrowing.refresh_from_db()
+        self.book.refresh_from_db()
+        self.assertEqual(payment.status, "FAILED")
+        self.assertEqual(payment.checkout_outbox.status, "FAILED")
+        self.assertIsNotNone(self.borrowing.actual_return_date)
+        self.assertEqual(self.book.inventory, 2)
+
+    @override_settings(PAYMENT_CHECKOUT_MAX_ATTEMPTS=1)
+    def test_book_returned_meanwhile_is_not_restocked_twice(
+        self, mock_create, mock_task, mock_schedule
+    ):
+        payment = self.queue()
+        mock_create.side_effect = stripe.error.APIConnectionError("timeout")
+        Borrowing.objects.get(pk=self.borrowing.pk).return_borrowing()
+
+        process_checkout_outbox()
+
+        payment.refresh_from_db()
+        self.book.refresh_from_db()
+        self.assertEqual(payment.status, "FAILED")
+        self.assertEqual(self.book.inventory, 2)
+
+    def test_invalid_request_is_not_retried(
+        self, mock_create, mock_task, mock_schedule
+    ):
+        payment = self.queue()
+        mock_create.side_effect = stripe.error.InvalidRequestError(
+            "Invalid amount", "unit_amount"
+        )
+
+        process_checkout_outbox()
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, "FAILED")
+        self.assertEqual(mock_create.call_count, 1)
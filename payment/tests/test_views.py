@@ -1,4 +1,9 @@
+import csv
+import io
+import json
+
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.urls import reverse
@@ -57,13 +62,13 @@ class PaymentViewSetTest(APITestCase):
         self.authenticate(self.admin_user)
         response = self.client.get(self.payment_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data["results"]), 1)
 
     def test_regular_user_can_view_their_payments(self):
         self.authenticate(self.regular_user)
         response = self.client.get(self.payment_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data["results"]), 1)
 
     def test_regular_user_can_not_view_other_payments(self):
         another_user = User.objects.create_user(
@@ -85,7 +90,7 @@ class PaymentViewSetTest(APITestCase):
         self.authenticate(self.regular_user)
         response = self.client.get(self.payment_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data["results"]), 1)
 
     def test_create_payment(self):
         self.authenticate(self.regular_user)
@@ -118,3 +123,130 @@ class PaymentViewSetTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.payment.refresh_from_db()
         self.assertEqual(self.payment.status, "PAID")
+
+
+class PaymentExportTests(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_user(
+            email="admin@example.com", password="adminpass", is_staff=True
+        )
+        self.regular_user = User.objects.create_user(
+            email="user@example.com", password="userpass"
+        )
+        self.other_user = User.objects.create_user(
+            email="other@example.com", password="otherpass"
+        )
+        self.return_date = timezone.now().date() + timezone.timedelta(
+            days=7
+        )
+        self.book = Book.objects.create(
+            title="Test Book",
+            author="Test Author",
+            cover="HARD",
+            inventory=5,
+            daily_fee=2.99,
+        )
+        self.borrowing = Borrowing.objects.create(
+            user=self.regular_user,
+            book=self.book,
+            expected_return_date=self.return_date,
+        )
+        self.payment = Payment.objects.create(
+            borrowing=self.borrowing,
+            status="PENDING",
+            payment_type="PAYMENT",
+            session_url="https://example.com/",
+            session_id="id_888",
+            money_to_pay=15.00,
+        )
+        self.other_payment = Payment.objects.create(
+            borrowing=Borrowing.objects.create(
+                user=self.other_user,
+                book=self.book,
+                expected_return_date=self.return_date,
+            ),
+            status="PAID",
+            payment_type="FINE",
+            session_url="https://example.com/",
+            session_id="id_999",
+            money_to_pay=4.50,
+        )
+        self.export_url = reverse("payment:payment-export")
+
+    def authenticate(self, user):
+        token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def export(self, query=""):
+        response = self.client.get(self.export_url + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b"".join(response.streaming_content).decode()
+
+    def test_export_is_admin_only(self):
+        response = self.client.get(self.export_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.authenticate(self.regular_user)
+        response = self.client.get(self.export_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_export_unknown_format(self):
+        self.authenticate(self.admin_user)
+        response = self.client.get(self.export_url + "?file_format=xml")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_csv(self):
+        self.authenticate(self.admin_user)
+        response = self.client.get(self.export_url)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertEqual(
+            response["Content-Disposition"],
+            'attachment; filename="payments.csv"',
+        )
+        content = b"".join(response.streaming_content).decode()
+        rows = list(csv.reader(io.StringIO(content)))
+
+        self.assertEqual(
+            rows[0][:8],
+            [
+                "id",
+                "borrowing",
+                "book",
+                "user",
+                "status",
+                "payment_type",
+                "money_to_pay",
+                "session_id",
+            ],
+        )
+        self.assertEqual(
+            rows[1][:8],
+            [
+                str(self.payment.id),
+                str(self.borrowing.id),
+                "Test Book",
+                "user@example.com",
+                "PENDING",
+                "PAYMENT",
+                "15.00",
+                "id_888",
+            ],
+        )
+        self.assertEqual(len(rows), 3)
+
+    def test_export_ndjson_covers_every_user(self):
+        self.authenticate(self.admin_user)
+        rows = [
+            json.loads(line)
+            for line in self.export("?file_format=ndjson").splitlines()
+        ]
+
+        self.assertEqual(
+            [(row["id"], row["user"]) for row in rows],
+            [
+                (self.payment.id, "user@example.com"),
+                (self.other_payment.id, "other@example.com"),
+            ],
+        )
+        self.assertEqual(rows[1]["status"], "PAID")
+        self.assertEqual(rows[1]["money_to_pay"], "4.50")
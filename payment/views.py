@@ -1,11 +1,14 @@
 import stripe
 from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
 from rest_framework import viewsets, mixins
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.reverse import reverse
 
+from borrowing.cache import cache_per_user
+from library_service.export import EXPORT_FORMATS, export_response
 from payment.models import Payment
+from payment.pagination import PaymentCursorPagination
 from payment.schemas import PaymentSchema
 from payment.serializers import (
     PaymentSerializer,
@@ -22,9 +25,23 @@ from decimal import Decimal
 stripe.api_key = settings.STRIPE_SECRET_KEY
 stripe.api_version = settings.STRIPE_API_VERSION
 
+PAYMENT_EXPORT_FIELDS = {
+    "id": "id",
+    "borrowing": "borrowing_id",
+    "book": "borrowing__book__title",
+    "user": "borrowing__user__email",
+    "status": "status",
+    "payment_type": "payment_type",
+    "money_to_pay": "money_to_pay",
+    "session_id": "session_id",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+}
+
 
 @method_decorator(name="list", decorator=PaymentSchema.list_schema)
 @method_decorator(name="retrieve", decorator=PaymentSchema.retrieve)
+@method_decorator(name="export", decorator=PaymentSchema.export)
 class PaymentViewSet(
     mixins.ListModelMixin,
     mixins.CreateModelMixin,
@@ -34,18 +51,16 @@ class PaymentViewSet(
 ):
     serializer_class = PaymentSerializer
     permission_classes = (IsAuthenticated,)
+    pagination_class = PaymentCursorPagination
 
     def get_queryset(self):
         user = self.request.user
 
-        if user.is_staff:
-            queryset = Payment.objects.all().select_related(
-                "borrowing__book", "borrowing__user"
-            )
-        else:
-            queryset = Payment.objects.filter(
-                borrowing__user=user
-            ).select_related("borrowing__book", "borrowing__user")
+        queryset = Payment.objects.select_related(
+            "borrowing__book", "borrowing__user"
+        ).defer("borrowing__book__search_vector")
+        if not user.is_staff:
+            queryset = queryset.filter(borrowing__user=user)
 
         return queryset
 
@@ -56,10 +71,24 @@ class PaymentViewSet(
             return PaymentDetailSerializer
         return self.serializer_class
 
-    @method_decorator(cache_page(60 * 60))
+    @cache_per_user("payment")
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
+    @action(detail=False, methods=["GET"], permission_classes=[IsAdminUser])
+    def export(self, request):
+        file_format = request.query_params.get("file_format", "csv")
+        if file_format not in EXPORT_FORMATS:
+            return Response(
+                {"error": f"Unsupported file format: {file_format}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        queryset = self.get_queryset().order_by("id")
+        return export_response(
+            queryset, PAYMENT_EXPORT_FIELDS, file_format, "payments"
+        )
+
 
 @method_decorator(name="post", decorator=PaymentSchema.payment_process_schema)
 class PaymentProcessView(APIView):
@@ -11,17 +11,32 @@ from django.contrib.auth import get_user_model
 from telegram.ext import (
     ContextTypes,
     ApplicationBuilder,
+    CallbackQueryHandler,
     CommandHandler,
+    InlineQueryHandler,
     MessageHandler,
-    ConversationHandler,
     filters,
 )
-from telegram import Update
-from asgiref.sync import sync_to_async
-from borrowing.signals import (
-    check_all_borrowings,
-    get_user_upcoming_borrowings,
+from telegram import (
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InlineQueryResultArticle,
+    InputTextMessageContent,
+    Update,
 )
+from borrowing.bot_queries import (
+    aadvance_conversation,
+    afind_user,
+    afinish_conversation,
+    aget_conversation,
+    aget_borrowings_page,
+    aget_upcoming_message,
+    aget_user_by_chat_id,
+    alink_chat,
+    asearch_catalog,
+    astart_conversation,
+)
+from borrowing.reports import REPORT_FILTERS, format_borrowings_page
 
 User = get_user_model()
 
@@ -33,46 +48,50 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-EMAIL, FIRST_NAME, LAST_NAME = range(3)
+# Telegram may reuse an inline answer for this long; the index itself is
+# refreshed at least once a second.
+INLINE_CACHE_TIME = 10
 
-user_data = {}
+# Registration state is kept per chat in the database (ChatConversation),
+# so it survives restarts and any bot worker can handle the next message.
+EMAIL, FIRST_NAME, LAST_NAME = "EMAIL", "FIRST_NAME", "LAST_NAME"
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await astart_conversation(update.message.chat_id, EMAIL)
     await update.message.reply_text("Hello! Please send me your email.")
-    return EMAIL
 
 
 async def get_email(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_data["email"] = update.message.text
+    await aadvance_conversation(
+        update.message.chat_id, FIRST_NAME, email=update.message.text
+    )
     await update.message.reply_text("Now, please send your first name.")
-    return FIRST_NAME
 
 
 async def get_first_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_data["first_name"] = update.message.text
+    await aadvance_conversation(
+        update.message.chat_id, LAST_NAME, first_name=update.message.text
+    )
     await update.message.reply_text("Now, please send your last name.")
-    return LAST_NAME
 
 
 async def get_last_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_data["last_name"] = update.message.text
     chat_id = update.message.chat_id
-    email = user_data["email"]
-    first_name = user_data["first_name"]
-    last_name = user_data["last_name"]
+    data = await afinish_conversation(chat_id, last_name=update.message.text)
+    if data is None:
+        await update.message.reply_text("Please start again with /start.")
+        return
+    email = data.get("email")
+    first_name = data.get("first_name")
+    last_name = data["last_name"]
     logger.info(
         f"email: {email}, first_name: {first_name}, last_name: {last_name}"
     )
 
-    user = await sync_to_async(
-        User.objects.filter(
-            email=email, first_name=first_name, last_name=last_name
-        ).first
-    )()
+    user = await afind_user(email, first_name, last_name)
     if user:
-        user.telegram_chat_id = chat_id
-        await sync_to_async(user.save)()
+        await alink_chat(user, chat_id)
         logger.info(f"Saved chat_id {chat_id} for user {email}")
         await update.message.reply_text(
             "Thank you! Your chat ID has been saved."
@@ -80,20 +99,74 @@ async def get_last_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         logger.error(f"User with email {email} not found")
         await update.message.reply_text("Sorry, I couldn't find that email.")
-    return ConversationHandler.END
+
+
+REGISTRATION_STEPS = {
+    EMAIL: get_email,
+    FIRST_NAME: get_first_name,
+    LAST_NAME: get_last_name,
+}
+
+
+async def handle_registration_message(
+    update: Update, context: ContextTypes.DEFAULT_TYPE
+):
+    conversation = await aget_conversation(update.message.chat_id)
+    if conversation is not None:
+        await REGISTRATION_STEPS[conversation.state](update, context)
+
+
+def borrowings_keyboard(page, filter_name):
+    """Callback data is "borrowings:<filter>:<after|before>:<id>"."""
+    filter_row = [
+        InlineKeyboardButton(
+            f"• {name}" if name == filter_name else name,
+            callback_data=f"borrowings:{name}:after:",
+        )
+        for name in REPORT_FILTERS
+    ]
+    paging_row = []
+    borrowings = page["borrowings"]
+    if page["has_previous"]:
+        paging_row.append(
+            InlineKeyboardButton(
+                "◀️ Previous",
+                callback_data=f"borrowings:{filter_name}:before:"
+                f"{borrowings[0].id}",
+            )
+        )
+    if page["has_next"]:
+        paging_row.append(
+            InlineKeyboardButton(
+                "Next ▶️",
+                callback_data=f"borrowings:{filter_name}:after:"
+                f"{borrowings[-1].id}",
+            )
+        )
+    return InlineKeyboardMarkup([filter_row, paging_row])
+
+
+async def render_borrowings_page(filter_name, direction=None, cursor=None):
+    if filter_name not in REPORT_FILTERS:
+        filter_name = "all"
+    kwargs = {f"{direction}_id": cursor} if cursor is not None else {}
+    page = await aget_borrowings_page(filter_name, **kwargs)
+    return (
+        format_borrowings_page(page, filter_name),
+        borrowings_keyboard(page, filter_name),
+    )
 
 
 async def command_all_borrowings(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ):
     chat_id = update.message.chat_id
-    user = await sync_to_async(
-        User.objects.filter(telegram_chat_id=chat_id).first
-    )()
+    user = await aget_user_by_chat_id(chat_id)
     if user and user.is_staff:
-        borrowings_message = await sync_to_async(check_all_borrowings)()
+        filter_name = context.args[0] if context.args else "all"
+        text, keyboard = await render_borrowings_page(filter_name)
         await context.bot.send_message(
-            chat_id=chat_id, text=borrowings_message
+            chat_id=chat_id, text=text, reply_markup=keyboard
         )
     else:
         await context.bot.send_message(
@@ -101,45 +174,90 @@ async def command_all_borrowings(
         )
 
 
+async def all_borrowings_page(
+    update: Update, context: ContextTypes.DEFAULT_TYPE
+):
+    query = update.callback_query
+    user = await aget_user_by_chat_id(query.message.chat_id)
+    if not (user and user.is_staff):
+        await query.answer("Access denied. You are not an admin.")
+        return
+
+    _, filter_name, direction, cursor = query.data.split(":")
+    if direction not in ("after", "before") or not cursor.isdigit():
+        cursor = None
+    text, keyboard = await render_borrowings_page(
+        filter_name, direction, int(cursor) if cursor else None
+    )
+    await query.answer()
+    await query.edit_message_text(text=text, reply_markup=keyboard)
+
+
 async def command_upcoming_borrowings(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ):
     chat_id = update.message.chat_id
-    user = await sync_to_async(
-        User.objects.filter(telegram_chat_id=chat_id).first
-    )()
-    upcoming_message = await sync_to_async(get_user_upcoming_borrowings)(user)
+    user = await aget_user_by_chat_id(chat_id)
+    upcoming_message = await aget_upcoming_message(user)
     await context.bot.send_message(chat_id=chat_id, text=upcoming_message)
 
 
-def run_bot():
-    application = ApplicationBuilder().token(TOKEN).build()
-
-    conv_handler = ConversationHandler(
-        entry_points=[CommandHandler("start", start)],
-        states={
-            EMAIL: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, get_email)
-            ],
-            FIRST_NAME: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, get_first_name)
-            ],
-            LAST_NAME: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, get_last_name)
-            ],
-        },
-        fallbacks=[],
-    )
+def format_availability(book):
+    if book.inventory > 0:
+        return f"✅ {book.inventory} available"
+    return "❌ Not available"
+
+
+async def inline_book_search(
+    update: Update, context: ContextTypes.DEFAULT_TYPE
+):
+    query = update.inline_query.query
+    books = await asearch_catalog(query) if query.strip() else []
+    results = [
+        InlineQueryResultArticle(
+            id=str(book.id),
+            title=book.title,
+            description=f"{book.author} · {format_availability(book)}",
+            input_message_content=InputTextMessageContent(
+                f"📖 {book.title}\n👤 {book.author}\n"
+                f"{format_availability(book)}"
+            ),
+        )
+        for book in books
+    ]
+    await update.inline_query.answer(results, cache_time=INLINE_CACHE_TIME)
 
-    application.add_handler(conv_handler)
+
+def build_application(webhook=False):
+    """Builds the bot with all handlers. Webhook mode skips the updater,
+    since updates are fed in by notification.views.telegram_webhook."""
+    builder = ApplicationBuilder().token(TOKEN)
+    if webhook:
+        builder = builder.updater(None)
+    application = builder.build()
+
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(
+        MessageHandler(
+            filters.TEXT & ~filters.COMMAND, handle_registration_message
+        )
+    )
     application.add_handler(
         CommandHandler("all_borrow", command_all_borrowings)
     )
+    application.add_handler(
+        CallbackQueryHandler(all_borrowings_page, pattern=r"^borrowings:")
+    )
     application.add_handler(
         CommandHandler("upcoming_borrow", command_upcoming_borrowings)
     )
+    application.add_handler(InlineQueryHandler(inline_book_search))
+
+    return application
 
-    application.run_polling()
+
+def run_bot():
+    build_application().run_polling()
 
 
 if __name__ == "__main__":
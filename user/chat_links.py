@@ -0,0 +1,68 @@
+from functools import partial
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from user.models import User
+
+# Bot commands resolve the sender through this cache. Links change rarely,
+# and every change invalidates the entry, so the timeout only bounds memory.
+CHAT_USER_TIMEOUT = 60 * 5
+# The fields bot commands read; the other fields are deferred.
+CHAT_USER_FIELDS = ("id", "email", "is_staff", "telegram_chat_id")
+
+
+def chat_user_key(chat_id):
+    return f"telegram:chat-user:{chat_id}"
+
+
+def get_user_by_chat_id(chat_id):
+    """Returns the user linked to the chat, or None. A cache hit does not
+    reach the database: the user is built from the cached fields, and
+    chats without a user are cached too. Saving a user drops the entries
+    of its chats (see user.signals)."""
+    key = chat_user_key(chat_id)
+    fields = cache.get(key)
+    if fields is None:
+        fields = (
+            User.objects.filter(telegram_chat_id=chat_id)
+            .values(*CHAT_USER_FIELDS)
+            .first()
+        ) or False
+        cache.set(key, fields, CHAT_USER_TIMEOUT)
+    if not fields:
+        return None
+    field_names = [
+        field.attname
+        for field in User._meta.concrete_fields
+        if field.attname in fields
+    ]
+    return User.from_db(
+        DEFAULT_DB_ALIAS, field_names, [fields[name] for name in field_names]
+    )
+
+
+def _delete_chat_keys(chat_ids):
+    cache.delete_many([chat_user_key(chat_id) for chat_id in chat_ids])
+
+
+def forget_chats(*chat_ids):
+    chat_ids = [chat_id for chat_id in chat_ids if chat_id]
+    if not chat_ids:
+        return
+    # Invalidate right away and again after commit, so a lookup that read
+    # the old link before the commit cannot leave it cached.
+    _delete_chat_keys(chat_ids)
+    transaction.on_commit(partial(_delete_chat_keys, chat_ids))
+
+
+def link_chat(user, chat_id):
+    """Links the chat to the user, unlinking it from whoever had it."""
+    with transaction.atomic():
+        for previous in User.objects.select_for_update().filter(
+            telegram_chat_id=chat_id
+        ).exclude(pk=user.pk):
+            previous.telegram_chat_id = None
+            previous.save(update_fields=["telegram_chat_id"])
+        user.telegram_chat_id = chat_id
+        user.save(update_fields=["telegram_chat_id"])
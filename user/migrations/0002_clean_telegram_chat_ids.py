@@ -0,0 +1,37 @@
+import re
+
+from django.db import migrations
+
+CHAT_ID_PATTERN = re.compile(r"-?\d{1,18}")
+
+
+def clean_chat_ids(apps, schema_editor):
+    """Clears chat ids that are not integers and keeps each chat linked to
+    one user only (the most recently created one), so the column can be
+    converted to a unique bigint."""
+    User = apps.get_model("user", "User")
+    seen = set()
+    users = (
+        User.objects.exclude(telegram_chat_id__isnull=True)
+        .order_by("-id")
+        .values_list("id", "telegram_chat_id")
+    )
+    unlink = []
+    for user_id, chat_id in users.iterator():
+        chat_id = chat_id.strip()
+        if not CHAT_ID_PATTERN.fullmatch(chat_id) or int(chat_id) in seen:
+            unlink.append(user_id)
+        else:
+            seen.add(int(chat_id))
+    User.objects.filter(pk__in=unlink).update(telegram_chat_id=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(clean_chat_ids, migrations.RunPython.noop),
+    ]
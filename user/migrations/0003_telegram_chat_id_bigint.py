@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-18 20:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0002_clean_telegram_chat_ids'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='telegram_chat_id',
+            field=models.BigIntegerField(blank=True, null=True, unique=True),
+        ),
+    ]
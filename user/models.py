@@ -37,7 +37,9 @@ class User(AbstractUser):
     email = models.EmailField(_("email address"), unique=True)
     first_name = models.CharField(_("first name"), max_length=50)
     last_name = models.CharField(_("last name"), max_length=50)
-    telegram_chat_id = models.CharField(max_length=50, blank=True, null=True)
+    telegram_chat_id = models.BigIntegerField(
+        blank=True, null=True, unique=True
+    )
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = [
@@ -46,3 +48,12 @@ class User(AbstractUser):
     ]
 
     objects = UserManager()
+
+    loaded_telegram_chat_id = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets a relink invalidate the cache entry of the old chat too.
+        instance.loaded_telegram_chat_id = instance.telegram_chat_id
+        return instance
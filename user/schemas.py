@@ -19,7 +19,9 @@ class UserSchema:
     )
 
     save_chat_id_schema = extend_schema(
-        request={"application/json": {"email": "string", "chat_id": "string"}},
+        request={
+            "application/json": {"email": "string", "chat_id": "integer"}
+        },
         responses={
             200: "Chat ID saved successfully",
             404: "User not found",
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from user.chat_links import forget_chats
+from user.models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def handle_chat_link_change(sender, instance, **kwargs):
+    forget_chats(
+        instance.telegram_chat_id, instance.loaded_telegram_chat_id
+    )
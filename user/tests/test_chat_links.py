@@ -0,0 +1,83 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from user.chat_links import (
+    chat_user_key,
+    get_user_by_chat_id,
+    link_chat,
+)
+from user.models import User
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache"
+        }
+    }
+)
+class ChatLinkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="user@example.com", password="password"
+        )
+        self.other_user = User.objects.create_user(
+            email="other@example.com", password="password"
+        )
+
+    def test_lookup_is_cached(self):
+        link_chat(self.user, 1000)
+        self.assertEqual(get_user_by_chat_id(1000), self.user)
+
+        with self.assertNumQueries(0):
+            user = get_user_by_chat_id(1000)
+            self.assertEqual(user, self.user)
+            self.assertEqual(user.email, "user@example.com")
+            self.assertFalse(user.is_staff)
+            self.assertEqual(user.telegram_chat_id, 1000)
+
+    def test_saving_the_user_refreshes_the_entry(self):
+        link_chat(self.user, 1000)
+        get_user_by_chat_id(1000)
+
+        self.user.is_staff = True
+        self.user.save()
+
+        self.assertTrue(get_user_by_chat_id(1000).is_staff)
+
+    def test_unlinked_chat_is_forgotten(self):
+        link_chat(self.user, 1000)
+        get_user_by_chat_id(1000)
+
+        self.user.telegram_chat_id = None
+        self.user.save()
+
+        self.assertIsNone(get_user_by_chat_id(1000))
+
+    def test_unknown_chat_is_cached(self):
+        self.assertIsNone(get_user_by_chat_id(2000))
+
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_user_by_chat_id(2000))
+
+    def test_relink_moves_chat_and_invalidates_cache(self):
+        link_chat(self.user, 1000)
+        self.assertEqual(get_user_by_chat_id(1000), self.user)
+
+        link_chat(self.other_user, 1000)
+
+        self.assertEqual(get_user_by_chat_id(1000), self.other_user)
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.telegram_chat_id)
+
+    def test_link_is_forgotten_again_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            link_chat(self.user, 1000)
+            # A lookup racing the transaction caches the old state.
+            cache.set(chat_user_key(1000), False)
+
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache.get(chat_user_key(1000)))
+        self.assertEqual(get_user_by_chat_id(1000), self.user)
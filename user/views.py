@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from user.chat_links import link_chat
 from user.serializers import UserSerializer
 from django.utils.decorators import method_decorator
 from user.schemas import UserSchema
@@ -33,12 +34,17 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
 class SaveChatIdView(APIView):
     def post(self, request):
         email = request.data.get("email")
-        chat_id = request.data.get("chat_id")
+        try:
+            chat_id = int(request.data.get("chat_id"))
+        except (TypeError, ValueError):
+            return Response(
+                {"message": "chat_id must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
         user = User.objects.filter(email=email).first()
         if user:
-            user.telegram_chat_id = chat_id
-            user.save()
+            link_chat(user, chat_id)
             return Response(
                 {"message": "Chat ID saved successfully"},
                 status=status.HTTP_200_OK,